@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+'''
+    This module has the definition of AccessionIndex class and the
+    following methods to build, save, and load the index:
+
+    build_NEXP_index(fh_sprot, EXP_default=set([]), workers=1):
+        This method goes over the records in a UniProtKB/SwissProt file
+        (file handle fh_sprot) once. For each record, it determines in
+        which ontologies (MFO, BPO, CCO) the protein's annotations have
+        non-EXP evidence codes but no EXP evidence codes. It returns a
+        dictionary of numpy arrays with the accessions of all records,
+        the entry id of each accession, the ontology flags of each
+        entry, and the taxon ids of each entry. When workers is more
+        than one, the file is indexed in worker processes by using
+        ParallelSprot module.
+
+    load_NEXP_index(fh_sprot, EXP_default=set([]), workers=1):
+        This method looks for an index file saved next to the
+        SwissProt file. If the index file exists and was built from
+        the same release with the same set of EXP codes, it loads
+        the index from the file. Otherwise, it builds the index by
+        invoking build_NEXP_index and saves it next to the SwissProt
+        file, so that repeated runs against the same release skip
+        rebuilding it.
+
+    get_NEXP_index(fh_sprot, taxon_id, EXP_default=set([]), compact=False,
+                   workers=1):
+        This method is the entry point of this module. It invokes
+        load_NEXP_index and returns an AccessionIndex object for all
+        species (taxon_id is an empty string) or for a specific species.
+
+    The AccessionIndex class maps each accession (primary or secondary)
+    of the NEXP proteins to the ontology flags of the entries it belongs
+    to. The mapping is either a dictionary or, when compact is True, a
+    sorted array of accessions with a parallel array of flags, which
+    needs much less memory for all-species indexes.
+'''
+import os
+import sys
+import numpy as np
+
+import ParallelSprot as ps
+import SprotScanner as ss
+
+# Ontology flags stored for each entry of the index:
+ONT_FLAGS = {'F': 1, 'P': 2, 'C': 4}
+# Extension of the index file saved next to the SwissProt file:
+INDEX_EXT = '.nexp.npz'
+# Version of the index file format:
+INDEX_VERSION = 1
+
+class AccessionIndex:
+    def __init__(self, accessions, flags, compact=False):
+        '''
+        accessions and flags are parallel sequences: flags[i] holds
+        the ontology flags of the entry with the accession accessions[i].
+        An accession that belongs to more than one entry keeps the
+        union of the flags of those entries.
+        '''
+        self.compact = compact
+        if compact:
+            accessions = np.asarray(accessions)
+            flags = np.asarray(flags, dtype=np.uint8)
+            order = np.argsort(accessions, kind='stable')
+            accessions = accessions[order]
+            flags = flags[order]
+            # Merge the flags of repeated accessions:
+            if len(accessions):
+                first = np.ones(len(accessions), dtype=bool)
+                first[1:] = accessions[1:] != accessions[:-1]
+                starts = np.flatnonzero(first)
+                flags = np.bitwise_or.reduceat(flags, starts)
+                accessions = accessions[starts]
+            self.accessions = accessions
+            self.flags = flags
+        else:
+            self.acc_dict = {}
+            for acc, flag in zip(accessions, flags):
+                self.acc_dict[acc] = self.acc_dict.get(acc, 0) | int(flag)
+        return None
+
+    def __len__(self):
+        if self.compact:
+            return len(self.accessions)
+        return len(self.acc_dict)
+
+    def get_flags(self, accessions):
+        '''
+        This method returns the union of the ontology flags of all the
+        accessions in the list accessions. It returns 0 when none of
+        the accessions is in the index.
+        '''
+        flag = 0
+        if self.compact:
+            n = len(self.accessions)
+            if n == 0:
+                return 0
+            pos = np.searchsorted(self.accessions, accessions)
+            for acc, p in zip(accessions, pos):
+                if p < n and self.accessions[p] == acc:
+                    flag |= int(self.flags[p])
+        else:
+            for acc in accessions:
+                flag |= self.acc_dict.get(acc, 0)
+        return flag
+
+    def is_found(self, accessions, ontType):
+        '''
+        This method returns True if any accession in the list accessions
+        belongs to a protein that had non-EXP evidence codes but no EXP
+        evidence codes in the ontology ontType. Otherwise, it returns False.
+        '''
+        return bool(self.get_flags(accessions) & ONT_FLAGS[ontType])
+
+def __index_records(records, EXP_default=set([])):
+    '''
+    This method returns the lists of the accessions, the entry number (in
+    the order of the records) of each accession, the ontology flags of each
+    entry, the number of taxon ids of each entry, and the taxon ids.
+    '''
+    accessions = []
+    acc_entry = []
+    entry_flags = []
+    taxon_count = []
+    taxa = []
+    for rec in records:
+        # ont_specific_code_exist: the ontology flags for which an evidence
+        # code (either EXP or Non-EXP) is found for the current record:
+        ont_specific_code_exist = 0
+        # exp_code: the ontology flags for which an EXP evidence code
+        # is found for the current record:
+        exp_code = 0
+        # Going over the list of GO information:
+        for goTerm, ontType, evidence in rec.go_refs:
+            flag = ONT_FLAGS.get(ontType, 0)
+            ont_specific_code_exist |= flag
+            if evidence in EXP_default:
+                exp_code |= flag
+        entry_id = len(entry_flags)
+        entry_flags.append(ont_specific_code_exist & ~exp_code)
+        for acc in rec.accessions:
+            accessions.append(acc)
+            acc_entry.append(entry_id)
+        taxa.extend(rec.taxonomy_id)
+        taxon_count.append(len(rec.taxonomy_id))
+    return accessions, acc_entry, entry_flags, taxon_count, taxa
+
+def build_NEXP_index(fh_sprot, EXP_default=set([]), workers=1):
+    '''
+    This method builds the arrays of the index in a single pass over
+    the SwissProt file and returns them as a dictionary. When workers
+    is more than one, the byte ranges of the file are indexed in worker
+    processes and the results are joined in the order of the file.
+    '''
+    print('      Building the accession index with the proteins ' + \
+          'that have only non-EXP evidence codes ...')
+    sprot_fname = ps.sprot_fname(fh_sprot)
+    if workers > 1 and sprot_fname:
+        parts = list(ps.map_records(sprot_fname, __index_records,
+                                    (EXP_default,), '', workers))
+    else:
+        parts = [__index_records(ss.parse(fh_sprot), EXP_default)]
+    accessions = []
+    acc_entry = []
+    entry_flags = []
+    taxon_count = []
+    taxa = []
+    for part in parts:
+        # The entry numbers of a byte range start from zero:
+        first_entry = len(entry_flags)
+        accessions.extend(part[0])
+        acc_entry.extend(entry_id + first_entry for entry_id in part[1])
+        entry_flags.extend(part[2])
+        taxon_count.extend(part[3])
+        taxa.extend(part[4])
+    index = {}
+    index['accessions'] = np.array(accessions, dtype=str)
+    index['acc_entry'] = np.array(acc_entry, dtype=np.int32)
+    index['entry_flags'] = np.array(entry_flags, dtype=np.uint8)
+    index['taxon_ptr'] = np.concatenate(([0], np.cumsum(taxon_count,
+                                                        dtype=np.int64)))
+    index['taxa'] = np.array(taxa, dtype=str)
+    return index
+
+def __index_fname(fh_sprot):
+    '''
+    This method returns the name of the index file for the SwissProt
+    file with handle fh_sprot, or None if the handle has no file name.
+    '''
+    fname = getattr(fh_sprot, 'name', None)
+    if not isinstance(fname, str) or not os.path.isfile(fname):
+        return None
+    return fname + INDEX_EXT
+
+def __release_stamp(fh_sprot):
+    st = os.stat(fh_sprot.name)
+    return np.array([INDEX_VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+def load_NEXP_index(fh_sprot, EXP_default=set([]), workers=1):
+    '''
+    This method loads the index saved next to the SwissProt file if it
+    is up to date. Otherwise, it builds the index and saves it.
+    '''
+    index_fname = __index_fname(fh_sprot)
+    # The sorted EXP codes (see exp_codes_key in SprotScanner module):
+    exp_codes = ss.exp_codes_key(EXP_default)
+    if index_fname and os.path.exists(index_fname):
+        try:
+            with np.load(index_fname, allow_pickle=False) as saved:
+                if np.array_equal(saved['stamp'], __release_stamp(fh_sprot)) \
+                   and ss.exp_codes_key(str(saved['exp_codes'])) == \
+                       exp_codes:
+                    print('      Loading the accession index from ' + \
+                          os.path.basename(index_fname) + ' ...')
+                    return dict((k, saved[k]) for k in saved.files)
+        except (OSError, ValueError, KeyError):
+            pass
+    index = build_NEXP_index(fh_sprot, EXP_default, workers)
+    if index_fname:
+        try:
+            np.savez(index_fname, stamp=__release_stamp(fh_sprot),
+                     exp_codes=np.array(exp_codes), **index)
+        except OSError:
+            print('      Could not save the accession index to ' + \
+                  os.path.basename(index_fname))
+    return index
+
+def get_NEXP_index(fh_sprot, taxon_id, EXP_default=set([]), compact=False,
+                   workers=1):
+    '''
+    This method returns an AccessionIndex object with the accessions of
+    the proteins that had non-EXP evidence codes but no EXP evidence codes
+    in some ontology. When taxon_id is supplied, only the proteins of that
+    species are indexed. It also returns a dictionary with the number of
+    indexed proteins for each ontology.
+    '''
+    index = load_NEXP_index(fh_sprot, EXP_default, workers)
+    entry_flags = index['entry_flags']
+    selected = entry_flags != 0
+    if taxon_id:
+        taxon_ptr = index['taxon_ptr']
+        entry_of_taxon = np.repeat(np.arange(len(entry_flags)),
+                                   np.diff(taxon_ptr))
+        in_taxon = np.zeros(len(entry_flags), dtype=bool)
+        in_taxon[entry_of_taxon[index['taxa'] == taxon_id]] = True
+        selected &= in_taxon
+    entry_count = {}
+    for ontType, flag in ONT_FLAGS.items():
+        entry_count[ontType] = int(np.count_nonzero(
+                                   entry_flags[selected] & flag))
+    acc_selected = selected[index['acc_entry']]
+    accessions = index['accessions'][acc_selected]
+    flags = entry_flags[index['acc_entry'][acc_selected]]
+    if compact:
+        acc_index = AccessionIndex(accessions, flags, compact=True)
+    else:
+        acc_index = AccessionIndex(accessions.tolist(), flags.tolist())
+    return acc_index, entry_count
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+'''
+    This module has the definition of AnnotationHistory class, which
+    keeps the GO annotation history of a series of UniProtKB/SwissProt
+    releases in a sqlite database, and the following methods:
+
+    open_history(db_fname, EXP_default=set([])):
+        This method is the entry point of this module. It opens (or
+        creates) the history database db_fname for the set of EXP codes
+        EXP_default and returns an AnnotationHistory object. A database
+        is built for a single set of EXP codes.
+
+    release_name(sprot_fname):
+        This method returns the name of the release (the time point
+        yyyy_mm) of a SwissProt file name, a compressed SwissProt file
+        name, or a snapshot file name.
+
+    fetch_sequences(fh_sprot, rec_nos):
+        This method returns a dictionary that maps each record number in
+        rec_nos to the sequence of that record in the SwissProt file with
+        handle fh_sprot. The records are read through the offset index of
+        SprotIndex module when the file can be indexed. Otherwise, the
+        file is read once.
+
+    The releases are added to the history one at a time by the
+    add_release method of AnnotationHistory class, which goes over the
+    records of that release only. The history keeps the following for
+    each release:
+        - the accessions, taxon ids, and ontology flags of each record
+          (the ontologies with any evidence code and the ontologies with
+          EXP evidence codes), in the order of the records in the file,
+        - the GO terms of each record with EXP evidence codes.
+    For each (primary) accession and GO term, it also keeps the releases
+    in which the term was supported by an EXP evidence code and the
+    releases in which it was supported by a non-EXP evidence code, so the
+    first release of each can be looked up (first_releases method).
+
+    The evaluation sets (eval_set method), the reevaluation sets
+    (reeval_set method), and the gene counts (gene_counts and
+    gene_count_series methods) of any pair or series of the releases are
+    then computed from the history without reading the SwissProt files
+    again. They are the same as the sets and the counts computed from the
+    SwissProt files by xTract_sp_evalSet, xTract_sp_reevalSet, and
+    Count_sp_genes modules. Only the sequences of the selected proteins
+    are read from the SwissProt file at t2 (see fetch_sequences).
+'''
+import os
+import sqlite3
+import sys
+from collections import defaultdict
+from os.path import basename
+
+import SprotIndex as si
+import SprotScanner as ss
+import SprotSnapshot as ssn
+
+# Version of the database schema:
+HISTORY_VERSION = 1
+# Ontology flags of the records (the same as AccessionIndex module):
+ONT_FLAGS = {'F': 1, 'P': 2, 'C': 4}
+ONT_NAMES = {'F': 'MFO', 'P': 'BPO', 'C': 'CCO'}
+# Number of releases a database can hold (one bit of a sqlite integer
+# for each release):
+MAX_RELEASES = 63
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT);
+CREATE TABLE IF NOT EXISTS releases (
+    release_id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE,
+    fname TEXT,
+    stamp TEXT);
+CREATE TABLE IF NOT EXISTS entries (
+    release_id INTEGER,
+    rec_no INTEGER,
+    accessions TEXT,
+    taxa TEXT,
+    code_flags INTEGER,
+    exp_flags INTEGER,
+    PRIMARY KEY (release_id, rec_no)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS entry_accessions (
+    release_id INTEGER,
+    accession TEXT,
+    rec_no INTEGER,
+    PRIMARY KEY (release_id, accession, rec_no)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS exp_terms (
+    release_id INTEGER,
+    rec_no INTEGER,
+    ont TEXT,
+    go_term TEXT,
+    PRIMARY KEY (release_id, rec_no, ont, go_term)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS annotations (
+    accession TEXT,
+    go_term TEXT,
+    ont TEXT,
+    exp_mask INTEGER,
+    nexp_mask INTEGER,
+    PRIMARY KEY (accession, go_term, ont)) WITHOUT ROWID;
+'''
+
+def release_name(sprot_fname):
+    name = basename(sprot_fname)
+    for ext in (ssn.SNAPSHOT_EXT, ss.GZIP_EXT):
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+    return name.split('.dat.')[-1]
+
+def _release_stamp(fh_sprot):
+    fname = getattr(fh_sprot, 'name', None)
+    if not isinstance(fname, str) or not os.path.isfile(fname):
+        return ''
+    st = os.stat(fname)
+    return str(st.st_size) + ':' + str(st.st_mtime_ns)
+
+def _entry_rows(rec, EXP_default=set([])):
+    '''
+    This method returns the ontology flags (any evidence code, EXP
+    evidence codes) of the record rec, the GO terms of the record with
+    EXP evidence codes, and the (GO term, ontology) pairs of the record
+    with their EXP and non-EXP flags.
+    '''
+    code_flags = 0
+    exp_flags = 0
+    exp_terms = set()
+    terms = {}
+    for goTerm, ontType, evidence in rec.go_refs:
+        flag = ONT_FLAGS.get(ontType, 0)
+        if not flag:
+            continue
+        code_flags |= flag
+        exp, nexp = terms.get((goTerm, ontType), (False, False))
+        if evidence in EXP_default:
+            exp_flags |= flag
+            exp_terms.add((ontType, goTerm))
+            exp = True
+        else:
+            nexp = True
+        terms[(goTerm, ontType)] = (exp, nexp)
+    return code_flags, exp_flags, exp_terms, terms
+
+def fetch_sequences(fh_sprot, rec_nos):
+    rec_nos = set(rec_nos)
+    sequences = {}
+    if not rec_nos:
+        return sequences
+    sprot_index = si.open_index(fh_sprot)
+    if sprot_index is not None:
+        for rec_no in rec_nos:
+            sequences[rec_no] = sprot_index.get_sequence(rec_no)
+        sprot_index.close()
+        return sequences
+    for rec_no, rec in enumerate(ss.parse(fh_sprot)):
+        if rec_no in rec_nos:
+            sequences[rec_no] = rec.sequence
+    return sequences
+
+def open_history(db_fname, EXP_default=set([])):
+    return AnnotationHistory(db_fname, EXP_default)
+
+class AnnotationHistory:
+    def __init__(self, db_fname, EXP_default=set([])):
+        self.name = db_fname
+        self.EXP_default = EXP_default
+        self.db = sqlite3.connect(db_fname)
+        self.db.executescript(_SCHEMA)
+        # The sorted EXP codes (see exp_codes_key in SprotScanner module);
+        # a saved key is read the same way, so a history saved with the
+        # text of a set is opened too:
+        exp_codes = ss.exp_codes_key(EXP_default)
+        saved = dict(self.db.execute('SELECT key, value FROM meta'))
+        if not saved:
+            with self.db:
+                self.db.executemany('INSERT INTO meta VALUES (?, ?)',
+                                    [('version', str(HISTORY_VERSION)),
+                                     ('exp_codes', exp_codes)])
+        elif ss.exp_codes_key(saved.get('exp_codes', '')) != exp_codes or \
+             saved.get('version') != str(HISTORY_VERSION):
+            self.db.close()
+            raise ValueError('The history ' + basename(db_fname) + \
+                             ' was built with another set of EXP codes ' + \
+                             'or schema version')
+        return None
+
+    def close(self):
+        self.db.close()
+        return None
+
+    def releases(self):
+        '''
+        This method returns the names of the releases in the history
+        in the order of the time points.
+        '''
+        return [row[0] for row in
+                self.db.execute('SELECT name FROM releases ORDER BY name')]
+
+    def __release_id(self, name):
+        row = self.db.execute('SELECT release_id FROM releases ' + \
+                              'WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            raise KeyError('Release ' + name + ' is not in the history')
+        return row[0]
+
+    def remove_release(self, name):
+        '''
+        This method removes the release name from the history.
+        '''
+        release_id = self.__release_id(name)
+        bit = 1 << (release_id - 1)
+        with self.db:
+            for table in ('entries', 'entry_accessions', 'exp_terms',
+                          'releases'):
+                self.db.execute('DELETE FROM ' + table + \
+                                ' WHERE release_id = ?', (release_id,))
+            self.db.execute('UPDATE annotations SET ' + \
+                            'exp_mask = exp_mask & ~?, ' + \
+                            'nexp_mask = nexp_mask & ~? ' + \
+                            'WHERE (exp_mask | nexp_mask) & ?',
+                            (bit, bit, bit))
+            self.db.execute('DELETE FROM annotations ' + \
+                            'WHERE exp_mask = 0 AND nexp_mask = 0')
+        return None
+
+    def add_release(self, fh_sprot, name=None):
+        '''
+        This method adds the release of the SwissProt file with handle
+        fh_sprot to the history. Only the records of this release are
+        read. A release that is already in the history is skipped if
+        its file has not changed; otherwise, it is replaced. It returns
+        True if the release is added.
+        '''
+        if name is None:
+            name = release_name(fh_sprot.name)
+        stamp = _release_stamp(fh_sprot)
+        row = self.db.execute('SELECT stamp FROM releases WHERE name = ?',
+                              (name,)).fetchone()
+        if row is not None:
+            if stamp and row[0] == stamp:
+                return False
+            self.remove_release(name)
+        used = set(r[0] for r in
+                   self.db.execute('SELECT release_id FROM releases'))
+        free = [i for i in range(1, MAX_RELEASES + 1) if i not in used]
+        if not free:
+            raise ValueError('The history ' + basename(self.name) + \
+                             ' cannot hold more than ' + \
+                             str(MAX_RELEASES) + ' releases')
+        release_id = free[0]
+        bit = 1 << (release_id - 1)
+        print('      Adding release ' + name + ' to the annotation history ...')
+        entries = []
+        entry_accessions = []
+        exp_terms = []
+        annotations = {}
+        for rec_no, rec in enumerate(ss.parse(fh_sprot)):
+            code_flags, exp_flags, rec_exp_terms, terms = \
+                _entry_rows(rec, self.EXP_default)
+            entries.append((release_id, rec_no, ';'.join(rec.accessions),
+                            ',' + ','.join(rec.taxonomy_id) + ',',
+                            code_flags, exp_flags))
+            for acc in set(acc.upper() for acc in rec.accessions):
+                entry_accessions.append((release_id, acc, rec_no))
+            for ontType, goTerm in rec_exp_terms:
+                exp_terms.append((release_id, rec_no, ontType, goTerm))
+            if not rec.accessions:
+                continue
+            for key, (exp, nexp) in terms.items():
+                key = (rec.accessions[0],) + key
+                exp_mask, nexp_mask = annotations.get(key, (0, 0))
+                annotations[key] = (exp_mask | (bit if exp else 0),
+                                    nexp_mask | (bit if nexp else 0))
+        with self.db:
+            self.db.execute('INSERT INTO releases VALUES (?, ?, ?, ?)',
+                            (release_id, name,
+                             getattr(fh_sprot, 'name', ''), stamp))
+            self.db.executemany('INSERT INTO entries ' + \
+                                'VALUES (?, ?, ?, ?, ?, ?)', entries)
+            self.db.executemany('INSERT INTO entry_accessions ' + \
+                                'VALUES (?, ?, ?)', entry_accessions)
+            self.db.executemany('INSERT INTO exp_terms ' + \
+                                'VALUES (?, ?, ?, ?)', exp_terms)
+            self.db.executemany('INSERT INTO annotations ' + \
+                                'VALUES (?, ?, ?, ?, ?) ' + \
+                                'ON CONFLICT (accession, go_term, ont) ' + \
+                                'DO UPDATE SET ' + \
+                                'exp_mask = exp_mask | excluded.exp_mask, ' + \
+                                'nexp_mask = nexp_mask | excluded.nexp_mask',
+                                [key + masks for key, masks in
+                                 annotations.items()])
+        return True
+
+    def first_releases(self, accession):
+        '''
+        This method returns a dictionary that maps each (GO term,
+        ontology) pair of the primary accession to the pair of the first
+        release in which the term was supported by an EXP evidence code
+        and the first release in which it was supported by a non-EXP
+        evidence code (None if there is no such release).
+        '''
+        releases = list(self.db.execute('SELECT name, release_id ' + \
+                                        'FROM releases ORDER BY name'))
+        first = {}
+        for goTerm, ontType, exp_mask, nexp_mask in self.db.execute(
+                'SELECT go_term, ont, exp_mask, nexp_mask ' + \
+                'FROM annotations WHERE accession = ?', (accession,)):
+            first_exp = first_nexp = None
+            for name, release_id in releases:
+                bit = 1 << (release_id - 1)
+                if first_exp is None and exp_mask & bit:
+                    first_exp = name
+                if first_nexp is None and nexp_mask & bit:
+                    first_nexp = name
+            first[(goTerm, ontType)] = (first_exp, first_nexp)
+        return first
+
+    def __entries(self, release_id, taxon_id, columns, condition=''):
+        query = 'SELECT ' + columns + ' FROM entries WHERE release_id = ?'
+        params = [release_id]
+        if taxon_id:
+            query += ' AND taxa LIKE ?'
+            params.append('%,' + taxon_id + ',%')
+        if condition:
+            query += ' AND ' + condition
+        return self.db.execute(query + ' ORDER BY rec_no', params)
+
+    def __exp_terms(self, release_id, rec_nos=None):
+        '''
+        This method returns a dictionary that maps each record number
+        of the release to the dictionary of its EXP GO terms in each
+        ontology.
+        '''
+        terms = defaultdict(lambda: defaultdict(set))
+        for rec_no, ontType, goTerm in self.db.execute(
+                'SELECT rec_no, ont, go_term FROM exp_terms ' + \
+                'WHERE release_id = ?', (release_id,)):
+            if rec_nos is None or rec_no in rec_nos:
+                terms[rec_no][ontType].add(goTerm)
+        return terms
+
+    def eval_set(self, release_t1, release_t2, taxon_id=''):
+        '''
+        This method returns the evaluation sets of the releases at t1
+        and t2: a dictionary that maps each ontology type to the list of
+        (record number at t2, accession, sorted EXP GO terms) of the
+        proteins whose annotations had non-EXP evidence codes but no EXP
+        evidence codes at t1 and gained EXP evidence codes at t2, in the
+        order of the records at t2. It also returns the number of the
+        proteins at t1 with non-EXP evidence codes in each ontology.
+        '''
+        id_t1 = self.__release_id(release_t1)
+        id_t2 = self.__release_id(release_t2)
+        # acc_flags: the ontology flags of the accessions at t1:
+        acc_flags = defaultdict(int)
+        entry_count = dict((ontType, 0) for ontType in ONT_FLAGS)
+        for accessions, code_flags, exp_flags in self.__entries(
+                id_t1, taxon_id, 'accessions, code_flags, exp_flags',
+                '(code_flags & ~exp_flags) != 0'):
+            nexp_flags = code_flags & ~exp_flags
+            for ontType, flag in ONT_FLAGS.items():
+                if nexp_flags & flag:
+                    entry_count[ontType] += 1
+            for acc in accessions.split(';') if accessions else []:
+                acc_flags[acc] |= nexp_flags
+        selected = []
+        for rec_no, accessions, exp_flags in self.__entries(
+                id_t2, taxon_id, 'rec_no, accessions, exp_flags',
+                'exp_flags != 0'):
+            accessions = accessions.split(';') if accessions else []
+            nexp_flags = 0
+            for acc in accessions:
+                nexp_flags |= acc_flags.get(acc, 0)
+            if nexp_flags & exp_flags:
+                selected.append((rec_no, accessions[0],
+                                 nexp_flags & exp_flags))
+        terms = self.__exp_terms(id_t2, set(s[0] for s in selected))
+        eval_sets = dict((ontType, []) for ontType in ONT_FLAGS)
+        for rec_no, accession, flags in selected:
+            for ontType, flag in ONT_FLAGS.items():
+                if flags & flag:
+                    eval_sets[ontType].append(
+                        (rec_no, accession, sorted(terms[rec_no][ontType])))
+        return eval_sets, entry_count
+
+    def reeval_set(self, prevES_dict, release_t2, ontType, taxon_id=''):
+        '''
+        This method returns the reevaluation set of the evaluation set
+        prevES_dict (see xTract_sp_reevalSet module) at the release at
+        t2: the list of (key of prevES_dict, record number at t2, sorted
+        new EXP GO terms) in the order of the records at t2, together
+        with the number of the records at t2 that match a key.
+        '''
+        id_t2 = self.__release_id(release_t2)
+        # matched: the first key (in sorted order) that matches each record:
+        matched = {}
+        for k in prevES_dict:
+            protName = k.split(':')[1].upper()
+            for (rec_no,) in self.db.execute(
+                    'SELECT rec_no FROM entry_accessions ' + \
+                    'WHERE release_id = ? AND accession = ?',
+                    (id_t2, protName)):
+                if rec_no not in matched or k < matched[rec_no]:
+                    matched[rec_no] = k
+        if taxon_id:
+            in_taxon = set(row[0] for row in
+                           self.__entries(id_t2, taxon_id, 'rec_no'))
+            matched = dict((rec_no, k) for rec_no, k in matched.items()
+                           if rec_no in in_taxon)
+        terms = self.__exp_terms(id_t2, set(matched))
+        reeval_set = []
+        for rec_no in sorted(matched):
+            k = matched[rec_no]
+            newGOterms = terms[rec_no][ontType] - prevES_dict[k]
+            if newGOterms:
+                reeval_set.append((k, rec_no, sorted(newGOterms)))
+        return reeval_set, len(matched)
+
+    def gene_counts(self, release, taxon_ids):
+        '''
+        This method returns the number of proteins with EXP evidence
+        codes in each ontology for each taxon id in taxon_ids at the
+        release, in the same form as count_genes_for_taxa method of
+        Count_sp_genes module.
+        '''
+        release_id = self.__release_id(release)
+        gene_counts = {}
+        for taxon_id in taxon_ids:
+            gene_count = {'MFO': 0, 'BPO': 0, 'CCO': 0}
+            for (exp_flags,) in self.__entries(release_id, taxon_id,
+                                               'exp_flags',
+                                               'exp_flags != 0'):
+                for ontType, flag in ONT_FLAGS.items():
+                    if exp_flags & flag:
+                        gene_count[ONT_NAMES[ontType]] += 1
+            gene_counts[taxon_id] = gene_count
+        return gene_counts
+
+    def gene_count_series(self, taxon_ids, releases=None):
+        '''
+        This method returns the list of (release, gene counts) for the
+        releases (all releases in the history if releases is None) in
+        the order of the time points.
+        '''
+        if releases is None:
+            releases = self.releases()
+        return [(release, self.gene_counts(release, taxon_ids))
+                for release in releases]
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
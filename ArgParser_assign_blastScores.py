@@ -25,6 +25,9 @@ import argparse
 import re
 from collections import OrderedDict
 
+import BlastScoring as bs
+import ScoreMatrix as sm
+
 def collect_args():
     """ 
     This method collects the user supplied arguments and returns them 
@@ -42,6 +45,46 @@ def collect_args():
     parser.add_argument('-O', '--output', default='', help='Provides user ' + \
         'an option to specify an output filename prefix. When not ' + \
         'specified, the program will create an output file name.')
+    parser.add_argument('-S', '--stream', action='store_true', help=' ' + \
+        'Reads the blast results one target protein at a time. The hits ' + \
+        'of each target protein must be on consecutive lines, as written ' + \
+        'by BLAST.')
+    parser.add_argument('-W', '--workers', type=int, default=1, help=' ' + \
+        'Specifies the number of worker processes that score the target ' + \
+        'proteins in parallel. The default is 1. It cannot be used ' + \
+        'with the -S option, except in the batch mode.')
+    parser.add_argument('-B', '--batch', default='', help=' Specifies ' + \
+        'path to a batch manifest. Each line of the manifest has a ' + \
+        'target protein id file, a training map file, a blast result ' + \
+        'file, and an output filename prefix separated by white space. ' + \
+        'When it is specified, the -I1, -I2, -I3, and -O options are ' + \
+        'not used, and the lines are scored in parallel with the -W ' + \
+        'option.')
+    parser.add_argument('-R', '--route', action='store_true', help=' ' + \
+        'Writes a score file for each ontology (MFO, BPO, and CCO) by ' + \
+        'the namespaces of the GO terms in the ontology file. It is ' + \
+        'used with a combined training map file (xTract_trainingSet -C) ' + \
+        'and cannot be used with the -B option.')
+    parser.add_argument('-F', '--format', default='text',
+        choices=sm.SCORE_FORMATS, help=' Specifies the format of the ' + \
+        'score files: text (target id, GO term, and score on each line) ' + \
+        'or npz (a sparse target x GO term score matrix, see ' + \
+        'ScoreMatrix module). The default is text.')
+    parser.add_argument('-M', '--schemes', default='evalue', help=' ' + \
+        'Specifies a comma separated list of the scoring schemes that ' + \
+        'are computed at once: ' + ', '.join(bs.SCORING_SCHEMES) + \
+        '. Each scheme is written to its own score file. The default ' + \
+        'is evalue (the BLAST model).')
+    parser.add_argument('-D1', '--members1', default='', help=' ' + \
+        'Specifies path to the members table of the deduplicated target ' + \
+        'sequence file (xTract_evalSet -D). The hits of each digest are ' + \
+        'expanded to its target proteins. It cannot be used with the -B ' + \
+        'option.')
+    parser.add_argument('-D2', '--members2', default='', help=' ' + \
+        'Specifies path to the members table of the deduplicated ' + \
+        'training sequence file (xTract_trainingSet -D). The hits to ' + \
+        'each digest are expanded to its training proteins. It cannot ' + \
+        'be used with the -B option.')
     return parser
 
 def extract_args(args):
@@ -54,6 +97,14 @@ def extract_args(args):
     args_dict['GOterm_fname'] = args.input2
     args_dict['blast_result'] = args.input3
     args_dict['outfile'] = args.output
+    args_dict['stream'] = args.stream
+    args_dict['workers'] = args.workers
+    args_dict['batch'] = args.batch
+    args_dict['route'] = args.route
+    args_dict['format'] = args.format
+    args_dict['schemes'] = args.schemes
+    args_dict['target_members'] = args.members1
+    args_dict['training_members'] = args.members2
     return args_dict
     
 def check_args(args_dict,parser):
@@ -65,25 +116,70 @@ def check_args(args_dict,parser):
     user_dict = OrderedDict() 
     for arg in args_dict:
         if arg == 'target_fname':
-            if args_dict[arg] == None:
+            if args_dict['batch']:
+                user_dict[arg] = args_dict[arg]
+            elif args_dict[arg] == None:
                 print ('Missing target protein id list file\n')
                 print (parser.parse_args(['--help']))
             else:
                 user_dict['target_fname'] = args_dict[arg]
         elif arg == 'GOterm_fname':
-            if args_dict[arg] == None:
+            if args_dict['batch']:
+                user_dict[arg] = args_dict[arg]
+            elif args_dict[arg] == None:
                 print ('Missing training protein id and GO term map file\n')
                 print (parser.parse_args(['--help']))
             else:
                 user_dict['GOterm_fname'] = args_dict[arg]
         elif arg == 'blast_result':
-            if args_dict[arg] == None:
+            if args_dict['batch']:
+                user_dict[arg] = args_dict[arg]
+            elif args_dict[arg] == None:
                 print ('Missing blast result file\n')
                 print (parser.parse_args(['--help']))
             else:
                 user_dict['blast_result'] = args_dict[arg]
         elif arg == 'outfile':
             user_dict[arg] = args_dict[arg]
+        elif arg == 'stream':
+            user_dict[arg] = args_dict[arg]
+        elif arg == 'workers':
+            if args_dict[arg] < 1:
+                print('The number of worker processes must be at least 1.\n')
+                print(parser.parse_args(['--help']))
+            elif args_dict[arg] > 1 and args_dict['stream'] and \
+                 not args_dict['batch']:
+                print('The -W option cannot be used with the -S option.\n')
+                print(parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+        elif arg == 'batch':
+            user_dict[arg] = args_dict[arg]
+        elif arg == 'route':
+            if args_dict[arg] and args_dict['batch']:
+                print('The -R option cannot be used with the -B option.\n')
+                print(parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+        elif arg == 'format':
+            user_dict[arg] = args_dict[arg]
+        elif arg == 'schemes':
+            schemes = []
+            for scheme in args_dict[arg].split(','):
+                scheme = scheme.strip()
+                if scheme not in bs.SCORING_SCHEMES:
+                    print('Unknown scoring scheme: ' + scheme + '\n')
+                    print(parser.parse_args(['--help']))
+                elif scheme not in schemes:
+                    schemes.append(scheme)
+            user_dict[arg] = schemes
+        elif arg == 'target_members' or arg == 'training_members':
+            if args_dict[arg] and args_dict['batch']:
+                print('The -D1 and -D2 options cannot be used with the ' + \
+                      '-B option.\n')
+                print(parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
     return user_dict
 
 def parse_args():
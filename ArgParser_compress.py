@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+'''
+    The entry point of this module is parse_args() method which calls
+    other methods to collect user supplied arguments, parses and
+    verifies them. Description of these methods are the following:
+
+    collect_args: This method collects the user supplied arguments and
+        returns them as an aprgparse ArgumentParser object.
+
+    extract_args: This method puts the user supplied arguments into an
+        ordered dictionary and returns it at the end.
+
+    check_args: This method verifies the correctness of the user supplied
+        arguments and puts them into an ordered dictionary which it returns
+        at the end.
+
+    parse_args: This method calls the above methods and returns the final
+        dictionary of the user supplied arguments to the calling point.
+'''
+
+import os
+import sys
+import argparse
+from collections import OrderedDict
+
+import Bgzf as bg
+
+def collect_args():
+    """
+    This method collects the user supplied arguments and returns them
+    at the end.
+    """
+    parser = argparse.ArgumentParser(description='Compresses ' + \
+        'UniProtKB/SwissProt releases to block-gzip (BGZF) format. The ' + \
+        'other tools read a BGZF release directly, with random access ' + \
+        'and multi-threaded decompression.')
+    parser.add_argument('-I', '--input', required=True, help=' Specifies ' + \
+        'path to a UniProtKB/SwissProt file or to a file containing a ' + \
+        'list of UniProtKB/SwissProt file names.')
+    parser.add_argument('-T', '--threads', type=int,
+        default=bg.DEFAULT_THREADS, help=' Specifies the number of ' + \
+        'threads that compress the blocks. Default is ' + \
+        str(bg.DEFAULT_THREADS) + '.')
+    parser.add_argument('-R', '--remove', action='store_true', help=' ' + \
+        'Removes the uncompressed release file after it is compressed.')
+    return parser
+
+def extract_args(args):
+    """
+     This method builds a dictionary from the user supplied arguments
+     and returns the constructed dictionary at the end.
+    """
+    args_dict = OrderedDict()
+    args_dict['input'] = args.input
+    args_dict['threads'] = args.threads
+    args_dict['remove'] = args.remove
+    return args_dict
+
+def check_args(args_dict,parser):
+    """
+    This method checks the user arguments for consistency. It builds a new
+    dictionary from these arguments and finally returns this newly created
+    dictionary.
+    """
+    user_dict = OrderedDict()
+    for arg in args_dict:
+        if arg == 'input':
+            if args_dict[arg] == None:
+                print ('Missing UniProtKB/SwissProt file\n')
+                print (parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+        elif arg == 'threads':
+            if args_dict[arg] < 1:
+                print ('Number of threads must be at least 1\n')
+                print (parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+        elif arg == 'remove':
+            user_dict[arg] = args_dict[arg]
+    return user_dict
+
+def parse_args():
+    """
+    This is the entry point for the other methods in this module. It
+      1. invokes collect_args to collect the user arguments.
+      2. invokes extract_args to put those arguments into an
+         ordered dictionary.
+      3. checks the consistency of those arguments by invoking
+         check_args which returns an ordered dictionary of correct
+         arguments.
+      4. returns the dictionary at the end.
+    """
+    # Collect user arguments:
+    parser = collect_args()
+    args_dict = {}
+    args, unknown = parser.parse_known_args()
+    if len(unknown) > 0:
+        print ('\n*********************************')
+        print ("Invalid Arguments")
+        print ('*********************************\n')
+        print (parser.parse_args(['--help']))
+    # Places the user arguments into a dictionary:
+    args_dict = extract_args(args)
+    # Checks the consistency of the user args:
+    user_dict = check_args(args_dict,parser)
+    return user_dict
+
+if __name__ == '__main__':
+    print (sys.argv[0] + ':')
+    print (__doc__)
+    sys.exit(0)
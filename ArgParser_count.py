@@ -41,6 +41,19 @@ def collect_args():
     parser.add_argument('-O', '--output', default='', help='Provides user ' + \
         'an option to specify an output filename prefix. When not ' + \
         'specified, the program will create an output file name.')
+    parser.add_argument('-W', '--workers', type=int, default=1, help=' ' + \
+        'Specifies the number of worker processes that read the ' + \
+        'UniProtKB/SwissProt files in parallel. The default is 1.')
+    parser.add_argument('-R', '--releases', type=int, default=1, help=' ' + \
+        'Specifies the number of UniProtKB/SwissProt files (releases) ' + \
+        'that are processed concurrently. The default is 1.')
+    parser.add_argument('-M', '--memory', type=int, default=0, help=' ' + \
+        'Specifies the memory budget (in MB) for the releases that are ' + \
+        'processed concurrently. The default is 0 (no limit).')
+    parser.add_argument('-Z', '--compress', default='gzip',
+        choices=['gzip', 'bgzf'], help=' Specifies the compression of ' + \
+        'the downloaded UniProtKB/SwissProt files: gzip (as downloaded) ' + \
+        'or block-gzip (BGZF). The default is gzip.')
     return parser
 
 def extract_args(args):
@@ -52,6 +65,10 @@ def extract_args(args):
     args_dict['t1'] = args.input1
     args_dict['t2'] = args.input2
     args_dict['outfile'] = args.output
+    args_dict['workers'] = args.workers
+    args_dict['releases'] = args.releases
+    args_dict['memory'] = args.memory
+    args_dict['compress'] = args.compress
     return args_dict
     
 def check_args(args_dict,parser):
@@ -77,6 +94,27 @@ def check_args(args_dict,parser):
                 user_dict['t2'] = args_dict[arg]
         elif arg == 'outfile':
             user_dict[arg] = args_dict[arg]
+        elif arg == 'workers':
+            if args_dict[arg] < 1:
+                print('The number of worker processes must be at least 1.\n')
+                print(parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+        elif arg == 'releases':
+            if args_dict[arg] < 1:
+                print('The number of concurrent releases must be at ' + \
+                      'least 1.\n')
+                print(parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+        elif arg == 'memory':
+            if args_dict[arg] < 0:
+                print('The memory budget must not be negative.\n')
+                print(parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+        elif arg == 'compress':
+            user_dict[arg] = args_dict[arg]
     return user_dict
 
 def parse_args():
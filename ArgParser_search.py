@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+'''
+    The entry point of this module is parse_args() method which calls
+    other methods to collect user supplied arguments, parses and
+    verifies them. Description of these methods are the following:
+
+    collect_args: This method collects the user supplied arguments and
+        returns them as an aprgparse ArgumentParser object.
+
+    extract_args: This method puts the user supplied arguments into an
+        ordered dictionary and returns it at the end.
+
+    check_args: This method verifies the correctness of the user supplied
+        arguments and puts them into an ordered dictionary which it returns
+        at the end.
+
+    parse_args: This method calls the above methods and returns the final
+        dictionary of the user supplied arguments to the calling point.
+'''
+
+import os
+import sys
+import argparse
+from collections import OrderedDict
+
+import KmerSearch as ks
+
+def collect_args():
+    """
+    This method collects the user supplied arguments and returns them
+    at the end.
+    """
+    parser = argparse.ArgumentParser(description='Search the target ' + \
+        'sequences against the training sequences and write the hits ' + \
+        'in the tabular format of the BLAST results.')
+    parser.add_argument('-I1', '--input1', help=' Specifies path to the ' + \
+        'target sequence (FASTA) file. This opton is mandatory.')
+    parser.add_argument('-I2', '--input2', help=' Specifies path to the ' + \
+        'training sequence (FASTA) file. This opton is mandatory.')
+    parser.add_argument('-O', '--output', default='', help='Provides user ' + \
+        'an option to specify an output filename prefix. When not ' + \
+        'specified, the program will create an output file name.')
+    parser.add_argument('-E', '--evalue', type=float,
+        default=ks.E_VALUE_CUTOFF, help=' Specifies the E-value cut off ' + \
+        'of the hits. The default is ' + str(ks.E_VALUE_CUTOFF) + '.')
+    parser.add_argument('-M', '--max_target_seqs', type=int,
+        default=ks.MAX_TARGET_SEQS, help=' Specifies the maximum number ' + \
+        'of hits of a target sequence. The default is ' + \
+        str(ks.MAX_TARGET_SEQS) + '.')
+    parser.add_argument('-W', '--workers', type=int, default=1, help=' ' + \
+        'Specifies the number of worker processes that search the ' + \
+        'target sequences in parallel. The default is 1.')
+    parser.add_argument('-D2', '--members2', default='', help=' ' + \
+        'Specifies path to the members table of the deduplicated ' + \
+        'training sequence file (xTract_trainingSet -D). The hits are ' + \
+        'written for the training proteins of each sequence, and each ' + \
+        'sequence is counted once for each of its proteins in the size ' + \
+        'of the database and in the maximum number of candidates and ' + \
+        'hits, so that the hits are the same as for the full training ' + \
+        'sequence file.')
+    parser.add_argument('-Z', '--dbsize', type=int, default=0, help=' ' + \
+        'Specifies the size of the database (the number of residues) ' + \
+        'used for the E-values, for example, the size of the full ' + \
+        'training set when a shard of it is searched. When not ' + \
+        'specified, the size of the training sequence file is used.')
+    return parser
+
+def extract_args(args):
+    """
+     This method builds a dictionary from the user supplied arguments
+     and returns the constructed dictionary at the end.
+    """
+    args_dict = OrderedDict()
+    args_dict['target_fname'] = args.input1
+    args_dict['training_fname'] = args.input2
+    args_dict['outfile'] = args.output
+    args_dict['evalue'] = args.evalue
+    args_dict['max_target_seqs'] = args.max_target_seqs
+    args_dict['workers'] = args.workers
+    args_dict['training_members'] = args.members2
+    args_dict['dbsize'] = args.dbsize
+    return args_dict
+
+def check_args(args_dict,parser):
+    """
+    This method checks the user arguments for consistency. It builds a new
+    dictionary from these arguments and finally returns this newly created
+    dictionary.
+    """
+    user_dict = OrderedDict()
+    for arg in args_dict:
+        if arg == 'target_fname':
+            if args_dict[arg] == None:
+                print ('Missing target sequence file\n')
+                print (parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+        elif arg == 'training_fname':
+            if args_dict[arg] == None:
+                print ('Missing training sequence file\n')
+                print (parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+        elif arg == 'outfile':
+            user_dict[arg] = args_dict[arg]
+        elif arg == 'evalue':
+            if args_dict[arg] <= 0:
+                print('The E-value cut off must be positive.\n')
+                print(parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+        elif arg == 'max_target_seqs' or arg == 'workers':
+            if args_dict[arg] < 1:
+                print('The ' + arg + ' option must be at least 1.\n')
+                print(parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+        elif arg == 'training_members':
+            user_dict[arg] = args_dict[arg]
+        elif arg == 'dbsize':
+            if args_dict[arg] < 0:
+                print('The size of the database must be positive.\n')
+                print(parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
+    return user_dict
+
+def parse_args():
+    """
+    This is the entry point for the other methods in this module. It
+      1. invokes collect_args to collect the user arguments.
+      2. invokes extract_args to put those arguments into an
+         ordered dictionary.
+      3. checks the consistency of those arguments by invoking
+         check_args which returns an ordered dictionary of correct
+         arguments.
+      4. returns the dictionary at the end.
+    """
+    # Collect user arguments:
+    parser = collect_args()
+    args_dict = {}
+    args, unknown = parser.parse_known_args()
+    if len(unknown) > 0:
+        print ('\n*********************************')
+        print ("Invalid Arguments")
+        print ('*********************************\n')
+        print (parser.parse_args(['--help']))
+    # Places the user arguments into a dictionary:
+    args_dict = extract_args(args)
+    # Checks the consistency of the user args:
+    user_dict = check_args(args_dict,parser)
+    return user_dict
+
+if __name__ == '__main__':
+    print (sys.argv[0] + ':')
+    print (__doc__)
+    sys.exit(0)
@@ -42,6 +42,26 @@ def collect_args():
     parser.add_argument('-O', '--output', default='', help='Provides user ' + \
         'an option to specify an output filename prefix. When not ' + \
         'specified, the program will create an output file name.')
+    parser.add_argument('-W', '--workers', type=int, default=1, help=' ' + \
+        'Specifies the number of worker processes that read the ' + \
+        'UniProtKB/SwissProt files in parallel. The default is 1.')
+    parser.add_argument('-H', '--history', default='', help=' Specifies ' + \
+        'an annotation history database (see Build_history) in the ' + \
+        'workspace. The releases are added to the history if they are ' + \
+        'not there yet, and the sets are looked up in the history.')
+    parser.add_argument('-Z', '--compress', default='',
+        choices=['gzip', 'bgzf'], help=' Compresses the output files ' + \
+        'with gzip or block-gzip (BGZF). The extension .gz is added to ' + \
+        'the output file names.')
+    parser.add_argument('-D', '--dedup', action='store_true', help=' ' + \
+        'Writes each distinct sequence once, under the digest of its ' + \
+        'residues, and a members table (.members) with the ids of the ' + \
+        'sequences of each digest.')
+    parser.add_argument('-S', '--shards', type=int, default=1, help=' ' + \
+        'Splits each sequence file into the given number of shards with ' + \
+        'about the same number of residues, and writes a shard table ' + \
+        '(.shards) to merge the hits of the shards with Merge_hits. The ' + \
+        'default is 1 (no shards).')
     return parser
 
 def extract_args(args):
@@ -53,7 +73,12 @@ def extract_args(args):
     args_dict['t1'] = args.input1
     args_dict['t2'] = args.input2
     args_dict['outfile'] = args.output
+    args_dict['workers'] = args.workers
     args_dict['g'] = args.organism
+    args_dict['history'] = args.history
+    args_dict['compress'] = args.compress
+    args_dict['dedup'] = args.dedup
+    args_dict['shards'] = args.shards
     return args_dict
     
 def check_args(args_dict,parser):
@@ -78,8 +103,26 @@ def check_args(args_dict,parser):
                 user_dict['t2'] = args_dict[arg]
         elif arg == 'outfile':
             user_dict[arg] = args_dict[arg]
+        elif arg == 'workers':
+            if args_dict[arg] < 1:
+                print('The number of worker processes must be at least 1.\n')
+                print(parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
         elif arg == 'g':
             user_dict[arg] = args_dict[arg]
+        elif arg == 'history':
+            user_dict[arg] = args_dict[arg]
+        elif arg == 'compress':
+            user_dict[arg] = args_dict[arg]
+        elif arg == 'dedup':
+            user_dict[arg] = args_dict[arg]
+        elif arg == 'shards':
+            if args_dict[arg] < 1:
+                print('The number of shards must be at least 1.\n')
+                print(parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = args_dict[arg]
         elif arg == 'Taxon_ID':
             if 'all' in args_dict[arg] or len(args_dict[arg]) == 0:
                 user_dict[arg] = set([])
@@ -31,17 +31,28 @@ def collect_args():
     parser = argparse.ArgumentParser(description='Generate a test set of ' + \
         'sequences by comparing two UniProt-SwissProt files at two time points.')
     parser.add_argument('-I1', '--input1', help=' Specifies path to a ' + \
-        'map file at time t1. This opton is mandatory.')
+        'map file at time t1. This opton is mandatory. Several map ' + \
+        'files are separated by commas, one for each ontology of -N.')
     parser.add_argument('-I2', '--input2', help=' Specifies path to a ' + \
         'UniProt-SwissProt file at time t2 (>t1). This opton is mandatory.')
-    parser.add_argument('-N', '--ontology', type=str, choices=['F', 'P', 'C'], \
-         required=True, help=' Specifies an ontology name. ' + \
-         'This opton is mandatory.')
+    parser.add_argument('-N', '--ontology', type=str, \
+         required=True, help=' Specifies an ontology name (F, P, or C). ' + \
+         'This opton is mandatory. Several ontologies are separated by ' + \
+         'commas, for example, F,P,C: their reevaluation sets are ' + \
+         'created in a single pass over the file at t2.')
     parser.add_argument('-G','--organism', default='', help=' Specifies an ' + \
        'organism id, for example, 559292 for Saccharomyces cerevisiae.')
     parser.add_argument('-O', '--output', default='', help='Provides user ' + \
         'an option to specify an output filename prefix. When not ' + \
         'specified, the program will create an output file name.')
+    parser.add_argument('-H', '--history', default='', help=' Specifies ' + \
+        'an annotation history database (see Build_history) in the ' + \
+        'workspace. The releases are added to the history if they are ' + \
+        'not there yet, and the sets are looked up in the history.')
+    parser.add_argument('-Z', '--compress', default='',
+        choices=['gzip', 'bgzf'], help=' Compresses the output files ' + \
+        'with gzip or block-gzip (BGZF). The extension .gz is added to ' + \
+        'the output file names.')
     return parser
 
 def extract_args(args):
@@ -55,6 +66,8 @@ def extract_args(args):
     args_dict['Aspect'] = args.ontology
     args_dict['g'] = args.organism
     args_dict['outfile'] = args.output
+    args_dict['history'] = args.history
+    args_dict['compress'] = args.compress
     return args_dict
     
 def check_args(args_dict,parser):
@@ -70,7 +83,8 @@ def check_args(args_dict,parser):
                 print ('Missing Uniprot-SwissProt file\n')
                 print (parser.parse_args(['--help']))
             else:
-                user_dict['t1'] = args_dict[arg]
+                user_dict['t1'] = [x.strip() for x in
+                                   args_dict[arg].split(',')]
         elif arg == 't2':
             if args_dict[arg] == None:
                 print ('Missing Uniprot-SwissProt file\n')
@@ -78,11 +92,25 @@ def check_args(args_dict,parser):
             else:
                 user_dict['t2'] = args_dict[arg]
         elif arg == 'Aspect':
-            user_dict[arg] = args_dict[arg]
+            ontologies = [x.strip().upper() for x in
+                          args_dict[arg].split(',')]
+            if not set(ontologies) <= set(['F', 'P', 'C']) or \
+               len(set(ontologies)) != len(ontologies):
+                print ('Ontology names must be F, P, or C (each once)\n')
+                print (parser.parse_args(['--help']))
+            elif len(ontologies) != len(user_dict.get('t1', [])):
+                print ('One map file at t1 is needed for each ontology\n')
+                print (parser.parse_args(['--help']))
+            else:
+                user_dict[arg] = ontologies
         elif arg == 'outfile':
             user_dict[arg] = args_dict[arg]
         elif arg == 'g':
             user_dict[arg] = args_dict[arg]
+        elif arg == 'history':
+            user_dict[arg] = args_dict[arg]
+        elif arg == 'compress':
+            user_dict[arg] = args_dict[arg]
         elif arg == 'Taxon_ID':
             if 'all' in args_dict[arg] or len(args_dict[arg]) == 0:
                 user_dict[arg] = set([])
@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+'''
+    This module reads and writes block-gzip (BGZF) files, the gzip variant
+    used by samtools/htslib. A BGZF file is a series of gzip members (blocks)
+    of at most 64 KB of uncompressed data, so it can be read by any gzip
+    reader, decompressed block by block in parallel, and accessed randomly
+    through the table of the block offsets. The block table is saved next
+    to the BGZF file in the .gzi format of htslib. It has the following
+    methods and classes:
+
+    compress_file(fh_in, bgzf_fname, threads=DEFAULT_THREADS):
+        This method compresses the data read from the binary file handle
+        fh_in into the BGZF file bgzf_fname and saves the block table to
+        bgzf_fname + INDEX_EXT. The blocks are compressed in threads.
+
+    is_bgzf(fname):
+        This method returns True if the file fname starts with a BGZF
+        block. Otherwise, it returns False.
+
+    load_blocks(bgzf_fname):
+        This method returns the block table (compressed offsets and
+        uncompressed offsets of the blocks) of a BGZF file. It loads the
+        table from the .gzi file if it is up to date. Otherwise, it builds
+        the table by going over the block headers and saves it.
+
+    make_virtual_offset(coffset, uoffset) and split_virtual_offset(voffset):
+        These methods convert between a virtual offset and the pair of the
+        compressed offset of a block and an offset within the uncompressed
+        data of that block, as defined by the BGZF format.
+
+    The BgzfReader class is a binary file reader of a BGZF file. It
+    decompresses the blocks in a pool of threads ahead of the reader and
+    seeks to an uncompressed offset (or a virtual offset) by using the
+    block table.
+
+    The BgzfWriter class is a binary file writer of a BGZF file. It
+    compresses the blocks in a pool of threads and saves the block table
+    when it is closed. compress_file writes through a BgzfWriter.
+'''
+import os
+import struct
+import sys
+import zlib
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Extension of the block table (htslib .gzi format):
+INDEX_EXT = '.gzi'
+# Uncompressed size of a block (the same as htslib):
+BLOCK_DATA_SIZE = 0xff00
+# Compression level of the blocks:
+COMPRESS_LEVEL = 6
+# Default number of threads that compress or decompress the blocks:
+DEFAULT_THREADS = min(4, os.cpu_count() or 1)
+# Header of a BGZF block up to the BSIZE field:
+_HEADER = b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00'
+_HEADER_SIZE = len(_HEADER) + 2
+# Empty block that marks the end of a BGZF file:
+EOF_BLOCK = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000' + \
+                          '000000000000')
+
+def make_virtual_offset(coffset, uoffset):
+    return (coffset << 16) | uoffset
+
+def split_virtual_offset(voffset):
+    return voffset >> 16, voffset & 0xffff
+
+def _compress_block(data):
+    '''
+    This method returns the BGZF block of the uncompressed bytes data.
+    '''
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    if len(cdata) + _HEADER_SIZE + 8 > 0x10000:
+        # Data that does not compress is stored as it is:
+        compressor = zlib.compressobj(0, zlib.DEFLATED, -15)
+        cdata = compressor.compress(data) + compressor.flush()
+    bsize = len(cdata) + _HEADER_SIZE + 8
+    return _HEADER + struct.pack('<H', bsize - 1) + cdata + \
+           struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data))
+
+def _decompress_block(block):
+    '''
+    This method returns the uncompressed bytes of a BGZF block.
+    '''
+    data = zlib.decompress(block[_HEADER_SIZE:-8], -15)
+    crc, isize = struct.unpack('<II', block[-8:])
+    if isize != len(data) or crc != zlib.crc32(data) & 0xffffffff:
+        raise ValueError('Corrupted BGZF block')
+    return data
+
+def _read_block(fh):
+    '''
+    This method reads the next block from the file handle fh of a BGZF
+    file. It returns None at the end of the file.
+    '''
+    header = fh.read(_HEADER_SIZE)
+    if not header:
+        return None
+    if len(header) < _HEADER_SIZE or header[:4] != _HEADER[:4] or \
+       header[12:14] != b'BC':
+        raise ValueError('Not a BGZF block')
+    bsize = struct.unpack('<H', header[-2:])[0] + 1
+    return header + fh.read(bsize - _HEADER_SIZE)
+
+def __read_pieces(fh_in, size):
+    while True:
+        data = fh_in.read(size)
+        if not data:
+            break
+        yield data
+    return None
+
+def _save_blocks(bgzf_fname, coffsets, uoffsets):
+    '''
+    This method saves the block table in the .gzi format: the number
+    of blocks after the first one, followed by the (compressed offset,
+    uncompressed offset) pairs of those blocks.
+    '''
+    table = np.empty((len(coffsets) - 1, 2), dtype='<u8')
+    table[:, 0] = coffsets[1:]
+    table[:, 1] = uoffsets[1:]
+    with open(bgzf_fname + INDEX_EXT, 'wb') as fh:
+        fh.write(struct.pack('<Q', len(table)))
+        fh.write(table.tobytes())
+    return None
+
+def compress_file(fh_in, bgzf_fname, threads=DEFAULT_THREADS):
+    with BgzfWriter(bgzf_fname, threads) as writer:
+        for data in __read_pieces(getattr(fh_in, 'buffer', fh_in),
+                                  BLOCK_DATA_SIZE):
+            writer.write(data)
+    return bgzf_fname
+
+def is_bgzf(fname):
+    try:
+        with open(fname, 'rb') as fh:
+            header = fh.read(_HEADER_SIZE)
+    except OSError:
+        return False
+    return len(header) == _HEADER_SIZE and header[:4] == _HEADER[:4] and \
+           header[12:14] == b'BC'
+
+def load_blocks(bgzf_fname):
+    index_fname = bgzf_fname + INDEX_EXT
+    if os.path.exists(index_fname) and \
+       os.path.getmtime(index_fname) >= os.path.getmtime(bgzf_fname):
+        with open(index_fname, 'rb') as fh:
+            count = struct.unpack('<Q', fh.read(8))[0]
+            table = np.frombuffer(fh.read(16 * count), dtype='<u8')
+        table = table.reshape(count, 2)
+        coffsets = [0] + table[:, 0].tolist()
+        uoffsets = [0] + table[:, 1].tolist()
+        return coffsets, uoffsets
+    coffsets = [0]
+    uoffsets = [0]
+    with open(bgzf_fname, 'rb') as fh:
+        while True:
+            header = fh.read(_HEADER_SIZE)
+            if len(header) < _HEADER_SIZE:
+                break
+            bsize = struct.unpack('<H', header[-2:])[0] + 1
+            fh.seek(bsize - _HEADER_SIZE - 4, os.SEEK_CUR)
+            isize = struct.unpack('<I', fh.read(4))[0]
+            coffsets.append(coffsets[-1] + bsize)
+            uoffsets.append(uoffsets[-1] + isize)
+    coffsets = coffsets[:-1]
+    uoffsets = uoffsets[:-1]
+    try:
+        _save_blocks(bgzf_fname, coffsets, uoffsets)
+    except OSError:
+        pass
+    return coffsets, uoffsets
+
+class BgzfReader:
+    def __init__(self, bgzf_fname, threads=DEFAULT_THREADS):
+        self.name = bgzf_fname
+        self.fh = open(bgzf_fname, 'rb')
+        self.threads = max(1, threads)
+        self.executor = None
+        if self.threads > 1:
+            self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        # Blocks being decompressed ahead of the reader:
+        self.pending = deque()
+        self.data = b''
+        self.data_pos = 0
+        # Uncompressed offset of the start of the buffer:
+        self.offset = 0
+        self.blocks = None
+        return None
+
+    def __block_table(self):
+        if self.blocks is None:
+            self.blocks = load_blocks(self.name)
+        return self.blocks
+
+    def __next_data(self):
+        '''
+        This method returns the uncompressed data of the next block, or
+        None at the end of the file.
+        '''
+        if self.executor is None:
+            block = _read_block(self.fh)
+            return None if block is None else _decompress_block(block)
+        # Keep the pool busy with the blocks that follow:
+        while len(self.pending) < 2 * self.threads:
+            block = _read_block(self.fh)
+            if block is None:
+                break
+            self.pending.append(self.executor.submit(_decompress_block,
+                                                     block))
+        if not self.pending:
+            return None
+        return self.pending.popleft().result()
+
+    def read(self, size=-1):
+        pieces = []
+        available = len(self.data) - self.data_pos
+        while size < 0 or available < size:
+            data = self.__next_data()
+            if data is None:
+                break
+            pieces.append(data)
+            available += len(data)
+        if pieces:
+            rest = self.data[self.data_pos:]
+            self.offset += self.data_pos
+            self.data = rest + b''.join(pieces)
+            self.data_pos = 0
+        if size < 0:
+            size = len(self.data) - self.data_pos
+        data = self.data[self.data_pos:self.data_pos + size]
+        self.data_pos += len(data)
+        return data
+
+    def tell(self):
+        return self.offset + self.data_pos
+
+    def seek(self, offset, whence=0):
+        '''
+        This method moves the reader to the uncompressed offset offset.
+        '''
+        if whence == os.SEEK_CUR:
+            offset += self.tell()
+        elif whence != os.SEEK_SET:
+            raise ValueError('Only absolute and relative seeks are supported')
+        if self.offset <= offset <= self.offset + len(self.data):
+            self.data_pos = offset - self.offset
+            return offset
+        coffsets, uoffsets = self.__block_table()
+        block_no = max(0, bisect_right(uoffsets, offset) - 1)
+        self.__reset(coffsets[block_no], uoffsets[block_no])
+        self.read(offset - uoffsets[block_no])
+        return offset
+
+    def seek_virtual(self, voffset):
+        '''
+        This method moves the reader to the virtual offset voffset.
+        '''
+        coffset, within = split_virtual_offset(voffset)
+        coffsets, uoffsets = self.__block_table()
+        block_no = coffsets.index(coffset)
+        return self.seek(uoffsets[block_no] + within)
+
+    def virtual_offset(self, offset):
+        '''
+        This method returns the virtual offset of the uncompressed
+        offset offset.
+        '''
+        coffsets, uoffsets = self.__block_table()
+        block_no = max(0, bisect_right(uoffsets, offset) - 1)
+        return make_virtual_offset(coffsets[block_no],
+                                   offset - uoffsets[block_no])
+
+    def size(self):
+        '''
+        This method returns the size of the uncompressed data.
+        '''
+        coffsets, uoffsets = self.__block_table()
+        with open(self.name, 'rb') as fh:
+            fh.seek(coffsets[-1])
+            last = _read_block(fh)
+        return uoffsets[-1] + (struct.unpack('<I', last[-4:])[0]
+                               if last is not None else 0)
+
+    def __reset(self, coffset, uoffset):
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.fh.seek(coffset)
+        self.data = b''
+        self.data_pos = 0
+        self.offset = uoffset
+        return None
+
+    def close(self):
+        self.__reset(0, 0)
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.fh.close()
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+class BgzfWriter:
+    def __init__(self, bgzf_fname, threads=DEFAULT_THREADS):
+        self.name = bgzf_fname
+        self.tmp_fname = bgzf_fname + '.tmp'
+        self.fh = open(self.tmp_fname, 'wb')
+        self.threads = max(1, threads)
+        self.executor = None
+        if self.threads > 1:
+            self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        # Blocks being compressed, in the order of the data:
+        self.pending = deque()
+        # Data that does not fill a block yet:
+        self.data = bytearray()
+        self.coffsets = [0]
+        self.uoffsets = [0]
+        return None
+
+    def __write_block(self, block):
+        self.fh.write(block)
+        self.coffsets.append(self.coffsets[-1] + len(block))
+        self.uoffsets.append(self.uoffsets[-1] + \
+                             struct.unpack('<I', block[-4:])[0])
+        return None
+
+    def __submit(self, data):
+        if self.executor is None:
+            self.__write_block(_compress_block(data))
+            return None
+        self.pending.append(self.executor.submit(_compress_block, data))
+        # Write out the blocks that are done, keeping the pool busy:
+        while len(self.pending) > 2 * self.threads or \
+              (self.pending and self.pending[0].done()):
+            self.__write_block(self.pending.popleft().result())
+        return None
+
+    def write(self, data):
+        '''
+        This method writes the bytes data. The data is compressed in
+        blocks of BLOCK_DATA_SIZE bytes.
+        '''
+        self.data += data
+        while len(self.data) >= BLOCK_DATA_SIZE:
+            self.__submit(bytes(self.data[:BLOCK_DATA_SIZE]))
+            del self.data[:BLOCK_DATA_SIZE]
+        return len(data)
+
+    @property
+    def closed(self):
+        return self.fh.closed
+
+    def flush(self):
+        '''
+        This method flushes the blocks that are written out. The data
+        that does not fill a block is kept until the writer is closed.
+        '''
+        self.fh.flush()
+        return None
+
+    def close(self):
+        '''
+        This method writes out the rest of the data and the end of file
+        block, and saves the block table next to the BGZF file.
+        '''
+        if self.fh.closed:
+            return None
+        if self.data:
+            self.__submit(bytes(self.data))
+            self.data = bytearray()
+        while self.pending:
+            self.__write_block(self.pending.popleft().result())
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.fh.write(EOF_BLOCK)
+        self.fh.close()
+        os.replace(self.tmp_fname, self.name)
+        # The last entries are the end of the data, not the start of a
+        # block:
+        _save_blocks(self.name, self.coffsets[:-1], self.uoffsets[:-1])
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
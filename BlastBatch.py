@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+'''
+    This module has the following methods to score several (target map,
+    BLAST result file) pairs by the BLAST model in one process. The map
+    file between the training protein ids and the GO terms of each
+    ontology is read once and shared by all the pairs that use it.
+
+    read_manifest(fh_manifest):
+        This method reads a batch manifest (file handle fh_manifest) and
+        returns the list of its jobs. Each line of the manifest has four
+        columns separated by white space:
+
+            target map  training map  BLAST result file  output prefix
+
+        The empty lines and the lines that start with '#' are skipped. It
+        raises a ValueError for a line that does not have four columns.
+
+    load_GOterm_indexes(jobs):
+        This method reads each distinct training map of the jobs once and
+        returns a dictionary that maps the name of the training map to its
+        training protein -> GO terms index (see BlastScoring module).
+
+    score_job(job):
+        This method scores the targets of a job and writes the score files
+        of the job. A job is a tuple (target map, training map, BLAST
+        result file, score files, stream, score format), where score files
+        is a dictionary that maps each scoring scheme (see BlastScoring
+        module) to its score file; when stream is True, the BLAST results
+        are read one target at a time, and the score files are written in
+        the score format of ScoreMatrix module (text or npz). It returns
+        the list of the score files.
+
+    score_jobs(jobs, workers=1):
+        This method is the entry point of this module. It loads the
+        training maps of the jobs and scores the jobs, in a pool of worker
+        processes when workers is more than 1. The jobs are independent,
+        so they are scored in any order; it yields the lists of the score
+        file names in the order of the jobs.
+'''
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import BlastScoring as bs
+import BlastTab as bt
+import ScoreMatrix as sm
+
+# Number of columns of a line of a batch manifest:
+MANIFEST_COLUMNS = 4
+
+# The training protein -> GO terms indexes shared by the jobs scored in a
+# worker process:
+_shared = dict()
+
+def read_manifest(fh_manifest):
+    jobs = []
+    for line_no, line in enumerate(fh_manifest, 1):
+        line = line.strip()
+        # Skip any empty line or comment in the manifest:
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split()
+        if len(fields) != MANIFEST_COLUMNS:
+            raise ValueError('Line ' + str(line_no) + ' of the manifest ' + \
+                             'does not have ' + str(MANIFEST_COLUMNS) + \
+                             ' columns: ' + line)
+        jobs.append(tuple(fields))
+    return jobs
+
+def load_GOterm_indexes(jobs):
+    GOterm_indexes = dict()
+    for job in jobs:
+        GOterm_fname = job[1]
+        if GOterm_fname in GOterm_indexes:
+            continue
+        fh_trGOterms = open(GOterm_fname, 'r')
+        GOterm_indexes[GOterm_fname] = bs.load_GOterm_index(fh_trGOterms)
+        fh_trGOterms.close()
+    return GOterm_indexes
+
+def __init_worker(GOterm_indexes):
+    '''
+    This method keeps the training protein -> GO terms indexes in a worker
+    process for all the jobs scored by it.
+    '''
+    _shared['GOterm_indexes'] = GOterm_indexes
+    return None
+
+def __import_target_ids(target_fname):
+    '''
+    This method returns the dictionary of the target ids in the target
+    map file target_fname.
+    '''
+    target_id_dict = dict()
+    fh_targets = open(target_fname, 'r')
+    for line in fh_targets:
+        target_id_dict[line.strip().split('\t')[0]] = 1
+    fh_targets.close()
+    return target_id_dict
+
+def score_job(job):
+    target_fname, GOterm_fname, blast_result_fname, score_fnames, stream, \
+        score_format = job
+    GOterm_index = _shared['GOterm_indexes'][GOterm_fname]
+    schemes = list(score_fnames)
+    naive = None
+    if 'naive' in schemes:
+        naive = bs.naive_scores(GOterm_index)
+    target_id_dict = __import_target_ids(target_fname)
+    blast_hits = None
+    score_lines = None
+    fh_bresult = open(blast_result_fname, 'r')
+    if stream:
+        score_lines = bs.stream_scores(fh_bresult, target_id_dict,
+                                       GOterm_index, schemes, naive)
+    else:
+        blast_hits = bt.read_hits(fh_bresult, target_id_dict)
+    fh_bresult.close()
+    writers = OrderedDict((scheme, sm.open_scores(score_fnames[scheme],
+                                                  score_format))
+                          for scheme in schemes)
+    fh_targets = open(target_fname, 'r')
+    bs.write_scores(fh_targets, writers, blast_hits, GOterm_index,
+                    score_lines, naive)
+    for scheme in schemes:
+        writers[scheme].close()
+    fh_targets.close()
+    return [score_fnames[scheme] for scheme in schemes]
+
+def score_jobs(jobs, workers=1):
+    GOterm_indexes = load_GOterm_indexes(jobs)
+    if workers <= 1:
+        __init_worker(GOterm_indexes)
+        for job in jobs:
+            yield score_job(job)
+        return None
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=__init_worker,
+                             initargs=(GOterm_indexes,)) as executor:
+        # executor.map returns the results in the order of the jobs:
+        for score_fnames in executor.map(score_job, jobs):
+            yield score_fnames
+    return None
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
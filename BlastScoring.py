@@ -0,0 +1,523 @@
+#!/usr/bin/env python
+'''
+    This module has the following methods to assign the prediction
+    scores of the BLAST model (Jiang Y et al, ECCB 2014 Vol 30) to the
+    associations between the target proteins and the GO terms of the
+    training proteins. The score of a (target, GO term) pair is the
+    largest -log(E-value) among the BLAST hits of the target to the
+    training proteins annotated with the GO term, normalized by
+    MAX_RSCORE. The same pass over the hits of a target also computes the
+    scores of the other scoring schemes in SCORING_SCHEMES that are used
+    as baselines:
+
+        evalue:   the score of the BLAST model described above.
+        identity: the largest percent identity (divided by 100) among the
+                  hits to the training proteins annotated with the GO term.
+        knn:      the sum of the bit scores of the hits to the training
+                  proteins annotated with the GO term divided by the sum of
+                  the bit scores of all the hits of the target (BLAST-KNN).
+                  The best hit to each training protein is counted once.
+        naive:    the fraction of the training proteins annotated with the
+                  GO term (the same scores for every target).
+
+    Only the hits with E-values less than E_VALUE_MAX are used by the
+    identity and knn schemes, and the knn scheme needs the bitscore column
+    of the BLAST results (see BlastTab module).
+
+    transform_evalue(e_value):
+        This method returns the transformed score of a BLAST hit with
+        E-value e_value: MAX_RSCORE for an E-value that is not larger
+        than E_VALUE_MIN, -log(E-value) (rounded to two decimals) for an
+        E-value less than E_VALUE_MAX, and 0 otherwise.
+
+    load_GOterm_index(fh_map, training_ids=None):
+        This method reads the map file between the training protein ids
+        and their GO terms (file handle fh_map) in a single pass and
+        returns a dictionary that maps each training protein id to the
+        list of its GO terms. When the set training_ids is supplied, only
+        the training proteins in that set (for example, the ones that
+        show up in the BLAST results) are kept.
+
+    load_ontology_index(fh_map, training_ids=None):
+        This method reads a combined map file of all three ontologies
+        (file handle fh_map, see xTract_sp_trainingSet module), whose
+        fourth column names the ontology of the GO terms on each line, and
+        returns a dictionary that maps each training protein id to a
+        dictionary of the lists of its GO terms in each ontology. The
+        knn and naive schemes use it to normalize the scores of each
+        ontology by the training proteins annotated in that ontology only,
+        so that the scores of a combined training set are the same as the
+        scores of the training set of each ontology.
+
+    build_GOterm_index(GOterm_dict):
+        This method inverts the dictionary GOterm_dict, which maps each
+        GO term to the set of the training protein ids annotated with
+        that term, into a dictionary that maps each training protein id
+        to the list of its GO terms.
+
+    naive_scores(GOterm_index, ontology_index=None):
+        This method returns the list of the (GO term, score) pairs of the
+        naive scheme: the fraction of the training proteins in the index
+        GOterm_index that are annotated with each GO term. When the
+        ontology index (see load_ontology_index) is supplied, the fraction
+        is taken among the training proteins annotated in the ontology of
+        the GO term.
+
+    score_target(blast_hits, GOterm_index, schemes=DEFAULT_SCHEMES,
+                 naive=None, ontology_index=None):
+        This method goes once over the BLAST hits (training protein id,
+        E-value, percent identity, bit score) of a target and keeps a
+        running maximum (or sum) of the scores of each scheme in schemes
+        for each GO term of the training proteins. It returns a dictionary
+        that maps each scheme to the list of the (GO term, normalized
+        score) pairs with a positive score in the order of the GO terms.
+        The scores of the naive scheme are the list naive. When the
+        ontology index (see load_ontology_index) is supplied, the knn score
+        of a GO term is divided by the bit scores of the hits to the
+        training proteins annotated in the ontology of the GO term.
+
+    format_scores(target_id, scores):
+        This method returns the lines of the score file for the scores
+        of a target: target id, GO term, and score (with two decimals)
+        separated by tabs.
+
+    target_score_lines(target_id, blast_hits, GOterm_index, schemes,
+                       naive=None, ontology_index=None):
+        This method returns a dictionary that maps each scheme in schemes
+        to the score lines of the target target_id.
+
+    write_scores(fh_targets, writers, blast_hits, GOterm_index,
+                 score_lines=None, naive=None, ontology_index=None):
+        This method writes the score lines of the target on each line of
+        the target file (file handle fh_targets) into the score file of
+        each scheme (the dictionary writers maps each scheme to its
+        writer). The hits of the targets are taken from the BlastHits
+        object blast_hits (see BlastTab module) unless the score lines of
+        a target are already in the dictionary score_lines. The scores of
+        a target are computed once for all the schemes.
+
+    stream_scores(fh_blast, target_ids, GOterm_index,
+                  schemes=DEFAULT_SCHEMES, naive=None, query_members=None,
+                  subject_members=None, ontology_index=None):
+        This method reads the BLAST results (file handle fh_blast) one
+        target at a time (see iter_query_groups in BlastTab module) and
+        returns a dictionary that maps each target in target_ids to its
+        score lines of each scheme. Only the hits of one target are held
+        in memory. The hits of the digests of deduplicated sequence files
+        are expanded by the members tables query_members and
+        subject_members (see expand_hits in BlastTab module); target_ids
+        then has the query digests.
+
+    shard_targets(target_ids, n_shards):
+        This method splits the list of the target ids (one for each line
+        of the target file) into at most n_shards contiguous shards of
+        nearly equal size.
+
+    score_targets_parallel(target_ids, GOterm_index, blast_hits, writers,
+                           fragment_prefix, workers, naive=None,
+                           ontology_index=None):
+        This method scores the shards of the target ids in a pool of
+        worker processes. Each worker gets the training protein -> GO
+        terms index and the BlastHits object (see BlastTab module) once,
+        when it starts, and writes the score lines of a shard for each
+        scheme into the fragment file
+        fragment_prefix.<scheme>.<shard number>. The fragments of each
+        scheme are merged into its writer in the dictionary writers (see
+        merge_fragments in OutputWriter module), so the lines are in the
+        same order as the lines written by a single process.
+
+    GOterm_ontologies(namespaces):
+        This method returns a dictionary that maps each GO term to its
+        ontology (mfo, bpo, or cco) from the dictionary namespaces, which
+        maps each GO term to its namespace in the OBO file.
+
+    The ScoreRouter class writes each line of the score lines of the
+    targets to the score file of the ontology of its GO term, so that the
+    hits against a combined training set (see xTract_sp_trainingSet module)
+    are scored for all three ontologies at once.
+
+    The running time depends on the number of the BLAST hits times the
+    number of GO terms per training protein, not on the number of the
+    GO terms of all training proteins.
+'''
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import BlastTab as bt
+import OutputWriter as ow
+
+# MAX_RSCORE is set to 500 (to be consistent with the Matlab
+# implmentation by Jiang Y):
+MAX_RSCORE = 500
+# Set E-value cut off by two values: E_VALUE_MAX and E_VALUE_MIN:
+# E_VALUE_MAX is set 1.0 according to Jiang Y et al, ECCB 2014 Vol 30:
+E_VALUE_MAX = 1.0
+# E_VALUE_MIN is set by invoking sys.float_info.min system call:
+E_VALUE_MIN = sys.float_info.min
+# Number of target shards for each worker process. Having more shards than
+# workers evens out the load when the targets have different numbers of
+# hits:
+SHARDS_PER_WORKER = 4
+
+# Scoring schemes that are computed from the BLAST hits and the training
+# protein -> GO terms index:
+SCORING_SCHEMES = ['evalue', 'identity', 'knn', 'naive']
+# The scheme of the BLAST model:
+DEFAULT_SCHEMES = ['evalue']
+
+# Ontologies of the namespaces of the GO terms in the OBO file:
+NAMESPACE_ONTOLOGIES = {'molecular_function': 'mfo',
+                        'biological_process': 'bpo',
+                        'cellular_component': 'cco'}
+
+# The training protein -> GO terms index and the BLAST hits shared by the
+# shards scored in a worker process:
+_shared = dict()
+
+def transform_evalue(e_value):
+    e_value = float(e_value)
+    # It will ignore entries whose E-value is greater than E_VALUE_MAX:
+    if e_value < E_VALUE_MAX and e_value <= E_VALUE_MIN:
+        # Set score to MAX_RSCORE when E-value is less
+        # than/equal to E_VALUE_MIN:
+        return float(MAX_RSCORE)
+    elif e_value < E_VALUE_MAX and e_value > E_VALUE_MIN:
+        # Set score to -log(E-value) when E-value is greater
+        # than E_VALUE_MIN:
+        return float(format(-1*math.log(e_value), '.2f'))
+    return 0.0
+
+def load_GOterm_index(fh_map, training_ids=None):
+    GOterm_index = dict()
+    # column 1: training sequence id
+    # column 2: protein name of the training sequence
+    # column 3: comma separated GO terms that define the function of
+    #           the protein
+    for line in fh_map:
+        fields = line.strip().split('\t')
+        training_seq_id = fields[0]
+        GOterms = fields[2].split(',')
+        if training_ids is not None and training_seq_id not in training_ids:
+            continue
+        known = GOterm_index.setdefault(training_seq_id, [])
+        for gt in GOterms:
+            if gt not in known:
+                known.append(gt)
+    return GOterm_index
+
+def load_ontology_index(fh_map, training_ids=None):
+    ontology_index = dict()
+    # column 4: the ontology (mfo, bpo, or cco) of the GO terms in column 3
+    for line in fh_map:
+        fields = line.strip().split('\t')
+        if len(fields) < 4:
+            continue
+        training_seq_id = fields[0]
+        if training_ids is not None and training_seq_id not in training_ids:
+            continue
+        known = ontology_index.setdefault(training_seq_id, dict()) \
+                              .setdefault(fields[3], [])
+        for gt in fields[2].split(','):
+            if gt not in known:
+                known.append(gt)
+    return ontology_index
+
+def build_GOterm_index(GOterm_dict):
+    GOterm_index = dict()
+    for gt in GOterm_dict:
+        for training_seq_id in GOterm_dict[gt]:
+            GOterm_index.setdefault(training_seq_id, []).append(gt)
+    return GOterm_index
+
+def normalize_score(mScore):
+    '''
+    This method normalizes the score mScore by MAX_RSCORE.
+    '''
+    return round(mScore/MAX_RSCORE, 2)
+
+def naive_scores(GOterm_index, ontology_index=None):
+    if ontology_index is None:
+        # All the GO terms are in one ontology:
+        ontology_index = dict((training_seq_id, {'': GOterms})
+                              for training_seq_id, GOterms in
+                              GOterm_index.items())
+    counts = dict()
+    # The number of the training proteins annotated in each ontology:
+    n_training = dict()
+    for training_seq_id in ontology_index:
+        for ontology, GOterms in ontology_index[training_seq_id].items():
+            n_training[ontology] = n_training.get(ontology, 0) + 1
+            for gt in GOterms:
+                counts[(ontology, gt)] = counts.get((ontology, gt), 0) + 1
+    scores = []
+    for ontology, gt in sorted(counts, key=lambda key: (key[1], key[0])):
+        nScore = round(counts[(ontology, gt)]/n_training[ontology], 2)
+        if nScore > 0.00:
+            scores.append((gt, nScore))
+    return scores
+
+def __positive_scores(mScores, normalize):
+    '''
+    This method returns the list of the (GO term, normalized score) pairs
+    with a positive score in the order of the GO terms.
+    '''
+    scores = []
+    for gt in sorted(mScores):
+        nScore = normalize(mScores[gt])
+        if nScore > 0.00:
+            scores.append((gt, nScore))
+    return scores
+
+def __knn_scores(bitscores, GOterm_index, ontology_index):
+    '''
+    This method returns the list of the (GO term, knn score) pairs from
+    the best bit scores of the hits to the training proteins. The sum of
+    the bit scores of the GO term is divided by the sum of the bit scores
+    of the training proteins annotated in its ontology (all the training
+    proteins if ontology_index is None).
+    '''
+    kScores = dict()
+    totals = dict()
+    for training_seq_id in bitscores:
+        bitscore = bitscores[training_seq_id]
+        if ontology_index is None:
+            ontologies = {'': GOterm_index[training_seq_id]}
+        else:
+            ontologies = ontology_index.get(training_seq_id, {})
+        for ontology, GOterms in ontologies.items():
+            totals[ontology] = totals.get(ontology, 0.0) + bitscore
+            for gt in GOterms:
+                kScores[(ontology, gt)] = kScores.get((ontology, gt), 0.0) + \
+                                          bitscore
+    scores = []
+    for ontology, gt in sorted(kScores, key=lambda key: (key[1], key[0])):
+        nScore = round(kScores[(ontology, gt)]/totals[ontology], 2)
+        if nScore > 0.00:
+            scores.append((gt, nScore))
+    return scores
+
+def score_target(blast_hits, GOterm_index, schemes=DEFAULT_SCHEMES,
+                 naive=None, ontology_index=None):
+    use_evalue = 'evalue' in schemes
+    use_identity = 'identity' in schemes
+    use_knn = 'knn' in schemes
+    mScores = dict()
+    iScores = dict()
+    # The best bit score of the hits to each training protein:
+    bitscores = dict()
+    for training_seq_id, e_value, pident, bitscore in blast_hits:
+        GOterms = GOterm_index.get(training_seq_id)
+        if not GOterms:
+            continue
+        if use_evalue:
+            score = transform_evalue(e_value)
+            for gt in GOterms:
+                # The scores of the hits with E-values above E_VALUE_MAX
+                # are 0 and never make a GO term score positive:
+                if score > mScores.get(gt, 0.0):
+                    mScores[gt] = score
+        if e_value >= E_VALUE_MAX:
+            continue
+        if use_identity:
+            for gt in GOterms:
+                if pident > iScores.get(gt, 0.0):
+                    iScores[gt] = pident
+        if use_knn and bitscore > bitscores.get(training_seq_id, 0.0):
+            bitscores[training_seq_id] = bitscore
+    scores = dict()
+    if use_evalue:
+        scores['evalue'] = __positive_scores(mScores, normalize_score)
+    if use_identity:
+        scores['identity'] = __positive_scores(iScores,
+                                 lambda pident: round(pident/100, 2))
+    if use_knn:
+        scores['knn'] = __knn_scores(bitscores, GOterm_index, ontology_index)
+    if 'naive' in schemes:
+        scores['naive'] = naive if naive is not None else []
+    return scores
+
+def format_scores(target_id, scores):
+    return ''.join(str(target_id) + '\t' + str(gt) + '\t' + \
+                   str("%.2f" % nScore) + '\n' for gt, nScore in scores)
+
+def target_score_lines(target_id, blast_hits, GOterm_index, schemes,
+                       naive=None, ontology_index=None):
+    scores = score_target(blast_hits, GOterm_index, schemes, naive,
+                          ontology_index)
+    return dict((scheme, format_scores(target_id, scores[scheme]))
+                for scheme in schemes)
+
+def write_scores(fh_targets, writers, blast_hits, GOterm_index,
+                 score_lines=None, naive=None, ontology_index=None):
+    schemes = list(writers)
+    # The score lines of the targets that are already scored:
+    if score_lines is None:
+        score_lines = dict()
+    for line in fh_targets:
+        # extract the query protein:
+        q = line.strip().split('\t')[0]
+        if q not in score_lines:
+            hits = []
+            if blast_hits is not None:
+                hits = blast_hits.hit_rows(q)
+            score_lines[q] = target_score_lines(q, hits, GOterm_index,
+                                                schemes, naive,
+                                                ontology_index)
+        for scheme in schemes:
+            writers[scheme].write(score_lines[q][scheme])
+    return None
+
+def stream_scores(fh_blast, target_ids, GOterm_index,
+                  schemes=DEFAULT_SCHEMES, naive=None, query_members=None,
+                  subject_members=None, ontology_index=None):
+    score_lines = dict()
+    for group in bt.iter_query_groups(fh_blast, target_ids):
+        if query_members is not None or subject_members is not None:
+            group = bt.expand_hits(group, query_members, subject_members)
+        for q in group.query_ids:
+            score_lines[q] = target_score_lines(q, group.hit_rows(q),
+                                                GOterm_index, schemes, naive,
+                                                ontology_index)
+    return score_lines
+
+def shard_targets(target_ids, n_shards):
+    n_shards = max(1, min(n_shards, len(target_ids)))
+    size, extra = divmod(len(target_ids), n_shards)
+    shards = []
+    start = 0
+    for i in range(n_shards):
+        end = start + size + (1 if i < extra else 0)
+        shards.append(target_ids[start:end])
+        start = end
+    return shards
+
+def __init_worker(GOterm_index, blast_hits, schemes, naive, ontology_index):
+    '''
+    This method keeps the training protein -> GO terms index, the BLAST
+    hits, the scoring schemes, the scores of the naive scheme, and the
+    ontology index in a worker process for all the shards scored by it.
+    '''
+    _shared['GOterm_index'] = GOterm_index
+    _shared['blast_hits'] = blast_hits
+    _shared['schemes'] = schemes
+    _shared['naive'] = naive
+    _shared['ontology_index'] = ontology_index
+    return None
+
+def __score_shard(task):
+    '''
+    This method writes the score lines of the targets of a shard into a
+    fragment file for each scheme and returns the (shard number,
+    dictionary of the fragment file names of the schemes). The scores of
+    a target that shows up more than once in the shard are computed once.
+    '''
+    shard_no, target_ids, fragment_fnames = task
+    GOterm_index = _shared['GOterm_index']
+    blast_hits = _shared['blast_hits']
+    schemes = _shared['schemes']
+    score_lines = dict()
+    fh_fragments = dict((scheme, open(fragment_fnames[scheme], 'w'))
+                        for scheme in schemes)
+    for q in target_ids:
+        if q not in score_lines:
+            score_lines[q] = target_score_lines(q, blast_hits.hit_rows(q),
+                                                GOterm_index, schemes,
+                                                _shared['naive'],
+                                                _shared['ontology_index'])
+        for scheme in schemes:
+            fh_fragments[scheme].write(score_lines[q][scheme])
+    for scheme in schemes:
+        fh_fragments[scheme].close()
+    return shard_no, fragment_fnames
+
+def __finished_shards(futures, finished):
+    '''
+    This method yields the results of the shards as they are finished and
+    keeps them in the list finished.
+    '''
+    for future in as_completed(futures):
+        finished.append(future.result())
+        yield finished[-1]
+    return None
+
+def score_targets_parallel(target_ids, GOterm_index, blast_hits, writers,
+                           fragment_prefix, workers, naive=None,
+                           ontology_index=None):
+    schemes = list(writers)
+    shards = shard_targets(target_ids, workers * SHARDS_PER_WORKER)
+    tasks = [(shard_no, shard,
+              dict((scheme, fragment_prefix + '.' + scheme + '.' + \
+                            str(shard_no)) for scheme in schemes))
+             for shard_no, shard in enumerate(shards)]
+    finished = []
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=__init_worker,
+                             initargs=(GOterm_index, blast_hits, schemes,
+                                       naive, ontology_index)) as executor:
+        futures = [executor.submit(__score_shard, task) for task in tasks]
+        # The fragments of the first scheme are merged as the shards are
+        # finished, and the fragments of the other schemes after them:
+        n_fragments = ow.merge_fragments(
+                          ((shard_no, fragment_fnames[schemes[0]])
+                           for shard_no, fragment_fnames in
+                           __finished_shards(futures, finished)),
+                          writers[schemes[0]])
+    for scheme in schemes[1:]:
+        ow.merge_fragments(((shard_no, fragment_fnames[scheme])
+                            for shard_no, fragment_fnames in finished),
+                           writers[scheme])
+    return n_fragments
+
+def GOterm_ontologies(namespaces):
+    GOterm_ontology = dict()
+    for gt in namespaces:
+        ontology = NAMESPACE_ONTOLOGIES.get(namespaces[gt])
+        if ontology is not None:
+            GOterm_ontology[gt] = ontology
+    return GOterm_ontology
+
+class ScoreRouter:
+    def __init__(self, writers, GOterm_ontology):
+        # The writers of the score files of the ontologies:
+        self.writers = writers
+        self.GOterm_ontology = GOterm_ontology
+        self.buffer_size = ow.BUFFER_SIZE
+        # The text after the last complete line that is written:
+        self.pending = ''
+        # The GO terms that are not in any ontology:
+        self.unrouted = set()
+        return None
+
+    def write(self, text):
+        '''
+        This method writes the complete lines of the text to the score
+        files of the ontologies of their GO terms. The text after the last
+        complete line is kept until the rest of the line is written.
+        '''
+        size = len(text)
+        text = self.pending + text
+        end = text.rfind('\n') + 1
+        self.pending = text[end:]
+        routed = dict((ontology, []) for ontology in self.writers)
+        for line in text[:end].splitlines(True):
+            gt = line.split('\t', 2)[1]
+            ontology = self.GOterm_ontology.get(gt)
+            if ontology in routed:
+                routed[ontology].append(line)
+            else:
+                self.unrouted.add(gt)
+        for ontology in routed:
+            if routed[ontology]:
+                self.writers[ontology].write(''.join(routed[ontology]))
+        return size
+
+    def close(self):
+        for ontology in self.writers:
+            self.writers[ontology].close()
+        return None
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
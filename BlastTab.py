@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+'''
+    This module reads BLAST results in tabular format (outfmt 6) with the
+    columns used by the BLAST model tools:
+
+        qseqid sseqid evalue length pident nident bitscore
+
+    The hits are parsed once into a numpy structured array of HIT_DTYPE
+    (query index, subject index, E-value, alignment length, percent
+    identity, number of identical matches, bit score) with the E-values
+    already converted to floats. The trailing columns are optional. The module
+    has the definition of BlastHits class and the following methods:
+
+    read_hits(fh_blast, query_ids=None):
+        This method is the entry point of this module. It reads the BLAST
+        result file (file handle fh_blast) once and returns a BlastHits
+        object with the hits grouped by query. When the set (or dict)
+        query_ids is supplied, only the hits of those queries are kept.
+
+    iter_query_groups(fh_blast, query_ids=None):
+        This method reads a BLAST result file in which the hits of each
+        query are on consecutive lines (as written by BLAST) and yields a
+        BlastHits object for each query, one query at a time. Only the
+        hits of the current query are held in memory, so files of any
+        size can be processed. It raises a ValueError if the hits of a
+        query are not on consecutive lines.
+
+    read_members(fh_members):
+        This method reads the members table of a deduplicated sequence
+        file (file handle fh_members, see DedupWriter in OutputWriter
+        module) and returns a dictionary that maps each digest to the list
+        of the ids of its sequences.
+
+    expand_hits(blast_hits, query_members=None, subject_members=None):
+        This method expands the hits of the BlastHits object blast_hits
+        whose queries or subjects are the digests of deduplicated
+        sequence files back to the sequence ids: a hit of a query digest
+        to a subject digest becomes a hit of each member of the query to
+        each member of the subject, given by the dictionaries
+        query_members and subject_members (see read_members). The ids
+        that are not in a members table are kept as they are. It returns
+        a new BlastHits object with the same hits as the BLAST results of
+        the sequence files before the deduplication.
+
+    read_shards(fh_shards):
+        This method reads the shard table of a sharded sequence file (file
+        handle fh_shards, see ShardWriter in OutputWriter module) and
+        returns the list of the (sequence id, shard) pairs in the order of
+        the sequences. The shards are numbered from 0.
+
+    merge_shard_hits(shard_order, fhs_hits, writer):
+        This method merges the BLAST result files of the shards (the list
+        of file handles fhs_hits in the order of the shards) into the
+        writer in the order of the sequences of shard_order (see
+        read_shards). The hits of each shard must be in the order of its
+        sequences, as written by BLAST. Only one line of each file is held
+        in memory. It returns the number of the hit lines written, and it
+        raises a ValueError if a file has hits that are not in the order
+        of its shard or hits of a query that is not in shard_order (for
+        example, the hits against the shards of a training set, whose
+        shard table lists the subjects).
+
+    The BlastHits class gives the hits of a query as a slice of the
+    structured array (query_hits method), as a list of the (subject id,
+    E-value) pairs (hit_pairs method) or of the (subject id, E-value,
+    percent identity, bit score) tuples (hit_rows method), and the set of
+    the subject ids of all the hits (subject_set method).
+'''
+import sys
+
+import numpy as np
+
+# Columns of a hit:
+HIT_DTYPE = np.dtype([('query', np.int32),
+                      ('subject', np.int32),
+                      ('evalue', np.float64),
+                      ('length', np.int32),
+                      ('pident', np.float64),
+                      ('nident', np.int32),
+                      ('bitscore', np.float64)])
+# Number of hits that are collected before they are packed into an array:
+CHUNK_HITS = 1 << 20
+
+def __parse_fields(fields):
+    '''
+    This method returns the (E-value, length, pident, nident, bitscore)
+    of the fields of a hit line. The missing columns are set to 0.
+    '''
+    length = int(fields[3]) if len(fields) > 3 and fields[3] else 0
+    pident = float(fields[4]) if len(fields) > 4 and fields[4] else 0.0
+    nident = int(fields[5]) if len(fields) > 5 and fields[5] else 0
+    bitscore = float(fields[6]) if len(fields) > 6 and fields[6] else 0.0
+    return float(fields[2]), length, pident, nident, bitscore
+
+def _pack_hits(rows):
+    '''
+    This method packs the list of the hit tuples rows into a structured
+    array of HIT_DTYPE.
+    '''
+    return np.array(rows, dtype=HIT_DTYPE)
+
+def read_hits(fh_blast, query_ids=None):
+    queries = dict()
+    subjects = dict()
+    chunks = []
+    rows = []
+    for line in fh_blast:
+        fields = line.strip().split('\t')
+        if len(fields) < 3:
+            continue
+        q = fields[0]
+        if query_ids is not None and q not in query_ids:
+            continue
+        qi = queries.setdefault(q, len(queries))
+        si = subjects.setdefault(fields[1].strip(), len(subjects))
+        rows.append((qi, si) + __parse_fields(fields))
+        if len(rows) >= CHUNK_HITS:
+            chunks.append(_pack_hits(rows))
+            rows = []
+    chunks.append(_pack_hits(rows))
+    return BlastHits(list(queries), list(subjects), np.concatenate(chunks))
+
+def iter_query_groups(fh_blast, query_ids=None):
+    done = set()
+    q_current = None
+    subjects = dict()
+    rows = []
+    for line in fh_blast:
+        fields = line.strip().split('\t')
+        if len(fields) < 3:
+            continue
+        q = fields[0]
+        if q != q_current:
+            if rows:
+                yield BlastHits([q_current], list(subjects), _pack_hits(rows))
+            done.add(q_current)
+            if q in done:
+                raise ValueError('The hits of the query ' + q + ' are ' + \
+                                 'not on consecutive lines')
+            q_current = q
+            subjects = dict()
+            rows = []
+        if query_ids is not None and q not in query_ids:
+            continue
+        si = subjects.setdefault(fields[1].strip(), len(subjects))
+        rows.append((0, si) + __parse_fields(fields))
+    if rows:
+        yield BlastHits([q_current], list(subjects), _pack_hits(rows))
+    return None
+
+def read_members(fh_members):
+    members = dict()
+    for line in fh_members:
+        fields = line.strip().split('\t')
+        if len(fields) < 2:
+            continue
+        members[fields[0]] = fields[1].split(',')
+    return members
+
+def __expand_ids(ids, members):
+    '''
+    This method returns the list of the members of the ids (an id that is
+    not in the dictionary members is its own member), the number of the
+    members of each id, and the index of the first member of each id.
+    '''
+    expanded = []
+    counts = np.ones(len(ids), dtype=np.int64)
+    for i, x in enumerate(ids):
+        if members is not None and x in members:
+            counts[i] = len(members[x])
+            expanded.extend(members[x])
+        else:
+            expanded.append(x)
+    return expanded, counts, np.cumsum(counts) - counts
+
+def expand_hits(blast_hits, query_members=None, subject_members=None):
+    hits = blast_hits.hits
+    query_ids, query_counts, query_first = \
+        __expand_ids(blast_hits.query_ids, query_members)
+    subject_ids, subject_counts, subject_first = \
+        __expand_ids(blast_hits.subject_ids, subject_members)
+    for column, counts, first in (('query', query_counts, query_first),
+                                  ('subject', subject_counts, subject_first)):
+        n_copies = counts[hits[column]]
+        expanded = np.repeat(hits, n_copies)
+        # The k-th copy of a hit goes to the k-th member:
+        k = np.arange(len(expanded)) - np.repeat(np.cumsum(n_copies) - \
+                                                 n_copies, n_copies)
+        expanded[column] = np.repeat(first[hits[column]], n_copies) + k
+        hits = expanded
+    return BlastHits(query_ids, subject_ids, hits)
+
+def read_shards(fh_shards):
+    shard_order = []
+    for line in fh_shards:
+        fields = line.strip().split('\t')
+        if len(fields) < 2:
+            continue
+        shard_order.append((fields[0], int(fields[1]) - 1))
+    return shard_order
+
+def __next_hit(fh_hits):
+    '''
+    This method returns the next hit line of the file fh_hits and its
+    query id, or an empty line and None at the end of the file.
+    '''
+    for line in fh_hits:
+        fields = line.split('\t', 1)
+        if len(fields) == 2:
+            return line, fields[0]
+    return '', None
+
+def merge_shard_hits(shard_order, fhs_hits, writer):
+    nexts = [__next_hit(fh) for fh in fhs_hits]
+    n_lines = 0
+    for seq_id, shard in shard_order:
+        fh = fhs_hits[shard]
+        line, q = nexts[shard]
+        while q == seq_id:
+            writer.write(line if line.endswith('\n') else line + '\n')
+            n_lines += 1
+            line, q = __next_hit(fh)
+        nexts[shard] = (line, q)
+    seq_ids = None
+    for shard, (line, q) in enumerate(nexts):
+        if q is None:
+            continue
+        if seq_ids is None:
+            seq_ids = set(seq_id for seq_id, shard_no in shard_order)
+        if q not in seq_ids:
+            raise ValueError('The query ' + q + ' in the hit file of ' + \
+                             'shard ' + str(shard + 1) + ' is not in the ' + \
+                             'shard table (only the hits of the shards ' + \
+                             'of the query sequences are merged)')
+        raise ValueError('The hits of the query ' + q + ' in the ' + \
+                         'hit file of shard ' + str(shard + 1) + \
+                         ' are not in the order of the shard')
+    return n_lines
+
+class BlastHits:
+    def __init__(self, query_ids, subject_ids, hits):
+        self.query_ids = query_ids
+        self.subject_ids = subject_ids
+        self.query_index = dict((q, i) for i, q in enumerate(query_ids))
+        # Group the hits by query (in the order of the file within
+        # a query):
+        order = np.argsort(hits['query'], kind='stable')
+        self.hits = hits[order]
+        self.starts = np.searchsorted(self.hits['query'],
+                                      np.arange(len(query_ids) + 1))
+        return None
+
+    def __len__(self):
+        return len(self.hits)
+
+    def __contains__(self, query_id):
+        return query_id in self.query_index
+
+    def query_hits(self, query_id):
+        '''
+        This method returns the hits of the query query_id (an empty
+        array if the query has no hits).
+        '''
+        qi = self.query_index.get(query_id)
+        if qi is None:
+            return self.hits[:0]
+        return self.hits[self.starts[qi]:self.starts[qi + 1]]
+
+    def hit_pairs(self, query_id):
+        '''
+        This method returns the list of the (subject id, E-value) pairs
+        of the hits of the query query_id.
+        '''
+        hits = self.query_hits(query_id)
+        subject_ids = self.subject_ids
+        return [(subject_ids[si], e_value) for si, e_value in
+                zip(hits['subject'].tolist(), hits['evalue'].tolist())]
+
+    def hit_rows(self, query_id):
+        '''
+        This method returns the list of the (subject id, E-value, percent
+        identity, bit score) tuples of the hits of the query query_id.
+        '''
+        hits = self.query_hits(query_id)
+        subject_ids = self.subject_ids
+        return [(subject_ids[si], e_value, pident, bitscore)
+                for si, e_value, pident, bitscore in
+                zip(hits['subject'].tolist(), hits['evalue'].tolist(),
+                    hits['pident'].tolist(), hits['bitscore'].tolist())]
+
+    def subject_set(self):
+        '''
+        This method returns the set of the subject ids of the hits.
+        '''
+        return set(self.subject_ids)
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
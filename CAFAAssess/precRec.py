@@ -4,6 +4,8 @@
 import sys
 from collections import defaultdict
 import numpy
+from CAFAAssess.precrec.GOPred import GOPred
+import ScoreMatrix as sm
 
 class benchmark:
     def __init__(self,ancestor_path,benchmark_path):
@@ -80,6 +82,33 @@ def read_benchmark_old(namespace):
     bench.propagate()
     return bench
 
+def read_prediction(pred_path):
+    '''
+    Reads a prediction file into a GOPred object.
+    pred_path is either a CAFA text file or a score matrix
+    saved by the scorers (see ScoreMatrix module),
+    whose scores are taken without parsing the text
+    '''
+    pred = GOPred()
+    if sm.is_matrix_file(pred_path):
+        pred.data = sm.load(pred_path).prediction_data()
+    else:
+        with open(pred_path) as pred_input:
+            pred.read(pred_input)
+    return pred
+
+def downsample_curve(pre, rec, points):
+    '''
+    Keeps points values of a precision-recall curve (arrays pre and rec),
+    evenly spaced along the curve and including both ends, so that curves
+    of any number of thresholds are plotted with the same number of values
+    A curve with fewer values is returned as it is
+    '''
+    if len(pre) <= points:
+        return (pre, rec)
+    keep = numpy.round(numpy.linspace(0, len(pre) - 1, points)).astype(int)
+    return (numpy.asarray(pre)[keep], numpy.asarray(rec)[keep])
+
 class PrecREC:
     '''
     New code by Ashley
@@ -158,6 +187,9 @@ class PrecREC:
                 this protein is not in the benchmark file
                 '''
                 self.predicted[prot] = None
+        #Flatten the propagated terms into arrays
+        #and sweep them once for all the thresholds
+        self.__sweep__()
                 
 
 
@@ -190,6 +222,144 @@ class PrecREC:
             return [tc['confidence'],False]
             
         
+    def __flatten__(self):
+        '''
+        Flattens the propagated terms of the benchmark proteins in
+        self.predicted into arrays, one record per (protein, term):
+        protein index, confidence, and True/False
+        Also returns the number of true terms of each protein
+        '''
+        prots = []
+        confidences = []
+        correct = []
+        n_true = []
+        for prot in self.predicted:
+            if self.predicted[prot] is None:
+                continue
+            index = len(n_true)
+            n_true.append(len(self.true_terms[prot]))
+            for term in self.predicted[prot]:
+                prots.append(index)
+                confidences.append(self.predicted[prot][term][0])
+                correct.append(self.predicted[prot][term][1])
+        return (numpy.array(prots, dtype=numpy.int64),
+                numpy.array(confidences, dtype=numpy.float64),
+                numpy.array(correct, dtype=bool),
+                numpy.array(n_true, dtype=numpy.float64))
+
+    def __sweep__(self):
+        '''
+        Computes the cumulative sums of the precision, recall, and counta
+        of all the terms with a confidence at or above each confidence
+        The records are sorted by protein and decreasing confidence:
+        the k-th record of a protein adds 1 to the number of its terms above
+        threshold, so the precision of the protein changes from
+        TP(k-1)/(k-1) to TP(k)/k and its recall by True/len(true terms)
+        Summed in the order of decreasing confidence over all proteins,
+        these changes give the precision and recall sums at every threshold
+        '''
+        prots, confidences, correct, n_true = self.__flatten__()
+        order = numpy.lexsort((-confidences, prots))
+        prots = prots[order]
+        confidences = confidences[order]
+        correct = correct[order]
+        #Position of each record among the records of its protein
+        first = numpy.ones(len(prots), dtype=bool)
+        first[1:] = prots[1:] != prots[:-1]
+        starts = numpy.flatnonzero(first)
+        start = numpy.repeat(starts, numpy.diff(numpy.append(starts, len(prots))))
+        rank = numpy.arange(len(prots)) - start
+        #TP of each protein after each of its records
+        tp = numpy.cumsum(correct)
+        tp = tp - tp[start] + correct[start]
+        precision = tp / (rank + 1.0)
+        dprecision = precision.copy()
+        dprecision[1:][~first[1:]] -= precision[:-1][~first[1:]]
+        drecall = correct / n_true[prots]
+        #Sum the changes in the order of decreasing confidence
+        order = numpy.argsort(-confidences, kind='mergesort')
+        self.confidences = confidences[order]
+        self.cum_precision = numpy.cumsum(dprecision[order])
+        self.cum_recall = numpy.cumsum(drecall[order])
+        self.cum_counta = numpy.cumsum(first[order])
+        return None
+
+    def precision_recall_curve(self,thresholds):
+        '''
+        Computes the overall precision and recall at each of the thresholds
+        (an array) at once from the sums of __sweep__
+        Returns arrays of precision (nan where no protein has a term above
+        threshold), recall, and counta
+        '''
+        thresholds = numpy.asarray(thresholds, dtype=numpy.float64)
+        #Number of records with confidence >= threshold
+        n = numpy.searchsorted(-self.confidences, -thresholds, side='right')
+        counta = numpy.zeros(len(thresholds), dtype=numpy.int64)
+        prec = numpy.zeros(len(thresholds))
+        rec = numpy.zeros(len(thresholds))
+        above = n > 0
+        counta[above] = self.cum_counta[n[above] - 1]
+        prec[above] = self.cum_precision[n[above] - 1]
+        rec[above] = self.cum_recall[n[above] - 1]
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            prec = numpy.where(counta > 0, prec / counta, numpy.nan)
+        if self.countb > 0:
+            rec = rec / self.countb
+        return (prec, rec, counta)
+
+    def exact_curve(self):
+        '''
+        Computes the overall precision and recall at every distinct
+        confidence value of the propagated predictions, from the highest
+        confidence to the lowest, in one pass over the sums of __sweep__
+        Returns arrays of thresholds, precision, recall, and counta
+        '''
+        if len(self.confidences) == 0:
+            empty = numpy.zeros(0)
+            return (empty, empty, empty, numpy.zeros(0, dtype=numpy.int64))
+        #Last record of each confidence value
+        last = numpy.append(numpy.flatnonzero(self.confidences[1:] !=
+                                              self.confidences[:-1]),
+                            len(self.confidences) - 1)
+        counta = self.cum_counta[last]
+        prec = self.cum_precision[last] / counta
+        rec = self.cum_recall[last]
+        if self.countb > 0:
+            rec = rec / self.countb
+        return (self.confidences[last], prec, rec, counta)
+
+    def Fmax_exact(self,points=None):
+        '''
+        returns the precision-recall values at every distinct confidence
+        and the exact fmax, its threshold, and the coverage at that threshold
+        (the number of proteins with at least one term above threshold
+        divided by the number of proteins in the benchmark file, whether
+        they are predicted or not)
+        points: the curve is downsampled to this many values for plotting
+        (see downsample_curve); the fmax is computed from the whole curve
+        '''
+        thresholds, pre, rec, counta = self.exact_curve()
+        fmax = 0.0
+        fmax_threshold = None
+        coverage = 0.0
+        f = numpy.zeros(len(pre))
+        defined = pre + rec > 0
+        f[defined] = 2*pre[defined]*rec[defined]/(pre[defined]+rec[defined])
+        if defined.any():
+            best = numpy.argmax(f)
+            fmax = float(f[best])
+            fmax_threshold = float(thresholds[best])
+            #true_terms also has empty sets of the predicted proteins
+            #that are not in the benchmark file
+            n_benchmark = sum(1 for terms in self.true_terms.values()
+                              if terms)
+            coverage = float(counta[best]) / n_benchmark
+            self.counta[fmax_threshold] = int(counta[best])
+        if points:
+            pre, rec = downsample_curve(pre, rec, points)
+        return (numpy.asarray(pre).tolist(),numpy.asarray(rec).tolist(),
+                fmax,fmax_threshold,coverage)
+
     def getObsolete(self):
         '''
         return all obsolete terms used by the prediction team
@@ -227,17 +397,9 @@ class PrecREC:
         For one prediction file, i.e. for one species and one model!!!!
         05/24/2016: countb has been calculated over and over again for each threshold
         '''
-        prec = float(0)
-        self.counta[threshold] = 0
-        rec = float(0)
-        for prot in self.predicted:
-                a,b = self.term_precision_recall(threshold,prot)
-                if a is not None:
-                    prec +=a
-                    self.counta[threshold]+=1
-                if b is not None:
-                    rec +=b
-        return (prec/self.counta[threshold], rec/self.countb)
+        prec, rec, counta = self.precision_recall_curve([threshold])
+        self.counta[threshold] = int(counta[0])
+        return (float(prec[0]), float(rec[0]))
     
     def getNumProteins(self,threshold):
          
@@ -262,17 +424,15 @@ class PrecREC:
         interval is number of threshold values between 0 and 1:
         e.g. interval = 9, thresholds: 0.   ,  0.125,  0.25 ,  0.375,  0.5  ,  0.625,  0.75 ,  0.875,  1. 
         '''
+        thresholds = numpy.linspace(0.01,0.99,interval)
+        pre, rec, counta = self.precision_recall_curve(thresholds)
+        for thres, a in zip(thresholds, counta):
+            self.counta[thres] = int(a)
         fmax = 0
-        pre = []
-        rec = []
-        for thres in numpy.linspace(0.01,0.99,interval):
-            a,b = self.precision_recall(thres)
-            pre.append(a)
-            rec.append(b)
-            f = 2*a*b/(a+b)
-            if f>=fmax:
-                fmax = f
-        return (pre,rec,fmax)
+        defined = ~numpy.isnan(pre) & (pre + rec > 0)
+        if defined.any():
+            fmax = numpy.max(2*pre[defined]*rec[defined]/(pre[defined]+rec[defined]))
+        return (pre.tolist(),rec.tolist(),float(fmax))
     
     def printConfidence(self,output_path):
         '''
@@ -8,30 +8,35 @@
                                          -O=./figures/prCurves/prCurve-evalSet-1.mfo.png
    First input parameter is a prediction score file, whose column 1 has the
         target protein name, column 2 has the GO term, and column 3 has the
-        confidence score for the prediction.
+        confidence score for the prediction, or a score matrix (.npz) file
+        written by Assign_blastScores -F=npz.
    Second input file is a benchmark file, whose column 1 has the target name
         and column 2 has the experimentally verified GO term.
    Third input parameter is the ontology name: any of MFO, BPO, and CCO
    Fourth input parameter is an output filename, where the precision-recall
         scores will be stored.
+   With -E, the precision-recall curve is computed at every distinct
+        confidence score instead of 99 fixed thresholds, and the exact fmax
+        threshold and the coverage at that threshold are reported. -N
+        downsamples the plotted curve to the given number of points.
 '''
 
 import sys
 import os
 sys.path.append(os.getcwd())
 import argparse
-from CAFAAssess.precRec import PrecREC,read_benchmark
-from CAFAAssess.precrec.GOPred import GOPred
+from CAFAAssess.precRec import PrecREC,read_benchmark,read_prediction
 import matplotlib.pyplot as plt
 import numpy
 
 parser = argparse.ArgumentParser(description='Precision- Recall assessment ' + \
          'for protein function predictions.', )
-parser.add_argument('-I1', '--input1',type=open, help='Input the path of the ' + \
+parser.add_argument('-I1', '--input1', help='Input the path of the ' + \
                     'prediction file. File should be split according ' + \
                     'to ontology, and should be a .txt file. File should have ' + \
                     'three columns - column 1: protein name, column 2: GO ' + \
-                    'term, and column 3: confidence score')
+                    'term, and column 3: confidence score. A score matrix ' + \
+                    '(.npz) file is also accepted')
 parser.add_argument('-I2', '--input2', help='Input the path of the ' + \
                     'benchmark file. File should have two columns - ' + \
                     'column 1: protein name, column 2: GO term')
@@ -39,6 +44,12 @@ parser.add_argument('-G', '--ontology',help='Input ontology',
                      choices=['BPO','MFO','CCO'])
 parser.add_argument('-O', '--output', help='Input path+filename to save '+ \
                     'the Precision-Recall plot')
+parser.add_argument('-E', '--exact', action='store_true', help='Compute ' + \
+                    'the precision-recall curve at every distinct ' + \
+                    'confidence score and report the exact fmax threshold')
+parser.add_argument('-N', '--points', type=int, default=0, help='With -E, ' + \
+                    'plot the curve with this number of points. The ' + \
+                    'default is 0 (all the points)')
 args = parser.parse_args()
 
 print('Ontology: %s' %args.ontology)
@@ -48,11 +59,13 @@ print('Output precision-recall plot file: %s' %args.output)
 
 bench = read_benchmark(args.ontology, args.input2)
 
-all_pred = GOPred()
-all_pred.read(args.input1)
+all_pred = read_prediction(args.input1)
 
 c = PrecREC(bench,all_pred)
-fm = c.Fmax_output(99)
+if args.exact:
+    fm = c.Fmax_exact(args.points)
+else:
+    fm = c.Fmax_output(99)
 
 plt.plot(fm[1],fm[0])
 plt.axis([0,1,0,1])
@@ -64,4 +77,7 @@ plt.savefig(args.output,dpi=200)
 plt.close()
 
 print('fmax value for this prediction is: %3.4f' % fm[2])
+if args.exact and fm[3] is not None:
+    print('fmax threshold: %3.4f' % fm[3])
+    print('coverage at the fmax threshold: %3.4f' % fm[4])
 print('PR plot is saved to %s\n' % args.output)
@@ -1,28 +1,147 @@
 #!/usr/bin/env python
 '''
-    This module has the following method:
+    This module has the following methods:
 
     count_genes_with_EXP:
         This method takes four input arguments:
             (1) a uniprot-swissProt file handle,
             (2) a taxonomy id,
-            (3) the set of EXP codes.
+            (3) the set of EXP codes, and
+            (4) the number of worker processes (optional).
             
         This method counts the number of proteins whose annotations 
         have experimental evidences, in each of BPO, CCO, and MFO ontological 
         categories, for an organism with the supplied taxon id.
           
         Finally, it returns these THREE counts.
+
+        When the file handle is a Snapshot object of SprotSnapshot module,
+        the counts are computed from the annotation columns of the snapshot
+        without going over the records. When more than one worker process
+        is requested, the byte ranges of the file are counted in parallel
+        by ParallelSprot module.
+
+    count_genes_for_taxa:
+        This method takes the same input arguments as count_genes_with_EXP,
+        except that it takes a list of taxonomy ids in place of a single
+        taxonomy id. It goes over the records of the file once and keeps
+        the THREE counts of each organism in a dictionary keyed by the
+        taxonomy id, which it returns at the end. The counts of each
+        organism are the same as the counts returned by count_genes_with_EXP.
+
+    count_genes_in_release:
+        This method opens the UniProtKB/SwissProt file (or its snapshot)
+        with the supplied name and returns the counts of count_genes_for_taxa
+        for that file. It is invoked for each release by the sweep_releases
+        method of ReleaseSweep module.
 '''
-from Bio import SwissProt as sp
+import sys
+import numpy as np
+
+import ParallelSprot as ps
+import SprotScanner as ss
+
+def __count_genes_in_snapshot(snap, taxon_id, EXP_default=set([])):
+    gene_count = {}
+    species_mask = snap.entry_mask(taxon_id)
+    for ontName, ontType in [('MFO', 'F'), ('BPO', 'P'), ('CCO', 'C')]:
+        exp_mask = snap.annotated_entries(ontType, EXP_default)
+        gene_count[ontName] = int(np.count_nonzero(species_mask & exp_mask))
+    return gene_count
+
+def count_genes_with_EXP(fh_sprot, taxon_id, EXP_default=set([]), workers=1):
+    if hasattr(fh_sprot, 'annotated_entries'):
+        return __count_genes_in_snapshot(fh_sprot, taxon_id, EXP_default)
+    sprot_fname = ps.sprot_fname(fh_sprot)
+    if workers <= 1 or sprot_fname is None:
+        return __count_genes_in_records(ss.parse(fh_sprot, taxon_id),
+                                        taxon_id, EXP_default)
+    # Count the genes in each byte range of the file in a worker process
+    # and add up the counts of the ranges:
+    gene_count = {'MFO': 0, 'BPO': 0, 'CCO': 0}
+    for range_count in ps.map_records(sprot_fname, __count_genes_in_records,
+                                      (taxon_id, EXP_default), taxon_id,
+                                      workers):
+        for ontName in gene_count:
+            gene_count[ontName] += range_count[ontName]
+    return gene_count
+
+def count_genes_for_taxa(fh_sprot, taxon_ids, EXP_default=set([]),
+                         workers=1):
+    if hasattr(fh_sprot, 'annotated_entries'):
+        return __count_taxa_in_snapshot(fh_sprot, taxon_ids, EXP_default)
+    sprot_fname = ps.sprot_fname(fh_sprot)
+    if workers <= 1 or sprot_fname is None:
+        return __count_taxa_in_records(ss.parse(fh_sprot), taxon_ids,
+                                       EXP_default)
+    gene_counts = __new_taxa_counts(taxon_ids)
+    for range_counts in ps.map_records(sprot_fname, __count_taxa_in_records,
+                                       (taxon_ids, EXP_default), '', workers):
+        for taxon_id in gene_counts:
+            for ontName in gene_counts[taxon_id]:
+                gene_counts[taxon_id][ontName] += \
+                    range_counts[taxon_id][ontName]
+    return gene_counts
+
+def count_genes_in_release(sprot_fname, taxon_ids, EXP_default=set([]),
+                           workers=1):
+    return count_genes_for_taxa(ss.open_sprot(sprot_fname), taxon_ids,
+                                EXP_default, workers)
+
+def __new_taxa_counts(taxon_ids):
+    gene_counts = {}
+    for taxon_id in taxon_ids:
+        gene_counts[taxon_id] = {'MFO': 0, 'BPO': 0, 'CCO': 0}
+    return gene_counts
+
+def __count_taxa_in_snapshot(snap, taxon_ids, EXP_default=set([])):
+    gene_counts = __new_taxa_counts(taxon_ids)
+    # The EXP masks do not depend on the species, compute them once:
+    exp_masks = {}
+    for ontName, ontType in [('MFO', 'F'), ('BPO', 'P'), ('CCO', 'C')]:
+        exp_masks[ontName] = snap.annotated_entries(ontType, EXP_default)
+    for taxon_id in gene_counts:
+        species_mask = snap.entry_mask(taxon_id)
+        for ontName in exp_masks:
+            gene_counts[taxon_id][ontName] = \
+                int(np.count_nonzero(species_mask & exp_masks[ontName]))
+    return gene_counts
+
+def __count_taxa_in_records(records, taxon_ids, EXP_default=set([])):
+    gene_counts = __new_taxa_counts(taxon_ids)
+    for rec in records:
+        # SELECT records of the organisms in taxon_ids:
+        taxa = gene_counts.keys() & set(rec.taxonomy_id)
+        if not taxa:
+            continue
+        # Three flags to check whether an Exp evidence is found
+        # in any of BPO, CCO, and MFO ontological categories:
+        exp_flag = {'MFO': False, 'BPO': False, 'CCO': False}
+        for goTerm, ontSymbol, evidence in rec.go_refs:
+            if evidence in EXP_default:
+                if ontSymbol.upper() == 'F':
+                    exp_flag['MFO'] = True
+                elif ontSymbol.upper() == 'P':
+                    exp_flag['BPO'] = True
+                elif ontSymbol.upper() == 'C':
+                    exp_flag['CCO'] = True
+            if (exp_flag['MFO'] and exp_flag['BPO'] and exp_flag['CCO']):
+                break
+        # Increase the gene counts of each organism of the record
+        # depending on the flag values:
+        for taxon_id in taxa:
+            for ontName in exp_flag:
+                if exp_flag[ontName]:
+                    gene_counts[taxon_id][ontName] += 1
+    return gene_counts
 
-def count_genes_with_EXP(fh_sprot, taxon_id, EXP_default=set([])):
+def __count_genes_in_records(records, taxon_id, EXP_default=set([])):
     gene_count = {} 
     gene_count['MFO'] = 0
     gene_count['BPO'] = 0
     gene_count['CCO'] = 0
 
-    for rec in sp.parse(fh_sprot):
+    for rec in records:
         # SELECT records that are related to a specific
         # taxon_id such as 559292 for yeast:
         if taxon_id in rec.taxonomy_id:
@@ -34,20 +153,15 @@ def count_genes_with_EXP(fh_sprot, taxon_id, EXP_default=set([])):
             exp_flag['CCO'] = False
 
             # Go over the list of DB cross references:
-            for crossRef in rec.cross_references:
-                # Consider the cross_reference entries that
-                # relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1],
-                              (crossRef[3].split(':'))[0],
-                              crossRef[2][0]]
-                    if (crossRef[3].split(':'))[0] in EXP_default:
-                        if goList[-1].upper() == 'F':
-                            exp_flag['MFO'] = True
-                        elif goList[-1].upper() == 'P':
-                            exp_flag['BPO'] = True
-                        elif goList[-1].upper() == 'C':
-                            exp_flag['CCO'] = True
+            for goTerm, ontSymbol, evidence in rec.go_refs:
+                goList = [goTerm, evidence, ontSymbol]
+                if evidence in EXP_default:
+                    if goList[-1].upper() == 'F':
+                        exp_flag['MFO'] = True
+                    elif goList[-1].upper() == 'P':
+                        exp_flag['BPO'] = True
+                    elif goList[-1].upper() == 'C':
+                        exp_flag['CCO'] = True
                 # Whenever an exp evidence for all three ontological 
                 # categories are found, break out the loop:
                 if (exp_flag['MFO'] and exp_flag['BPO'] and exp_flag['CCO']):
@@ -78,26 +192,21 @@ def count_genes_with_EXP_old(fh_sprot, taxon_id, EXP_default=set([])):
     # annotations have EXP evidence and in MFO ontological category:
     exp_mfo_ct = 0
 
-    for rec in sp.parse(fh_sprot):
+    for rec in ss.parse(fh_sprot, taxon_id):
         # SELECT records that are related to a specific
         # taxon_id such as 559292 for yeast:
         if taxon_id in rec.taxonomy_id:
             bpo_exp_flag = cco_exp_flag = mfo_exp_flag = False
             # Go over the list of GO information:
-            for crossRef in rec.cross_references:
-                # Consider the cross_reference entries that
-                # relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1],
-                              (crossRef[3].split(':'))[0],
-                              crossRef[2][0]]
-                    if (crossRef[3].split(':'))[0] in EXP_default:
-                        if goList[-1].upper() == 'P':
-                            bpo_exp_flag = True
-                        elif goList[-1].upper() == 'C':
-                            cco_exp_flag = True
-                        elif goList[-1].upper() == 'F':
-                            mfo_exp_flag = True
+            for goTerm, ontSymbol, evidence in rec.go_refs:
+                goList = [goTerm, evidence, ontSymbol]
+                if evidence in EXP_default:
+                    if goList[-1].upper() == 'P':
+                        bpo_exp_flag = True
+                    elif goList[-1].upper() == 'C':
+                        cco_exp_flag = True
+                    elif goList[-1].upper() == 'F':
+                        mfo_exp_flag = True
                 if (bpo_exp_flag and cco_exp_flag and mfo_exp_flag):
                     break
             # Increase gene counts in BPO, CCO, and MFO categories
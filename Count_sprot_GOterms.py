@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 '''
-    This module has the following method:
+    This module has the following methods:
 
     count_GOterms_with_EXP:
         This method takes four input arguments:
@@ -13,9 +13,17 @@
         categories, for an organism with the supplied taxon id.
           
         Finally, it returns these THREE counts.
+
+    count_GOterms_in_release:
+        This method opens the UniProtKB/SwissProt file (or its snapshot)
+        with the supplied name and returns the result of
+        count_GOterms_with_EXP for that file. It is invoked for each
+        release by the sweep_releases method of ReleaseSweep module.
 '''
+import sys
 from collections import OrderedDict
-from Bio import SwissProt as sp
+
+import SprotScanner as ss
 
 def count_GOterms_with_EXP(fh_sprot, taxon_id, EXP_default=set([])):
     '''
@@ -29,7 +37,7 @@ def count_GOterms_with_EXP(fh_sprot, taxon_id, EXP_default=set([])):
     bpo_terms = OrderedDict()
     cco_terms = OrderedDict()
     count = 0
-    for rec in sp.parse(fh_sprot):
+    for rec in ss.parse(fh_sprot, taxon_id):
         # SELECT records that are related to a specific
         # taxon_id such as 559292 for yeast:
         if taxon_id in rec.taxonomy_id:
@@ -39,21 +47,16 @@ def count_GOterms_with_EXP(fh_sprot, taxon_id, EXP_default=set([])):
             terms_bpo = set()
             terms_cco = set()
             # Go over the list of DB cross references:
-            for crossRef in rec.cross_references:
-                # Consider the cross_reference entries that
-                # relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1],
-                              (crossRef[3].split(':'))[0],
-                              crossRef[2][0]]
-                    if (crossRef[3].split(':'))[0] in EXP_default:
+            for goTerm, ontSymbol, evidence in rec.go_refs:
+                goList = [goTerm, evidence, ontSymbol]
+                if evidence in EXP_default:
 #                        print goList
-                        if goList[-1].upper() == 'F':
-                            terms_mfo.add(goList[0])
-                        elif goList[-1].upper() == 'P':
-                            terms_bpo.add(goList[0])
-                        elif goList[-1].upper() == 'C':
-                            terms_cco.add(goList[0])
+                    if goList[-1].upper() == 'F':
+                        terms_mfo.add(goList[0])
+                    elif goList[-1].upper() == 'P':
+                        terms_bpo.add(goList[0])
+                    elif goList[-1].upper() == 'C':
+                        terms_cco.add(goList[0])
             # Increase gene counts in BPO, CCO, and MFO categories
             # depending on the corresponding flag values:
             mfo_terms[protName] = terms_mfo
@@ -65,6 +68,10 @@ def count_GOterms_with_EXP(fh_sprot, taxon_id, EXP_default=set([])):
             #break
     return (mfo_terms, bpo_terms, cco_terms) 
 
+def count_GOterms_in_release(sprot_fname, taxon_id, EXP_default=set([])):
+    return count_GOterms_with_EXP(ss.open_sprot(sprot_fname), taxon_id,
+                                  EXP_default)
+
 def count_GOterms_with_EXP_old(fh_sprot, taxon_id, EXP_default=set([])):
     '''
     This method counts the distinct GO terms for each gene that 
@@ -76,7 +83,7 @@ def count_GOterms_with_EXP_old(fh_sprot, taxon_id, EXP_default=set([])):
     count_bpo = OrderedDict()
     count_cco = OrderedDict()
 
-    for rec in sp.parse(fh_sprot):
+    for rec in ss.parse(fh_sprot, taxon_id):
         # SELECT records that are related to a specific
         # taxon_id such as 559292 for yeast:
         if taxon_id in rec.taxonomy_id:
@@ -86,21 +93,16 @@ def count_GOterms_with_EXP_old(fh_sprot, taxon_id, EXP_default=set([])):
             terms_bpo = set()
             terms_cco = set()
             # Go over the list of DB cross references:
-            for crossRef in rec.cross_references:
-                # Consider the cross_reference entries that
-                # relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1],
-                              (crossRef[3].split(':'))[0],
-                              crossRef[2][0]]
-                    if (crossRef[3].split(':'))[0] in EXP_default:
+            for goTerm, ontSymbol, evidence in rec.go_refs:
+                goList = [goTerm, evidence, ontSymbol]
+                if evidence in EXP_default:
 #                        print goList
-                        if goList[-1].upper() == 'F':
-                            terms_mfo.add(goList[0])
-                        elif goList[-1].upper() == 'P':
-                            terms_bpo.add(goList[0])
-                        elif goList[-1].upper() == 'C':
-                            terms_cco.add(goList[0])
+                    if goList[-1].upper() == 'F':
+                        terms_mfo.add(goList[0])
+                    elif goList[-1].upper() == 'P':
+                        terms_bpo.add(goList[0])
+                    elif goList[-1].upper() == 'C':
+                        terms_cco.add(goList[0])
             # Increase gene counts in BPO, CCO, and MFO categories
             # depending on the corresponding flag values:
             count_mfo[protName]=len(list(terms_mfo))
@@ -137,7 +139,7 @@ def count_genes_with_EXP_old(fh_sprot, taxon_id, EXP_default=set([])):
     gene_count['CCO'] = 0
     gene_count['MFO'] = 0
 
-    for rec in sp.parse(fh_sprot):
+    for rec in ss.parse(fh_sprot, taxon_id):
         # SELECT records that are related to a specific
         # taxon_id such as 559292 for yeast:
         if taxon_id in rec.taxonomy_id:
@@ -145,20 +147,15 @@ def count_genes_with_EXP_old(fh_sprot, taxon_id, EXP_default=set([])):
             # in any of BPO, CCO, and MFO ontological categories: 
             bpo_exp_flag = cco_exp_flag = mfo_exp_flag = False
             # Go over the list of DB cross references:
-            for crossRef in rec.cross_references:
-                # Consider the cross_reference entries that
-                # relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1],
-                              (crossRef[3].split(':'))[0],
-                              crossRef[2][0]]
-                    if (crossRef[3].split(':'))[0] in EXP_default:
-                        if goList[-1].upper() == 'P':
-                            bpo_exp_flag = True
-                        elif goList[-1].upper() == 'C':
-                            cco_exp_flag = True
-                        elif goList[-1].upper() == 'F':
-                            mfo_exp_flag = True
+            for goTerm, ontSymbol, evidence in rec.go_refs:
+                goList = [goTerm, evidence, ontSymbol]
+                if evidence in EXP_default:
+                    if goList[-1].upper() == 'P':
+                        bpo_exp_flag = True
+                    elif goList[-1].upper() == 'C':
+                        cco_exp_flag = True
+                    elif goList[-1].upper() == 'F':
+                        mfo_exp_flag = True
                 # Whenever an exp evidence for all three ontological 
                 # categories are found, break out the loop:
                 if (bpo_exp_flag and cco_exp_flag and mfo_exp_flag):
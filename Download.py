@@ -12,30 +12,40 @@
         The method iterates over the entries in this file. 
         For each entry, it checks whether the file is already in 
         the workspace. if it does not find the file in the workspace, 
-        it downlaods the file by invoking download method. 
+        it downlaods the file by invoking download method. The 
+        release is kept gzip compressed (testdata file name + '.gz'); 
+        the tools of this repository read the compressed file directly.
 
     download: 
         Takes two input parameters: url and fname
         url: it is the URL to the file name to be downloaded. 
         fname: it is the file name that to be downloaded. 
 '''
+import gzip
 import os
+import shutil
 import sys
+import tarfile
 from os.path import basename 
 import urllib.request, urllib.error, urllib.parse
+import Bgzf as bg
 import Config
+import SprotScanner as ss
+import SprotSnapshot as ssn
 import configparser as cp
 
 # Default configuration file name:
 config_filename = '.config' 
 
 class Download:
-    def __init__(self, work_dir, sprot_filename):
+    def __init__(self, work_dir, sprot_filename, bgzf=False):
         self.ConfigParam = Config.read_config(config_filename)
         self.work_dir = (self.ConfigParam['workdir'].rstrip('/'))
 #        self.work_dir = work_dir 
 
         self.testData_filename = sprot_filename 
+        # Recompress the downloaded releases to BGZF format:
+        self.bgzf = bgzf
 
         self.goa_arc = 'ftp://ftp.ebi.ac.uk/pub/databases/GO/goa/old'
         self.sprot_arc_base = 'ftp://ftp.uniprot.org/pub/databases/uniprot/previous_releases'
@@ -60,47 +70,51 @@ class Download:
                              testdata_fname.split('.dat.')[1] + '.tar.gz'
             tar_fname = download_fname.rstrip('.gz')
             zip_fname = 'uniprot_sprot.dat.gz'
-            if (os.path.isfile(self.work_dir + '/' + testdata_fname)):
+            testdata_path = self.work_dir + '/' + testdata_fname
+            if (os.path.isfile(testdata_path) or \
+                os.path.isfile(testdata_path + ss.GZIP_EXT)):
+                pass
+            elif ssn.find_snapshot(testdata_path):
+                # A snapshot of the release is used in place of the file:
                 pass
             elif (os.path.isfile(self.work_dir + '/' + tar_fname)):
-                os.system('tar -xC ' + self.work_dir + ' -f ' + \
-                          self.work_dir + '/' + tar_fname + \
-                          ' ' + zip_fname)
-                os.system('gzip -d ' + self.work_dir + '/' + zip_fname)
-                os.system('mv ' +  self.work_dir + '/' + \
-                          zip_fname.rstrip('.gz') + ' ' + \
-                          self.work_dir + '/' + testdata_fname)
+                self.__extract_release(self.work_dir + '/' + tar_fname,
+                                       zip_fname, testdata_path)
                 #os.system('rm ' + self.work_dir + '/' + tar_fname)
             elif (os.path.isfile(self.work_dir + '/' + download_fname)):
-                os.system('gzip -d ' + self.work_dir + '/' + download_fname)
-                os.system('tar -xC ' + self.work_dir + ' -f ' + \
-                          self.work_dir + '/' + tar_fname + \
-                          ' ' + zip_fname)
-                os.system('gzip -d ' + self.work_dir + '/' + zip_fname)
-                os.system('mv ' +  self.work_dir + '/' + \
-                          zip_fname.rstrip('.gz') + ' ' + \
-                          self.work_dir + '/' + testdata_fname)
-                #os.system('rm ' + self.work_dir + '/' + tar_fname)
+                self.__extract_release(self.work_dir + '/' + download_fname,
+                                       zip_fname, testdata_path)
             else:
                 print(('Downloading ' + download_fname + ' ...'))
                 if (not self.download(url, download_fname)): 
                     print(('Downloading failed for ' + download_fname))
                     continue
-                os.system('gzip -d ' + self.work_dir + '/' + download_fname)
-                os.system('tar -xC ' + self.work_dir + ' -f ' + \
-                          self.work_dir + '/' + tar_fname + \
-                          ' ' + zip_fname)
-                os.system('tar -xC ' + self.work_dir + ' -f ' + \
-                          self.work_dir + '/' + tar_fname + \
-                          ' ' + zip_fname)
-                os.system('gzip -d ' + self.work_dir + '/' + zip_fname)
-                os.system('mv ' +  self.work_dir + '/' + \
-                          zip_fname.rstrip('.gz') + ' ' + \
-                          self.work_dir + '/' + testdata_fname)
-                os.system('rm ' + self.work_dir + '/' + tar_fname)
+                self.__extract_release(self.work_dir + '/' + download_fname,
+                                       zip_fname, testdata_path)
+                os.remove(self.work_dir + '/' + download_fname)
             #break
         return True 
 
+    def __extract_release(self, archive_fname, member_fname, testdata_path):
+        '''
+        This method extracts the compressed SwissProt file member_fname
+        from the archive archive_fname (.tar or .tar.gz) and keeps it
+        compressed as testdata_path + GZIP_EXT. If the Download object is
+        created with bgzf=True, the release is recompressed to block-gzip
+        (BGZF) format for random access and multi-threaded reading.
+        '''
+        gz_fname = testdata_path + ss.GZIP_EXT
+        with tarfile.open(archive_fname, 'r:*') as tar_fh:
+            member_fh = tar_fh.extractfile(member_fname)
+            if self.bgzf:
+                with gzip.GzipFile(fileobj=member_fh) as fh_in:
+                    bg.compress_file(fh_in, gz_fname)
+            else:
+                with open(gz_fname + '.tmp', 'wb') as fh_out:
+                    shutil.copyfileobj(member_fh, fh_out)
+                os.replace(gz_fname + '.tmp', gz_fname)
+        return gz_fname
+
     def download(self, url, fname):
         try:
             response = urllib.request.urlopen(url + '/' + fname)
@@ -108,7 +122,7 @@ class Download:
             return False
         except urllib.error.URLError as err:
             return False
-        out_fh = open(self.work_dir + '/' + fname, 'w')
+        out_fh = open(self.work_dir + '/' + fname, 'wb')
         out_fh.write(response.read())
         out_fh.close()
         return True
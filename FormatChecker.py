@@ -30,9 +30,10 @@ import sys
 import re
 from os.path import basename
 
-from Bio import SwissProt as sp
 import stat
 
+import SprotScanner as ss
+
 def check_gaf_format(fh_goa):
     """
     This method checks whether the format of the file
@@ -58,14 +59,26 @@ def check_sprot_format(fh_sprot):
     Otherwise,
        it returns False.
     """
-    iter_handle = sp.parse(fh_sprot) # sp.parse method returns a generator
+    if hasattr(fh_sprot, 'records'):
+        # A snapshot of SprotSnapshot module is checked when it is loaded:
+        return True
+    # Only the first record is checked, so the raw bytes of the first
+    # block of the file are read instead of parsing the whole file:
+    stream = ss._binary_stream(fh_sprot)
+    block = stream.read(ss.CHUNK_SIZE)
+    if not block.strip():
+        return True
+    if not block.startswith(b'ID   '):
+        return False
+    end = block.find(ss.RECORD_END)
+    if end < 0:
+        # The first record is longer than the block:
+        return len(block) == ss.CHUNK_SIZE
     try:
-        for rec in iter_handle:
-            break
-    except:
+        ss.parse_entry(block[:end + 1])
+    except (UnicodeDecodeError, IndexError):
         return False
-    else:
-        return True
+    return True
 
 def check_benchmark_format(fh_benchmark):
     """
@@ -0,0 +1,496 @@
+#!/usr/bin/env python
+'''
+    This module searches protein sequences against the training sequences
+    without an external BLAST program and reports the hits in the same
+    tabular format as the BLAST results read by Assign_blastScores:
+
+        qseqid sseqid evalue length pident nident bitscore
+
+    The training sequences are indexed by their k-mers (words of KMER_SIZE
+    residues of the 20 standard amino acids). The candidate training
+    sequences of a query are the sequences that share at least MIN_SHARED
+    k-mer hits with the query. The diagonals of a candidate with the most
+    k-mer hits are extended into the ungapped local alignments with the
+    highest BLOSUM62 scores, and the E-value of the best alignment is
+    estimated by the Karlin-Altschul statistics of ungapped BLOSUM62
+    alignments (LAMBDA and K). The k-mer look ups and the alignments of
+    all the candidates of a query are done with numpy array operations.
+    The module has the definition of KmerIndex class and the following
+    methods:
+
+    read_fasta(fh_fasta):
+        This method yields the (sequence id, sequence) pairs of a FASTA
+        file (file handle fh_fasta). The sequence id is the first word of
+        the title line.
+
+    encode(sequence):
+        This method returns the residues of the sequence as an array of
+        the indexes of the residues in ALPHABET. Any residue that is not
+        in ALPHABET is encoded as X.
+
+    build_index(sequences, k=KMER_SIZE, members=None, db_length=None):
+        This method builds a KmerIndex object from the (sequence id,
+        sequence) pairs of the training sequences. When the training
+        sequences were deduplicated, the dictionary members (see
+        read_members in BlastTab module) maps each sequence digest to the
+        proteins that share the sequence. The hits are then reported for
+        the proteins, and each sequence is counted once for each of its
+        proteins in the size of the database and in the limits on the
+        number of candidates and hits of a query, so that the hits are the
+        same as the hits of the full sequence file. The size of the
+        database (the number of residues) used for the E-values can also
+        be given by db_length, for example, the size of the full training
+        set when a shard of it is searched.
+
+    format_hits(query_id, hits):
+        This method returns the lines of the hits of a query in the BLAST
+        tabular format. The E-values and the bit scores are written in the
+        same way as BLAST.
+
+    search_sequences(queries, index, e_value_cutoff=E_VALUE_CUTOFF,
+                     max_target_seqs=MAX_TARGET_SEQS, workers=1):
+        This method is the entry point of this module. It searches the
+        (sequence id, sequence) pairs of the queries against the KmerIndex
+        object index, in a pool of worker processes when workers is more
+        than 1, and yields the hit lines of each query in the order of the
+        queries.
+
+    The KmerIndex class keeps the residues of all the training sequences
+    in one array and the positions of each k-mer in an inverted index
+    (the positions sorted by k-mer and the offset of each k-mer), and the
+    ids of the proteins (the entries) that share each sequence. Its
+    search method returns the hits of a query sequence to the entries.
+'''
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# The 20 standard amino acids (the k-mers are made of them):
+AMINO_ACIDS = 'ARNDCQEGHILKMFPSTWYV'
+# All the residues in the substitution matrix:
+ALPHABET = AMINO_ACIDS + 'BZX*'
+# BLOSUM62 substitution matrix in the order of ALPHABET:
+BLOSUM62 = np.array([
+    [ 4,-1,-2,-2, 0,-1,-1, 0,-2,-1,-1,-1,-1,-2,-1, 1, 0,-3,-2, 0,-2,-1, 0,-4],
+    [-1, 5, 0,-2,-3, 1, 0,-2, 0,-3,-2, 2,-1,-3,-2,-1,-1,-3,-2,-3,-1, 0,-1,-4],
+    [-2, 0, 6, 1,-3, 0, 0, 0, 1,-3,-3, 0,-2,-3,-2, 1, 0,-4,-2,-3, 3, 0,-1,-4],
+    [-2,-2, 1, 6,-3, 0, 2,-1,-1,-3,-4,-1,-3,-3,-1, 0,-1,-4,-3,-3, 4, 1,-1,-4],
+    [ 0,-3,-3,-3, 9,-3,-4,-3,-3,-1,-1,-3,-1,-2,-3,-1,-1,-2,-2,-1,-3,-3,-2,-4],
+    [-1, 1, 0, 0,-3, 5, 2,-2, 0,-3,-2, 1, 0,-3,-1, 0,-1,-2,-1,-2, 0, 3,-1,-4],
+    [-1, 0, 0, 2,-4, 2, 5,-2, 0,-3,-3, 1,-2,-3,-1, 0,-1,-3,-2,-2, 1, 4,-1,-4],
+    [ 0,-2, 0,-1,-3,-2,-2, 6,-2,-4,-4,-2,-3,-3,-2, 0,-2,-2,-3,-3,-1,-2,-1,-4],
+    [-2, 0, 1,-1,-3, 0, 0,-2, 8,-3,-3,-1,-2,-1,-2,-1,-2,-2, 2,-3, 0, 0,-1,-4],
+    [-1,-3,-3,-3,-1,-3,-3,-4,-3, 4, 2,-3, 1, 0,-3,-2,-1,-3,-1, 3,-3,-3,-1,-4],
+    [-1,-2,-3,-4,-1,-2,-3,-4,-3, 2, 4,-2, 2, 0,-3,-2,-1,-2,-1, 1,-4,-3,-1,-4],
+    [-1, 2, 0,-1,-3, 1, 1,-2,-1,-3,-2, 5,-1,-3,-1, 0,-1,-3,-2,-2, 0, 1,-1,-4],
+    [-1,-1,-2,-3,-1, 0,-2,-3,-2, 1, 2,-1, 5, 0,-2,-1,-1,-1,-1, 1,-3,-1,-1,-4],
+    [-2,-3,-3,-3,-2,-3,-3,-3,-1, 0, 0,-3, 0, 6,-4,-2,-2, 1, 3,-1,-3,-3,-1,-4],
+    [-1,-2,-2,-1,-3,-1,-1,-2,-2,-3,-3,-1,-2,-4, 7,-1,-1,-4,-3,-2,-2,-1,-2,-4],
+    [ 1,-1, 1, 0,-1, 0, 0, 0,-1,-2,-2, 0,-1,-2,-1, 4, 1,-3,-2,-2, 0, 0, 0,-4],
+    [ 0,-1, 0,-1,-1,-1,-1,-2,-2,-1,-1,-1,-1,-2,-1, 1, 5,-2,-2, 0,-1,-1, 0,-4],
+    [-3,-3,-4,-4,-2,-2,-3,-2,-2,-3,-2,-3,-1, 1,-4,-3,-2,11, 2,-3,-4,-3,-2,-4],
+    [-2,-2,-2,-3,-2,-1,-2,-3, 2,-1,-1,-2,-1, 3,-3,-2,-2, 2, 7,-1,-3,-2,-1,-4],
+    [ 0,-3,-3,-3,-1,-2,-2,-3,-3, 3, 1,-2, 1,-1,-2,-2, 0,-3,-1, 4,-3,-2,-1,-4],
+    [-2,-1, 3, 4,-3, 0, 1,-1, 0,-3,-4, 0,-3,-3,-2, 0,-1,-4,-3,-3, 4, 1,-1,-4],
+    [-1, 0, 0, 1,-3, 3, 4,-2, 0,-3,-3, 1,-1,-3,-1, 0,-1,-3,-2,-2, 1, 4,-1,-4],
+    [ 0,-1,-1,-1,-2,-1,-1,-1,-1,-1,-1,-1,-1,-1,-2, 0, 0,-2,-1,-1,-1,-1,-1,-4],
+    [-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4,-4, 1]],
+    dtype=np.int64)
+# Index of the unknown residue:
+UNKNOWN = ALPHABET.index('X')
+# Residue index of each byte (any other byte is an unknown residue):
+RESIDUE_CODES = np.full(256, UNKNOWN, dtype=np.uint8)
+for i, aa in enumerate(ALPHABET):
+    RESIDUE_CODES[ord(aa)] = i
+    RESIDUE_CODES[ord(aa.lower())] = i
+
+# Number of residues in a k-mer:
+KMER_SIZE = 3
+# Minimum number of k-mer hits between a query and a candidate:
+MIN_SHARED = 2
+# Maximum number of candidates of a query (the ones with the most k-mer
+# hits) that are aligned:
+MAX_CANDIDATES = 250
+# Number of diagonals of a candidate (the ones with the most k-mer hits)
+# that are extended:
+MAX_DIAGONALS = 2
+# Default maximum number of hits of a query (the same as BLAST):
+MAX_TARGET_SEQS = 500
+# Default E-value cut off (the same as BLAST):
+E_VALUE_CUTOFF = 10.0
+# Karlin-Altschul parameters of ungapped BLOSUM62 alignments:
+LAMBDA = 0.3176
+K = 0.134
+
+# The KmerIndex object and the search parameters shared by the queries
+# searched in a worker process:
+_shared = dict()
+
+def read_fasta(fh_fasta):
+    seq_id = None
+    lines = []
+    for line in fh_fasta:
+        line = line.strip()
+        if line.startswith('>'):
+            if seq_id is not None:
+                yield seq_id, ''.join(lines)
+            fields = line[1:].split(None, 1)
+            seq_id = fields[0] if fields else ''
+            lines = []
+        elif line:
+            lines.append(line)
+    if seq_id is not None:
+        yield seq_id, ''.join(lines)
+    return None
+
+def encode(sequence):
+    return RESIDUE_CODES[np.frombuffer(sequence.encode('ascii', 'replace'),
+                                       dtype=np.uint8)]
+
+def kmer_codes(residues, k=KMER_SIZE):
+    '''
+    This method returns the code of the k-mer at each position of the
+    encoded residues: the k-mer read as a number in base 20. The code is
+    -1 for a k-mer with a residue that is not a standard amino acid.
+    '''
+    n = len(residues) - k + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    codes = np.zeros(n, dtype=np.int64)
+    valid = np.ones(n, dtype=bool)
+    for j in range(k):
+        window = residues[j:j + n].astype(np.int64)
+        codes = codes * len(AMINO_ACIDS) + window
+        valid &= window < len(AMINO_ACIDS)
+    codes[~valid] = -1
+    return codes
+
+def build_index(sequences, k=KMER_SIZE, members=None, db_length=None):
+    seq_ids = []
+    encoded = []
+    for seq_id, sequence in sequences:
+        seq_ids.append(seq_id)
+        encoded.append(encode(sequence))
+    entry_ids = None
+    if members is not None:
+        # A sequence that is not in the members table is its own member:
+        entry_ids = [members[seq_id] if seq_id in members else [seq_id]
+                     for seq_id in seq_ids]
+    return KmerIndex(seq_ids, encoded, k, entry_ids, db_length)
+
+def __format_evalue(e_value):
+    '''
+    This method returns the text of an E-value in the same format as the
+    tabular output of BLAST.
+    '''
+    if e_value < 1.0e-180:
+        return '0.0'
+    elif e_value < 0.0009:
+        return '%.0e' % e_value
+    elif e_value < 0.1:
+        return '%.3f' % e_value
+    elif e_value < 1.0:
+        return '%.2f' % e_value
+    elif e_value < 10.0:
+        return '%.1f' % e_value
+    return '%.0f' % e_value
+
+def __format_bitscore(score):
+    '''
+    This method returns the text of the bit score of the raw alignment
+    score score in the same format as the tabular output of BLAST.
+    '''
+    bitscore = (LAMBDA * score - math.log(K)) / math.log(2)
+    if bitscore > 9999:
+        return '%.3e' % bitscore
+    elif bitscore > 99.9:
+        return '%d' % int(bitscore)
+    return '%.1f' % bitscore
+
+def format_hits(query_id, hits):
+    return ''.join(query_id + '\t' + subject_id + '\t' + \
+                   __format_evalue(e_value) + '\t' + str(length) + '\t' + \
+                   ('%.2f' % pident) + '\t' + str(nident) + '\t' + \
+                   __format_bitscore(score) + '\n'
+                   for subject_id, e_value, length, pident, nident, score
+                   in hits)
+
+def _ragged_ranges(starts, lengths):
+    '''
+    This method returns the concatenation of the ranges
+    [starts[i], starts[i] + lengths[i]) and the number of the range of
+    each element.
+    '''
+    total = int(lengths.sum())
+    range_no = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths,
+                                           lengths)
+    return np.repeat(starts, lengths) + offsets, range_no
+
+def __init_worker(index, e_value_cutoff, max_target_seqs):
+    '''
+    This method keeps the KmerIndex object and the search parameters in a
+    worker process for all the queries searched by it.
+    '''
+    _shared['index'] = index
+    _shared['e_value_cutoff'] = e_value_cutoff
+    _shared['max_target_seqs'] = max_target_seqs
+    return None
+
+def __search_query(query):
+    '''
+    This method returns the hit lines of a (query id, sequence) pair.
+    '''
+    query_id, sequence = query
+    hits = _shared['index'].search(sequence, _shared['e_value_cutoff'],
+                                   _shared['max_target_seqs'])
+    return format_hits(query_id, hits)
+
+def search_sequences(queries, index, e_value_cutoff=E_VALUE_CUTOFF,
+                     max_target_seqs=MAX_TARGET_SEQS, workers=1):
+    if workers <= 1:
+        __init_worker(index, e_value_cutoff, max_target_seqs)
+        for query in queries:
+            yield __search_query(query)
+        return None
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=__init_worker,
+                             initargs=(index, e_value_cutoff,
+                                       max_target_seqs)) as executor:
+        # executor.map returns the results in the order of the queries:
+        for lines in executor.map(__search_query, queries, chunksize=16):
+            yield lines
+    return None
+
+class KmerIndex:
+    def __init__(self, seq_ids, encoded, k=KMER_SIZE, entry_ids=None,
+                 db_length=None):
+        self.seq_ids = seq_ids
+        self.k = k
+        self.lengths = np.array([len(r) for r in encoded], dtype=np.int64)
+        # Position of the first residue of each sequence in self.residues:
+        self.seq_starts = np.cumsum(self.lengths) - self.lengths
+        self.residues = np.concatenate(encoded) if encoded else \
+                        np.empty(0, dtype=np.uint8)
+        self.__index_entries(entry_ids)
+        # Total number of residues (the size of the database):
+        if db_length is not None:
+            self.db_length = int(db_length)
+        else:
+            self.db_length = int((self.lengths * self.weights).sum())
+        self.__index_kmers(encoded)
+        return None
+
+    def __index_entries(self, entry_ids):
+        '''
+        This method keeps the ids of the entries (the proteins) of the
+        sequences in the order of the sequences: the lists entry_ids of
+        the ids of the proteins that share each sequence, or the sequence
+        ids if entry_ids is None. It also keeps the number of the entries
+        of each sequence (its weight), the position of the first entry of
+        each sequence, the sequence number of each entry, and the rank of
+        the id of each entry in sorted order.
+        '''
+        if entry_ids is None:
+            self.entry_ids = self.seq_ids
+            self.weights = np.ones(len(self.seq_ids), dtype=np.int64)
+        else:
+            self.entry_ids = [entry_id for ids in entry_ids
+                              for entry_id in ids]
+            self.weights = np.array([len(ids) for ids in entry_ids],
+                                    dtype=np.int64)
+        self.entry_starts = np.cumsum(self.weights) - self.weights
+        self.entry_seq = np.repeat(np.arange(len(self.seq_ids)),
+                                   self.weights)
+        self.entry_rank = np.empty(len(self.entry_ids), dtype=np.int64)
+        if self.entry_ids:
+            self.entry_rank[np.argsort(np.array(self.entry_ids),
+                                       kind='stable')] = \
+                np.arange(len(self.entry_ids))
+        return None
+
+    def __index_kmers(self, encoded):
+        '''
+        This method builds the inverted index: the (sequence number,
+        position) of each k-mer sorted by k-mer, and the offset of the
+        positions of each k-mer.
+        '''
+        codes = []
+        seq_nos = []
+        positions = []
+        for seq_no, residues in enumerate(encoded):
+            c = kmer_codes(residues, self.k)
+            kept = np.nonzero(c >= 0)[0]
+            codes.append(c[kept])
+            seq_nos.append(np.full(len(kept), seq_no, dtype=np.int32))
+            positions.append(kept.astype(np.int32))
+        codes = np.concatenate(codes) if codes else np.empty(0, np.int64)
+        order = np.argsort(codes, kind='stable')
+        self.kmer_seq = np.concatenate(seq_nos)[order] if seq_nos else \
+                        np.empty(0, dtype=np.int32)
+        self.kmer_pos = np.concatenate(positions)[order] if positions else \
+                        np.empty(0, dtype=np.int32)
+        self.kmer_offsets = np.searchsorted(codes[order],
+                           np.arange(len(AMINO_ACIDS) ** self.k + 1))
+        return None
+
+    def __len__(self):
+        return len(self.seq_ids)
+
+    def __candidate_diagonals(self, query):
+        '''
+        This method returns the (sequence number, diagonal) pairs of the
+        candidates of the encoded query: the MAX_DIAGONALS diagonals with
+        the most k-mer hits of each sequence of the MAX_CANDIDATES entries
+        with the most k-mer hits (ties are broken by the ids of the
+        entries). It also returns the candidate entries. The diagonal is
+        the position in the training sequence minus the position in the
+        query.
+        '''
+        codes = kmer_codes(query, self.k)
+        q_pos = np.nonzero(codes >= 0)[0]
+        codes = codes[q_pos]
+        starts = self.kmer_offsets[codes]
+        counts = self.kmer_offsets[codes + 1] - starts
+        if counts.sum() == 0:
+            return None, None, None
+        postings, kmer_no = _ragged_ranges(starts, counts)
+        seq_no = self.kmer_seq[postings].astype(np.int64)
+        diagonal = self.kmer_pos[postings].astype(np.int64) - q_pos[kmer_no]
+        # The candidates are the sequences with the most k-mer hits:
+        shared = np.bincount(seq_no, minlength=len(self.seq_ids))
+        candidates = np.nonzero(shared >= MIN_SHARED)[0]
+        if len(candidates) == 0:
+            return None, None, None
+        # The entries of the candidate sequences:
+        entries, candidate_no = _ragged_ranges(self.entry_starts[candidates],
+                                               self.weights[candidates])
+        if len(entries) > MAX_CANDIDATES:
+            order = np.lexsort((self.entry_rank[entries],
+                                -shared[candidates][candidate_no]))
+            entries = entries[order[:MAX_CANDIDATES]]
+            candidates = np.unique(self.entry_seq[entries])
+        is_candidate = np.zeros(len(self.seq_ids), dtype=bool)
+        is_candidate[candidates] = True
+        kept = is_candidate[seq_no]
+        seq_no = seq_no[kept]
+        diagonal = diagonal[kept]
+        # Count the k-mer hits of each (sequence, diagonal) pair:
+        order = np.lexsort((diagonal, seq_no))
+        seq_no = seq_no[order]
+        diagonal = diagonal[order]
+        first = np.ones(len(seq_no), dtype=bool)
+        first[1:] = (seq_no[1:] != seq_no[:-1]) | \
+                    (diagonal[1:] != diagonal[:-1])
+        group_starts = np.nonzero(first)[0]
+        hits = np.diff(np.append(group_starts, len(seq_no)))
+        seq_no = seq_no[group_starts]
+        diagonal = diagonal[group_starts]
+        # Keep the diagonals with the most hits of each sequence:
+        order = np.lexsort((-hits, seq_no))
+        seq_no = seq_no[order]
+        diagonal = diagonal[order]
+        first = np.ones(len(seq_no), dtype=bool)
+        first[1:] = seq_no[1:] != seq_no[:-1]
+        seq_first = np.maximum.accumulate(np.where(first,
+                                                   np.arange(len(seq_no)), 0))
+        kept = np.arange(len(seq_no)) - seq_first < MAX_DIAGONALS
+        return seq_no[kept], diagonal[kept], entries
+
+    def __extend_diagonals(self, query, seq_no, diagonal):
+        '''
+        This method finds the ungapped local alignment with the highest
+        score on each diagonal. The diagonals are aligned together: the
+        BLOSUM62 scores along all the diagonals are put in one array in
+        which each diagonal starts with a 0 and is shifted below the
+        diagonals before it, so that one running minimum of the prefix
+        sums gives the best alignment of each diagonal. It returns the
+        score, the length, and the number of identical residues of the
+        alignment on each diagonal.
+        '''
+        q_start = np.maximum(0, -diagonal)
+        q_end = np.minimum(len(query), self.lengths[seq_no] - diagonal)
+        lengths = q_end - q_start
+        n = len(lengths)
+        q_index, range_no = _ragged_ranges(q_start, lengths)
+        s_index = self.seq_starts[seq_no][range_no] + diagonal[range_no] + \
+                  q_index
+        q_res = query[q_index]
+        s_res = self.residues[s_index]
+        # Each diagonal takes lengths + 1 elements; the first one is 0:
+        block_starts = np.cumsum(lengths + 1) - (lengths + 1)
+        places = np.arange(len(q_index)) + range_no + 1
+        scores = np.zeros(int((lengths + 1).sum()), dtype=np.int64)
+        scores[places] = BLOSUM62[q_res, s_res]
+        idents = np.zeros(len(scores), dtype=np.int64)
+        idents[places] = q_res == s_res
+        prefix = np.cumsum(scores)
+        prefix -= np.repeat(prefix[block_starts], lengths + 1)
+        # Shift each diagonal below the diagonals before it:
+        shift = 2 * int(np.abs(BLOSUM62).max()) * (int(lengths.max()) + 1) + 1
+        prefix -= np.repeat(np.arange(n, dtype=np.int64) * shift, lengths + 1)
+        running_min = np.minimum.accumulate(prefix)
+        gain = prefix - running_min
+        # The last position of the running minimum (the alignment starts
+        # right after it):
+        positions = np.arange(len(prefix))
+        min_pos = np.maximum.accumulate(np.where(prefix == running_min,
+                                                 positions, 0))
+        best = np.maximum.reduceat(gain, block_starts)
+        is_best = gain == np.repeat(best, lengths + 1)
+        best_pos = positions[is_best]
+        best_no = np.repeat(np.arange(n), lengths + 1)[is_best]
+        # The first position of the best score of each diagonal:
+        first = np.ones(len(best_no), dtype=bool)
+        first[1:] = best_no[1:] != best_no[:-1]
+        end = best_pos[first]
+        start = min_pos[end]
+        ident_prefix = np.cumsum(idents)
+        return best, end - start, ident_prefix[end] - ident_prefix[start]
+
+    def search(self, sequence, e_value_cutoff=E_VALUE_CUTOFF,
+               max_target_seqs=MAX_TARGET_SEQS):
+        '''
+        This method returns the hits of the query sequence sorted by
+        E-value: the list of the (entry id, E-value, length, percent
+        identity, number of identical residues, score) of the best
+        alignment of the sequence of each candidate entry with an E-value
+        not larger than e_value_cutoff. At most max_target_seqs hits are
+        returned.
+        '''
+        query = encode(sequence)
+        seq_no, diagonal, entries = self.__candidate_diagonals(query)
+        if seq_no is None or len(seq_no) == 0:
+            return []
+        score, length, nident = self.__extend_diagonals(query, seq_no,
+                                                        diagonal)
+        # The best alignment of each training sequence:
+        order = np.lexsort((-score, seq_no))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = seq_no[order][1:] != seq_no[order][:-1]
+        best = order[first]
+        best = best[length[best] > 0]
+        search_space = K * len(query) * self.db_length
+        # The hit of each training sequence:
+        seq_hits = dict()
+        for i in best.tolist():
+            e_value = search_space * math.exp(-LAMBDA * score[i])
+            if e_value > e_value_cutoff:
+                continue
+            seq_hits[int(seq_no[i])] = (e_value, int(length[i]),
+                                        100.0 * nident[i] / length[i],
+                                        int(nident[i]), int(score[i]))
+        hits = []
+        for entry in entries.tolist():
+            hit = seq_hits.get(int(self.entry_seq[entry]))
+            if hit is not None:
+                hits.append((self.entry_ids[entry],) + hit)
+        hits.sort(key=lambda hit: (hit[1], -hit[5], hit[0]))
+        return hits[:max_target_seqs]
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
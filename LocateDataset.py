@@ -28,6 +28,9 @@
             it returns the file path to the source directory
         else if the file is found in the workspace:
             it returns the file path to the workspace
+        else if only the compressed copy of the file (file name + '.gz')
+        is found in the source directory or the workspace:
+            it returns the file path to the compressed copy
         otherwise:
             it prints and error message and then exits the program.
 
@@ -80,6 +83,11 @@ def locate_SwissProtfile(infile, work_dir):
         return infile
     elif os.path.exists(work_dir + '/' + basename(infile)):
         return work_dir + '/' + basename(infile)
+    elif os.path.exists(infile + '.gz'):
+        # The release is kept only in compressed form:
+        return infile + '.gz'
+    elif os.path.exists(work_dir + '/' + basename(infile) + '.gz'):
+        return work_dir + '/' + basename(infile) + '.gz'
     else:
         print(infile + ' is NOT available. Quitting ' + inspect.stack() [1][1] + ' Tool ...')
         print ('*********************************************************************')
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+'''
+    This module has the definition of OutputWriter class, which writes
+    the sequence (FASTA) files and the map files of the extraction tools
+    through a large write buffer, and the following methods:
+
+    open_output(fname, compress='', buffer_size=BUFFER_SIZE):
+        This method is the entry point of this module. It opens the file
+        fname for writing and returns an OutputWriter object. The file is
+        written as it is (compress is an empty string), gzip compressed
+        (compress is 'gzip'), or block-gzip compressed (compress is
+        'bgzf', see Bgzf module).
+
+    output_fname(fname, compress=''):
+        This method returns the name of the output file fname with the
+        extension of the compression type compress.
+
+    open_text(fname):
+        This method opens a file written by open_output (compressed or
+        not) for reading as text.
+
+    as_writer(fh, buffer_size=BUFFER_SIZE):
+        This method returns fh if it is already an OutputWriter (or
+        DedupWriter or ShardWriter) object.
+        Otherwise, it returns an OutputWriter object that writes to the
+        open file handle fh.
+
+    format_sequence(sequence):
+        This method returns the lines of the sequence in FASTA format
+        (LINE_WIDTH residues per line).
+
+    format_fasta(seq_id, description, sequence):
+        This method returns a sequence in FASTA format. The text is the
+        same as the text written by SeqIO.write of Biopython for a
+        SeqRecord with the same id and description.
+
+    members_fname(fname):
+        This method returns the name of the members table of the sequence
+        file fname (the extension MEMBERS_EXT is added before the
+        extension of a compressed file).
+
+    sequence_digest(sequence):
+        This method returns the digest (MD5 hex digest) of the residues of
+        the sequence, which is the id of the sequence in a deduplicated
+        sequence file.
+
+    shard_fname(fname, shard):
+        This method returns the name of the shard number shard (from 1) of
+        the sequence file fname (the extension SHARD_EXT and the shard
+        number are added before the extension of a compressed file).
+
+    shards_fname(fname):
+        This method returns the name of the shard table (SHARDS_EXT) of
+        the sequence file fname.
+
+    open_shards(fname, shards, compress=''):
+        This method opens the shards of the sequence file fname and its
+        shard table for writing and returns a ShardWriter object.
+
+    assign_shards(lengths, shards):
+        This method assigns the sequences of the lengths (numbers of
+        residues) to the shards (from 0) with the greedy bin packing of
+        the longest sequences first: each sequence goes to the shard with
+        the fewest residues so far. It returns the list of the shards of
+        the sequences.
+
+    merge_fragments(fragments, writer, remove=True):
+        This method merges the output fragments of parallel workers into
+        the writer in order. fragments is an iterable of (fragment number,
+        fragment file name) pairs in any order, for example, in the order
+        in which the workers finish. A fragment is written as soon as all
+        the fragments before it are written. The fragment files are
+        removed after they are merged unless remove is False.
+
+    The OutputWriter class formats the sequences directly (no SeqRecord
+    objects) and writes the text to the file only when the buffer is full
+    or the writer is flushed.
+
+    The DedupWriter class writes each distinct sequence once to a sequence
+    file under its digest and, when it is closed, writes the members table
+    (MEMBERS_EXT): the digest and the comma separated ids of the sequences
+    with that digest on each line, in the order the digests are written.
+
+    The ShardWriter class splits a sequence file into shards with about
+    the same number of residues, so that the shards can be searched in
+    parallel and finish at about the same time. The sequences are kept
+    until the writer is closed; then each sequence is written to its shard
+    (see assign_shards) in the order it was written to the writer, and the
+    shard table (SHARDS_EXT) is written: the sequence id and the shard
+    number (from 1) on each line, in the order of the sequences. The hits
+    of the shards are merged back into this order by the Merge_hits tool.
+'''
+import gzip
+import hashlib
+import heapq
+import io
+import os
+import sys
+
+import Bgzf as bg
+
+# Compression types of the output files:
+COMPRESS_TYPES = ['', 'gzip', 'bgzf']
+# Extension of the compressed output files:
+GZIP_EXT = '.gz'
+# Size (in characters) of the write buffer:
+BUFFER_SIZE = 1 << 20
+# Extension of the members table of a deduplicated sequence file:
+MEMBERS_EXT = '.members'
+# Extension of the shards of a sequence file (followed by the shard number):
+SHARD_EXT = '.shard'
+# Extension of the shard table of a sharded sequence file:
+SHARDS_EXT = '.shards'
+# Number of residues in a line of a FASTA file (the same as SeqIO):
+LINE_WIDTH = 60
+
+def output_fname(fname, compress=''):
+    if compress and not fname.endswith(GZIP_EXT):
+        return fname + GZIP_EXT
+    return fname
+
+def open_output(fname, compress='', buffer_size=BUFFER_SIZE):
+    if compress not in COMPRESS_TYPES:
+        raise ValueError('Unknown compression type: ' + str(compress))
+    if compress == 'gzip':
+        fh = gzip.open(fname, 'wb')
+    elif compress == 'bgzf':
+        fh = bg.BgzfWriter(fname)
+    else:
+        fh = open(fname, 'wb')
+    return OutputWriter(fh, buffer_size)
+
+def open_text(fname):
+    if fname.endswith(GZIP_EXT):
+        return gzip.open(fname, 'rt')
+    return open(fname, 'r')
+
+def as_writer(fh, buffer_size=BUFFER_SIZE):
+    if isinstance(fh, (OutputWriter, DedupWriter, ShardWriter)):
+        return fh
+    return OutputWriter(fh, buffer_size)
+
+def __clean(text):
+    '''
+    This method replaces the white space in the text of a FASTA title
+    line with single spaces, the same as SeqIO.
+    '''
+    return ' '.join(text.split())
+
+def format_sequence(sequence):
+    return ''.join(sequence[i:i + LINE_WIDTH] + '\n'
+                   for i in range(0, len(sequence), LINE_WIDTH))
+
+def _format_title(seq_id, description):
+    seq_id = __clean(str(seq_id))
+    description = __clean(str(description))
+    if description and description.split(None, 1)[0] == seq_id:
+        # The description includes the id at the start:
+        return '>' + description + '\n'
+    elif description:
+        return '>' + seq_id + ' ' + description + '\n'
+    return '>' + seq_id + '\n'
+
+def format_fasta(seq_id, description, sequence):
+    return _format_title(seq_id, description) + format_sequence(sequence)
+
+def __insert_ext(fname, ext):
+    '''
+    This method adds the extension ext to the file name fname before the
+    extension of a compressed file.
+    '''
+    if fname.endswith(GZIP_EXT):
+        return fname[:-len(GZIP_EXT)] + ext + GZIP_EXT
+    return fname + ext
+
+def members_fname(fname):
+    return __insert_ext(fname, MEMBERS_EXT)
+
+def sequence_digest(sequence):
+    return hashlib.md5(sequence.encode('ascii')).hexdigest()
+
+def shard_fname(fname, shard):
+    return __insert_ext(fname, SHARD_EXT + str(shard))
+
+def shards_fname(fname):
+    return __insert_ext(fname, SHARDS_EXT)
+
+def open_shards(fname, shards, compress=''):
+    writers = [open_output(shard_fname(fname, shard + 1), compress)
+               for shard in range(shards)]
+    return ShardWriter(fname, writers,
+                       open_output(shards_fname(fname), compress))
+
+def assign_shards(lengths, shards):
+    assigned = [0] * len(lengths)
+    # (number of residues, shard) of each shard:
+    loads = [(0, shard) for shard in range(shards)]
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        load, shard = heapq.heappop(loads)
+        assigned[i] = shard
+        heapq.heappush(loads, (load + lengths[i], shard))
+    return assigned
+
+def merge_fragments(fragments, writer, remove=True):
+    waiting = {}
+    next_fragment = 0
+    for fragment_no, fragment_fname in fragments:
+        waiting[fragment_no] = fragment_fname
+        # Write the fragments that complete the prefix of the fragments:
+        while next_fragment in waiting:
+            fragment_fname = waiting.pop(next_fragment)
+            with open_text(fragment_fname) as fh:
+                while True:
+                    text = fh.read(writer.buffer_size)
+                    if not text:
+                        break
+                    writer.write(text)
+            if remove:
+                os.remove(fragment_fname)
+            next_fragment += 1
+    if waiting:
+        raise ValueError('Missing output fragment ' + str(next_fragment))
+    return next_fragment
+
+class OutputWriter:
+    def __init__(self, fh, buffer_size=BUFFER_SIZE):
+        self.fh = fh
+        self.name = getattr(fh, 'name', None)
+        self.buffer_size = buffer_size
+        # A text file handle is written as it is; any other file handle
+        # is written as UTF-8 bytes:
+        self.binary = not isinstance(fh, io.TextIOBase)
+        self.buffer = []
+        self.buffered = 0
+        return None
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.buffer_size:
+            self.__write_buffer()
+        return len(text)
+
+    def write_fasta(self, seq_id, description, sequence=None, lines=None):
+        '''
+        This method writes a sequence in FASTA format. The lines of the
+        sequence can be supplied already formatted by format_sequence
+        (for example, by a worker process) instead of the sequence.
+        '''
+        if lines is None:
+            lines = format_sequence(sequence)
+        return self.write(_format_title(seq_id, description) + lines)
+
+    def write_map(self, *fields):
+        '''
+        This method writes a line of a map file: the fields separated by
+        tabs.
+        '''
+        return self.write('\t'.join(str(field) for field in fields) + '\n')
+
+    def __write_buffer(self):
+        if not self.buffer:
+            return None
+        text = ''.join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        if self.binary:
+            self.fh.write(text.encode('utf-8'))
+        else:
+            self.fh.write(text)
+        return None
+
+    def flush(self):
+        self.__write_buffer()
+        self.fh.flush()
+        return None
+
+    def close(self):
+        if self.fh.closed:
+            return None
+        self.__write_buffer()
+        self.fh.close()
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+class DedupWriter:
+    def __init__(self, writer, members_writer):
+        self.writer = writer
+        self.members_writer = members_writer
+        self.name = writer.name
+        # The ids of the sequences of each digest:
+        self.members = dict()
+        return None
+
+    def write_fasta(self, seq_id, description, sequence=None, lines=None):
+        '''
+        This method writes the sequence under its digest unless a sequence
+        with the same residues is already written, and adds seq_id to the
+        members of the digest. The description is not written.
+        '''
+        if sequence is None:
+            sequence = lines.replace('\n', '')
+        digest = sequence_digest(sequence)
+        if digest in self.members:
+            self.members[digest].append(str(seq_id))
+            return 0
+        self.members[digest] = [str(seq_id)]
+        return self.writer.write_fasta(digest, '', sequence, lines)
+
+    def flush(self):
+        self.writer.flush()
+        return None
+
+    def close(self):
+        for digest in self.members:
+            self.members_writer.write_map(digest,
+                                          ','.join(self.members[digest]))
+        self.members = dict()
+        self.writer.close()
+        self.members_writer.close()
+        return None
+
+class ShardWriter:
+    def __init__(self, fname, writers, table_writer):
+        self.name = fname
+        self.writers = writers
+        self.table_writer = table_writer
+        # The ids, the FASTA text, and the lengths of the sequences:
+        self.seq_ids = []
+        self.records = []
+        self.lengths = []
+        return None
+
+    def write_fasta(self, seq_id, description, sequence=None, lines=None):
+        '''
+        This method keeps the sequence until the writer is closed. The
+        lines of the sequence can be supplied already formatted (see
+        OutputWriter.write_fasta).
+        '''
+        if lines is None:
+            lines = format_sequence(sequence)
+        title = _format_title(seq_id, description)
+        self.seq_ids.append(title[1:].split(None, 1)[0])
+        self.records.append(title + lines)
+        self.lengths.append(len(lines) - lines.count('\n'))
+        return len(self.records[-1])
+
+    def flush(self):
+        return None
+
+    def close(self):
+        if self.records:
+            assigned = assign_shards(self.lengths, len(self.writers))
+            for seq_id, text, shard in zip(self.seq_ids, self.records,
+                                           assigned):
+                self.writers[shard].write(text)
+                self.table_writer.write_map(seq_id, shard + 1)
+            self.seq_ids = []
+            self.records = []
+            self.lengths = []
+        for writer in self.writers:
+            writer.close()
+        self.table_writer.close()
+        return None
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
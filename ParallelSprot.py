@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+'''
+    This module has the following methods to go over the records of a
+    UniProtKB/SwissProt file in several worker processes:
+
+    chunk_ranges(sprot_fname, n_chunks):
+        This method splits the file into (at most) n_chunks byte ranges.
+        Each range starts at the beginning of a record and ends right
+        after a '//' terminator line, so that no record is split between
+        two ranges. The ranges of a block-gzip (BGZF) file are the ranges
+        of its uncompressed data.
+
+    parse_range(sprot_fname, start, end, taxon_id=''):
+        This method yields the records of SprotScanner module in the byte
+        range [start, end) of the file.
+
+    map_records(sprot_fname, func, args=(), taxon_id='', workers=1):
+        This method is the entry point of this module. It splits the file
+        into byte ranges and calls func(records, *args) for the records of
+        each range in a pool of worker processes. It yields the results of
+        the ranges in the order of the ranges in the file, so the caller
+        can merge them deterministically. func must be a module level
+        method so that it can be sent to the worker processes.
+
+    sprot_fname(fh_sprot):
+        This method returns the name of the SwissProt file with handle
+        fh_sprot if the file can be split into byte ranges. Otherwise,
+        (a snapshot, a gzip compressed file that is not in BGZF format, or
+        a stream without a file name) it returns None.
+'''
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import Bgzf as bg
+import SprotScanner as ss
+
+# Number of byte ranges for each worker process. Having more ranges than
+# workers evens out the load when the records are not evenly distributed:
+CHUNKS_PER_WORKER = 4
+# Size of the blocks read while looking for a record terminator:
+SEARCH_SIZE = 1 << 20
+
+class RangeReader:
+    '''
+    A binary file reader that stops at the end of a byte range.
+    '''
+    def __init__(self, sprot_fname, start, end):
+        self.name = sprot_fname
+        self.fh = ss.open_release(sprot_fname, threads=1)
+        self.fh.seek(start)
+        self.remaining = end - start
+        return None
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fh.close()
+        return None
+
+def sprot_fname(fh_sprot):
+    if hasattr(fh_sprot, 'records'):
+        return None
+    fname = getattr(fh_sprot, 'name', None)
+    if not isinstance(fname, str) or not os.path.isfile(fname):
+        return None
+    if fname.endswith(ss.GZIP_EXT) and not bg.is_bgzf(fname):
+        return None
+    return fname
+
+def __release_size(fh):
+    '''
+    This method returns the size of the (uncompressed) data of the file
+    with handle fh.
+    '''
+    if isinstance(fh, bg.BgzfReader):
+        return fh.size()
+    return os.fstat(fh.fileno()).st_size
+
+def __next_boundary(fh, offset, size):
+    '''
+    This method returns the offset of the first record that starts at
+    or after offset in the file with handle fh.
+    '''
+    fh.seek(offset)
+    pending = b''
+    while True:
+        block = fh.read(SEARCH_SIZE)
+        if not block:
+            return size
+        data = pending + block
+        end = data.find(ss.RECORD_END)
+        if end >= 0:
+            eol = data.find(b'\n', end + len(ss.RECORD_END))
+            if eol >= 0:
+                return offset - len(pending) + eol + 1
+        # Keep the tail of the block in case a terminator is split:
+        pending = data[-(len(ss.RECORD_END) + 2):]
+        offset += len(block)
+
+def chunk_ranges(sprot_fname, n_chunks):
+    boundaries = [0]
+    with ss.open_release(sprot_fname, threads=1) as fh:
+        size = __release_size(fh)
+        for i in range(1, n_chunks):
+            boundary = __next_boundary(fh, size * i // n_chunks, size)
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    if size > boundaries[-1]:
+        boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+def parse_range(sprot_fname, start, end, taxon_id=''):
+    reader = RangeReader(sprot_fname, start, end)
+    try:
+        for rec in ss.parse(reader, taxon_id):
+            yield rec
+    finally:
+        reader.close()
+    return None
+
+def __run_range(task):
+    fname, start, end, taxon_id, func, args = task
+    return func(parse_range(fname, start, end, taxon_id), *args)
+
+def map_records(sprot_fname, func, args=(), taxon_id='', workers=1):
+    ranges = chunk_ranges(sprot_fname, max(1, workers) * CHUNKS_PER_WORKER)
+    tasks = [(sprot_fname, start, end, taxon_id, func, args)
+             for start, end in ranges]
+    if workers <= 1:
+        for task in tasks:
+            yield __run_range(task)
+        return None
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # executor.map returns the results in the order of the tasks:
+        for result in executor.map(__run_range, tasks):
+            yield result
+    return None
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
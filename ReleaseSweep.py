@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+'''
+    This module has the following methods to process a series of
+    UniProtKB/SwissProt releases concurrently:
+
+    sweep_releases(sprot_fnames, func, args=(), releases=1,
+                   memory_budget=0, workers=1):
+        This method is the entry point of this module. It calls
+        func(sprot_fname, *args) for each release in sprot_fnames in a
+        pool of (at most) releases worker processes and yields the
+        (sprot_fname, result) pairs in the order of sprot_fnames. A result
+        is yielded as soon as the results of all the releases before it
+        are yielded, so the caller can write the rows of an output file in
+        release order while the later releases are still being processed.
+        When memory_budget (in MB) is supplied, a release is started only
+        if the estimated memory of the running releases stays within the
+        budget (a single release is always allowed to run). workers is the
+        number of worker processes that each release uses, which is taken
+        into account in the memory estimate. func must be a module level
+        method so that it can be sent to the worker processes.
+
+    estimate_memory(sprot_fname, workers=1):
+        This method returns the estimated memory (in MB) needed to process
+        the release sprot_fname: a fixed amount for each process that reads
+        the release as a stream, plus the size of the columns of the
+        snapshot of the release if a snapshot is used.
+'''
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+
+import SprotSnapshot as ssn
+
+# Memory (in MB) of a process that reads a release as a stream:
+STREAM_MEMORY = 256
+
+def estimate_memory(sprot_fname, workers=1):
+    memory = STREAM_MEMORY * max(1, workers)
+    snap_fname = ssn.find_snapshot(sprot_fname)
+    if snap_fname:
+        # The columns of a snapshot are loaded into memory:
+        memory += os.path.getsize(snap_fname) // (1 << 20)
+    return memory
+
+def sweep_releases(sprot_fnames, func, args=(), releases=1, memory_budget=0,
+                   workers=1):
+    sprot_fnames = list(sprot_fnames)
+    if releases <= 1 or len(sprot_fnames) <= 1:
+        for sprot_fname in sprot_fnames:
+            yield sprot_fname, func(sprot_fname, *args)
+        return None
+    memory = [estimate_memory(f, workers) for f in sprot_fnames]
+    results = {}
+    running = {}
+    next_start = 0
+    next_yield = 0
+    with ProcessPoolExecutor(max_workers=releases) as executor:
+        while next_yield < len(sprot_fnames):
+            # Start the releases that fit in the pool and the budget:
+            in_use = sum(memory[i] for i in running.values())
+            while next_start < len(sprot_fnames) and \
+                  len(running) < releases and \
+                  (not running or memory_budget <= 0 or
+                   in_use + memory[next_start] <= memory_budget):
+                future = executor.submit(func, sprot_fnames[next_start],
+                                         *args)
+                running[future] = next_start
+                in_use += memory[next_start]
+                next_start += 1
+            done, not_done = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+            # Yield the results that complete the prefix of the releases:
+            while next_yield in results:
+                yield sprot_fnames[next_yield], results.pop(next_yield)
+                next_yield += 1
+    return None
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
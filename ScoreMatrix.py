@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+'''
+    This module keeps the prediction scores of the targets as a sparse
+    target x GO term matrix in compressed sparse row (CSR) format: the
+    scores of the i-th target are data[indptr[i]:indptr[i+1]] and their
+    GO terms are terms[indices[indptr[i]:indptr[i+1]]]. A matrix is saved
+    as a single numpy .npz file (SCORE_EXT) with the arrays indptr,
+    indices, and data, and the string tables targets and terms. The
+    scores of a target are kept once for each GO term (the largest score
+    if a term is listed more than once), and the GO terms are numbered in
+    the order they first appear in the scores.
+
+    The module has the definition of ScoreMatrix and MatrixWriter classes
+    and the following methods:
+
+    from_scores(scores):
+        This method builds a ScoreMatrix object from the (target id, GO
+        term, score) triples of scores.
+
+    read_text(fh_scores):
+        This method reads a prediction file in the CAFA text format (file
+        handle fh_scores): target id, GO term, and score on each line. The
+        AUTHOR, MODEL, KEYWORDS, ACCURACY, and END records are skipped.
+        It returns a ScoreMatrix object.
+
+    write_text(matrix, fh_scores):
+        This method writes a ScoreMatrix object in the CAFA text format.
+
+    save(matrix, fname):
+        This method saves a ScoreMatrix object into the file fname.
+
+    load(fname):
+        This method loads a ScoreMatrix object from the file fname.
+
+    is_matrix_file(fname):
+        This method returns True if the file fname is a saved ScoreMatrix
+        (a numpy .npz file) and False if it is a text file.
+
+    open_scores(fname, score_format='text'):
+        This method opens the file fname to write the score lines of a
+        scorer. It returns an OutputWriter object (see OutputWriter module)
+        for the text format and a MatrixWriter object for the 'npz' format.
+
+    The MatrixWriter class takes the score lines written by a scorer, for
+    example, by Assign_blastScores, and saves them as a ScoreMatrix object
+    when it is closed.
+'''
+import sys
+import zipfile
+from array import array
+from collections import defaultdict
+
+import numpy as np
+
+import OutputWriter as ow
+
+# Extension of the score matrix files:
+SCORE_EXT = '.npz'
+# Formats of the score files:
+SCORE_FORMATS = ['text', 'npz']
+# Records of the CAFA text format that are not predictions:
+CAFA_RECORDS = set(['AUTHOR', 'MODEL', 'KEYWORDS', 'ACCURACY', 'END'])
+
+def from_scores(scores):
+    targets = dict()
+    terms = dict()
+    rows = array('l')
+    cols = array('l')
+    data = array('d')
+    for target_id, gt, score in scores:
+        rows.append(targets.setdefault(target_id, len(targets)))
+        cols.append(terms.setdefault(gt, len(terms)))
+        data.append(float(score))
+    return _build_matrix(list(targets), list(terms),
+                         np.array(rows, dtype=np.int64),
+                         np.array(cols, dtype=np.int64),
+                         np.array(data, dtype=np.float64))
+
+def _build_matrix(targets, terms, rows, cols, data):
+    '''
+    This method builds a ScoreMatrix object from the coordinates (rows,
+    cols) and the scores data. The largest score of each (target, GO
+    term) pair is kept.
+    '''
+    # Sort by target, then by GO term, then by decreasing score:
+    order = np.lexsort((-data, cols, rows))
+    rows = rows[order]
+    cols = cols[order]
+    data = data[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+    rows = rows[first]
+    indptr = np.searchsorted(rows, np.arange(len(targets) + 1))
+    return ScoreMatrix(targets, terms, indptr, cols[first], data[first])
+
+def read_text(fh_scores):
+    scores = []
+    for line in fh_scores:
+        if type(line) is bytes:
+            line = line.decode('utf-8')
+        fields = line.split()
+        if not fields or fields[0] in CAFA_RECORDS:
+            continue
+        if len(fields) != 3:
+            raise ValueError('A score line should have three fields: ' + \
+                             line.strip())
+        scores.append(fields)
+    return from_scores(scores)
+
+def write_text(matrix, fh_scores):
+    for target_id, term_scores in matrix.items():
+        fh_scores.write(''.join(target_id + '\t' + gt + '\t' + \
+                                ('%.2f' % score) + '\n'
+                                for gt, score in term_scores))
+    return None
+
+def save(matrix, fname):
+    fh = open(fname, 'wb')
+    np.savez_compressed(fh, targets=np.array(matrix.targets, dtype=str),
+                        terms=np.array(matrix.terms, dtype=str),
+                        indptr=matrix.indptr, indices=matrix.indices,
+                        data=matrix.data)
+    fh.close()
+    return None
+
+def load(fname):
+    with np.load(fname, allow_pickle=False) as arrays:
+        return ScoreMatrix(arrays['targets'].tolist(),
+                           arrays['terms'].tolist(), arrays['indptr'],
+                           arrays['indices'], arrays['data'])
+
+def is_matrix_file(fname):
+    return zipfile.is_zipfile(fname)
+
+def open_scores(fname, score_format='text'):
+    if score_format not in SCORE_FORMATS:
+        raise ValueError('Unknown score format: ' + str(score_format))
+    if score_format == 'npz':
+        return MatrixWriter(fname)
+    return ow.open_output(fname)
+
+class ScoreMatrix:
+    def __init__(self, targets, terms, indptr, indices, data):
+        self.targets = targets
+        self.terms = terms
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=np.float32)
+        self.target_index = dict((t, i) for i, t in enumerate(targets))
+        return None
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, target_id):
+        return target_id in self.target_index
+
+    def shape(self):
+        return (len(self.targets), len(self.terms))
+
+    def target_scores(self, target_id):
+        '''
+        This method returns the list of the (GO term, score) pairs of the
+        target target_id.
+        '''
+        i = self.target_index.get(target_id)
+        if i is None:
+            return []
+        start, end = self.indptr[i], self.indptr[i + 1]
+        terms = self.terms
+        return [(terms[gi], score) for gi, score in
+                zip(self.indices[start:end].tolist(),
+                    self.data[start:end].tolist())]
+
+    def items(self):
+        '''
+        This method yields the (target id, list of the (GO term, score)
+        pairs) of each target.
+        '''
+        for target_id in self.targets:
+            yield target_id, self.target_scores(target_id)
+        return None
+
+    def prediction_data(self):
+        '''
+        This method returns the scores in the same form as the data of
+        GOPred class (see CAFAAssess): a dictionary whose keys are the
+        target ids and whose values are the lists of {'term': GO term,
+        'confidence': score}.
+        '''
+        data = defaultdict(list)
+        for target_id, term_scores in self.items():
+            data[target_id] = [{'term': gt, 'confidence': round(score, 2)}
+                               for gt, score in term_scores]
+        return data
+
+class MatrixWriter:
+    def __init__(self, fname):
+        self.name = fname
+        self.buffer_size = ow.BUFFER_SIZE
+        self.closed = False
+        # The text after the last complete line that is written:
+        self.pending = ''
+        self.targets = dict()
+        self.terms = dict()
+        self.rows = array('l')
+        self.cols = array('l')
+        self.data = array('d')
+        return None
+
+    def write(self, text):
+        '''
+        This method adds the scores of the complete lines of the text
+        (target id, GO term, and score separated by tabs). The text after
+        the last complete line is kept until the rest of the line is
+        written.
+        '''
+        size = len(text)
+        text = self.pending + text
+        end = text.rfind('\n') + 1
+        self.pending = text[end:]
+        targets = self.targets
+        terms = self.terms
+        for line in text[:end].splitlines():
+            target_id, gt, score = line.split('\t')
+            self.rows.append(targets.setdefault(target_id, len(targets)))
+            self.cols.append(terms.setdefault(gt, len(terms)))
+            self.data.append(float(score))
+        return size
+
+    def flush(self):
+        return None
+
+    def close(self):
+        if self.closed:
+            return None
+        if self.pending:
+            self.write('\n')
+        matrix = _build_matrix(list(self.targets), list(self.terms),
+                               np.array(self.rows, dtype=np.int64),
+                               np.array(self.cols, dtype=np.int64),
+                               np.array(self.data, dtype=np.float64))
+        save(matrix, self.name)
+        self.closed = True
+        return None
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
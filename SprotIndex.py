@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+'''
+    This module has the definition of SprotIndex class and the following
+    methods to build, save, and load the offset index of a
+    UniProtKB/SwissProt file:
+
+    build_offset_index(fh_sprot):
+        This method goes over the raw records of a UniProtKB/SwissProt file
+        (file handle fh_sprot) once and records the byte offset and the
+        length of each record together with the accessions (primary and
+        secondary) of the record. Only the AC lines of the records are
+        tokenized. It returns a dictionary of numpy arrays.
+
+    load_offset_index(fh_sprot):
+        This method loads the offset index saved next to the SwissProt
+        file if it was built from the same release file. Otherwise, it
+        builds the index by invoking build_offset_index and saves it next
+        to the SwissProt file with the extension INDEX_EXT.
+
+    open_index(fh_sprot):
+        This method is the entry point of this module. It returns a
+        SprotIndex object for the SwissProt file with handle fh_sprot, or
+        None if the handle does not belong to a SwissProt file on disk
+        (for example, a snapshot of SprotSnapshot module) or the file is
+        gzip compressed but not in block-gzip (BGZF) format.
+
+    The SprotIndex class maps the SwissProt file into memory and gives
+    random access to the records: it finds the records of an accession
+    and returns a single record, or only its sequence, without reading
+    the rest of the file. The records of a BGZF file are read by seeking
+    the BgzfReader of Bgzf module to their uncompressed offsets.
+'''
+import mmap
+import os
+import sys
+import numpy as np
+
+import Bgzf as bg
+import SprotScanner as ss
+
+# Extension of the index file saved next to the SwissProt file:
+INDEX_EXT = '.offsets.npz'
+# Version of the index file format:
+INDEX_VERSION = 1
+
+def build_offset_index(fh_sprot):
+    '''
+    This method builds the arrays of the offset index. The accessions
+    are kept in upper case and sorted, each with the number of the
+    record it belongs to.
+    '''
+    offsets = []
+    lengths = []
+    accessions = []
+    acc_record = []
+    print('      Building the offset index of ' + \
+          os.path.basename(fh_sprot.name) + ' ...')
+    for offset, entry in ss.iter_entry_offsets(fh_sprot):
+        rec_no = len(offsets)
+        offsets.append(offset)
+        lengths.append(len(entry))
+        # The AC lines come before the DT lines of a record:
+        dt = entry.find(b'\nDT   ')
+        for acc in ss.parse_accessions(entry[:dt] if dt >= 0 else entry):
+            accessions.append(acc.upper())
+            acc_record.append(rec_no)
+    accessions = np.array(accessions, dtype=str)
+    acc_record = np.array(acc_record, dtype=np.int64)
+    order = np.argsort(accessions, kind='stable')
+    index = {}
+    index['offsets'] = np.array(offsets, dtype=np.int64)
+    index['lengths'] = np.array(lengths, dtype=np.int64)
+    index['accessions'] = accessions[order]
+    index['acc_record'] = acc_record[order]
+    return index
+
+def __release_stamp(sprot_fname):
+    st = os.stat(sprot_fname)
+    return np.array([INDEX_VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+def load_offset_index(fh_sprot):
+    '''
+    This method loads the offset index saved next to the SwissProt file
+    if it is up to date. Otherwise, it builds the index and saves it.
+    '''
+    index_fname = fh_sprot.name + INDEX_EXT
+    if os.path.exists(index_fname):
+        try:
+            with np.load(index_fname, allow_pickle=False) as saved:
+                if np.array_equal(saved['stamp'],
+                                  __release_stamp(fh_sprot.name)):
+                    return dict((k, saved[k]) for k in saved.files
+                                if k != 'stamp')
+        except (OSError, ValueError, KeyError):
+            pass
+    fh_sprot.seek(0)
+    index = build_offset_index(fh_sprot)
+    try:
+        np.savez(index_fname, stamp=__release_stamp(fh_sprot.name), **index)
+    except OSError:
+        print('      Could not save the offset index to ' + \
+              os.path.basename(index_fname))
+    return index
+
+def open_index(fh_sprot):
+    if hasattr(fh_sprot, 'records'):
+        return None
+    fname = getattr(fh_sprot, 'name', None)
+    if not isinstance(fname, str) or not os.path.isfile(fname) or \
+       os.path.getsize(fname) == 0:
+        return None
+    if fname.endswith(ss.GZIP_EXT) and not bg.is_bgzf(fname):
+        return None
+    return SprotIndex(fname, load_offset_index(fh_sprot))
+
+class SprotIndex:
+    def __init__(self, sprot_fname, index):
+        self.name = sprot_fname
+        self.offsets = index['offsets']
+        self.lengths = index['lengths']
+        self.accessions = index['accessions']
+        self.acc_record = index['acc_record']
+        if bg.is_bgzf(sprot_fname):
+            self.fh = bg.BgzfReader(sprot_fname, threads=1)
+            self.mm = None
+        else:
+            self.fh = open(sprot_fname, 'rb')
+            self.mm = mmap.mmap(self.fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+        self.fh.close()
+        return None
+
+    def find(self, accession):
+        '''
+        This method returns the list of the numbers (in the order of the
+        file) of the records that have the accession as their primary or
+        secondary accession. The comparison is case-insensitive.
+        '''
+        accession = accession.upper()
+        lo = np.searchsorted(self.accessions, accession, side='left')
+        hi = np.searchsorted(self.accessions, accession, side='right')
+        return sorted(self.acc_record[lo:hi].tolist())
+
+    def get_entry(self, rec_no):
+        '''
+        This method returns the raw bytes of the record rec_no.
+        '''
+        start = int(self.offsets[rec_no])
+        if self.mm is None:
+            self.fh.seek(start)
+            return self.fh.read(int(self.lengths[rec_no]))
+        return self.mm[start:start + int(self.lengths[rec_no])]
+
+    def get_record(self, rec_no, taxon_id=''):
+        '''
+        This method returns the SprotRecord of the record rec_no, or None
+        if taxon_id is supplied and the record belongs to another species.
+        '''
+        return ss.parse_entry(self.get_entry(rec_no), taxon_id)
+
+    def get_sequence(self, rec_no):
+        '''
+        This method returns the sequence of the record rec_no. Only the
+        SQ block at the end of the record is read.
+        '''
+        if self.mm is None:
+            data = self.get_entry(rec_no)
+            start = 0
+            end = len(data)
+        else:
+            data = self.mm
+            start = int(self.offsets[rec_no])
+            end = start + int(self.lengths[rec_no])
+        sq = data.rfind(b'\nSQ   ', start, end)
+        if sq < 0:
+            return ''
+        eol = data.find(b'\n', sq + 1, end)
+        if eol < 0:
+            return ''
+        return b''.join(data[eol + 1:end].split()).decode('ascii')
+
+    def fetch(self, accession, taxon_id=''):
+        '''
+        This method returns the SprotRecord of the first record with the
+        accession, or None if no record has the accession.
+        '''
+        for rec_no in self.find(accession):
+            rec = self.get_record(rec_no, taxon_id)
+            if rec is not None:
+                return rec
+        return None
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
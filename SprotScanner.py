@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+'''
+    This module has a minimal-field scanner for UniProtKB/SwissProt files.
+    The tools in this repository only need the AC, OX, DR GO, and SQ lines
+    of a SwissProt record, so the scanner works directly on the raw bytes
+    of the file instead of building full Bio.SwissProt.Record objects.
+    It has the following methods:
+
+    parse(fh_sprot, taxon_id=''):
+        This method is the entry point of this module. It takes a file
+        handle of a UniProtKB/SwissProt file (opened in binary or text
+        mode) and an optional taxon id. It yields a SprotRecord for each
+        record in the file. When taxon_id is supplied, the records of
+        other species are skipped by checking the bytes of the OX line
+        before any other field of the record is tokenized.
+
+    iter_entries(fh_sprot, chunk_size=CHUNK_SIZE):
+        This method splits the file into the raw bytes of each record.
+        The records are separated by the '//' terminator lines.
+
+    open_sprot(sprot_fname):
+        This method opens a SwissProt file in binary mode. If a snapshot
+        of the release was created by SprotSnapshot module, the snapshot
+        is opened instead, and parse yields the records of the snapshot.
+
+    open_release(sprot_fname, threads=bg.DEFAULT_THREADS):
+        This method opens a SwissProt file in binary mode, decompressing
+        it on the fly if the release is kept gzip compressed (.gz). A
+        block-gzip (BGZF) file is read with the BgzfReader of Bgzf module,
+        which decompresses the blocks in threads and supports seeking.
+
+    release_fname(sprot_fname):
+        This method returns the name of the file that holds the release
+        sprot_fname: the file itself, or its compressed copy
+        sprot_fname + GZIP_EXT if only the compressed copy exists.
+
+    iter_entry_offsets(fh_sprot, chunk_size=CHUNK_SIZE):
+        This method is similar to iter_entries but also yields the byte
+        offset of each record in the file.
+
+    parse_entry(entry, taxon_id=''):
+        This method extracts the accessions, taxon ids, and GO cross
+        references from the raw bytes of a single record. It returns
+        None if taxon_id is supplied and the record belongs to another
+        species.
+
+    exp_codes_key(EXP_default):
+        This method returns the EXP evidence codes EXP_default (a set of
+        codes, or the EXP_EVIDENCE_CODES text of the config file, for
+        example, "set(['IEP', 'IPI'])") as one sorted, comma separated
+        string. The indexes built for a set of EXP codes are saved with
+        this key, since the text of a set changes with the hash seed of
+        each process.
+
+    The SprotRecord is a tuple with the following fields:
+        accessions: the list of the primary and secondary accessions,
+        taxonomy_id: the list of the taxon ids from the OX line,
+        go_refs: the list of (GO term, ontology symbol, evidence code)
+                 tuples from the DR GO lines,
+        seq_block: the raw bytes of the sequence lines.
+    The sequence of a record is decoded from seq_block only when the
+    sequence attribute of the record is accessed.
+'''
+import gzip
+import os
+import re
+import sys
+from collections import namedtuple
+
+import Bgzf as bg
+
+# Size of the blocks read from the SwissProt file:
+CHUNK_SIZE = 1 << 22
+# Terminator of a SwissProt record:
+RECORD_END = b'\n//'
+# Extension of a compressed SwissProt file:
+GZIP_EXT = '.gz'
+
+_AC_RE = re.compile(rb'^AC   ([^\n]*)', re.M)
+_OX_RE = re.compile(rb'^OX   ([^\n]*)', re.M)
+_GO_RE = re.compile(rb'^DR   GO; ([^\n]*)', re.M)
+_CODE_RE = re.compile(r'\w+')
+
+class SprotRecord(namedtuple('SprotRecord', ['accessions', 'taxonomy_id',
+                                             'go_refs', 'seq_block'])):
+    __slots__ = ()
+
+    @property
+    def sequence(self):
+        '''
+        The protein sequence decoded from the raw sequence lines.
+        '''
+        return b''.join(self.seq_block.split()).decode('ascii')
+
+def _binary_stream(fh_sprot):
+    '''
+    This method returns the binary stream under a text mode file handle,
+    or the file handle itself if it is already in binary mode.
+    '''
+    return getattr(fh_sprot, 'buffer', fh_sprot)
+
+def iter_entries(fh_sprot, chunk_size=CHUNK_SIZE):
+    '''
+    This method yields the raw bytes of each record in the file, from
+    the ID line up to (but not including) the '//' terminator line.
+    '''
+    for offset, entry in iter_entry_offsets(fh_sprot, chunk_size):
+        yield entry
+    return None
+
+def iter_entry_offsets(fh_sprot, chunk_size=CHUNK_SIZE):
+    '''
+    This method is similar to iter_entries but yields the byte offset
+    of each record (from the current position of the file) together
+    with the raw bytes of the record.
+    '''
+    stream = _binary_stream(fh_sprot)
+    pending = b''
+    # offset: the byte offset of the start of pending:
+    offset = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        data = pending + chunk if pending else chunk
+        start = 0
+        while True:
+            end = data.find(RECORD_END, start)
+            if end < 0:
+                break
+            eol = data.find(b'\n', end + len(RECORD_END))
+            if eol < 0:
+                # The terminator line is not complete yet:
+                break
+            yield offset + start, data[start:end + 1]
+            start = eol + 1
+        pending = data[start:]
+        offset += start
+    # A last record without the terminator line:
+    if pending.strip():
+        if pending.rstrip().endswith(b'//'):
+            pending = pending.rstrip()[:-2]
+        yield offset, pending
+    return None
+
+def _parse_taxonomy_id(ox_lines):
+    '''
+    This method extracts the taxon ids from the OX lines in the same
+    way as Bio.SwissProt does. Evidence codes in curly brackets are
+    ignored.
+    '''
+    taxonomy_id = []
+    for line in ox_lines:
+        line = line.split(b'{')[0].rstrip().rstrip(b';')
+        if not taxonomy_id and b'=' in line:
+            line = line.split(b'=', 1)[1]
+        taxonomy_id.extend(line.decode('ascii').split(', '))
+    return taxonomy_id
+
+def parse_accessions(entry):
+    '''
+    This method returns the list of the accessions in the AC lines of
+    the raw bytes of a record.
+    '''
+    accessions = []
+    for value in _AC_RE.findall(entry):
+        accessions.extend(value.rstrip().rstrip(b';').decode('ascii').split('; '))
+    return accessions
+
+def parse_entry(entry, taxon_id=''):
+    '''
+    This method builds a SprotRecord from the raw bytes of a record.
+    It returns None when taxon_id is supplied and the record does not
+    belong to that species.
+    '''
+    ox_lines = _OX_RE.findall(entry)
+    if taxon_id:
+        # Prefilter on the bytes of the OX line before tokenizing:
+        if taxon_id.encode('ascii') not in b''.join(ox_lines):
+            return None
+        taxonomy_id = _parse_taxonomy_id(ox_lines)
+        if taxon_id not in taxonomy_id:
+            return None
+    else:
+        taxonomy_id = _parse_taxonomy_id(ox_lines)
+    # Split the record into the header and the sequence lines:
+    sq = entry.find(b'\nSQ   ')
+    if sq < 0:
+        header = entry
+        seq_block = b''
+    else:
+        header = entry[:sq]
+        eol = entry.find(b'\n', sq + 1)
+        seq_block = entry[eol + 1:] if eol >= 0 else b''
+    accessions = parse_accessions(header)
+    go_refs = []
+    for value in _GO_RE.findall(header):
+        cols = value.rstrip().rstrip(b'.').decode('ascii').split('; ')
+        if len(cols) < 3:
+            continue
+        # (GO term, ontology symbol, evidence code):
+        go_refs.append((cols[0], cols[1][0], cols[2].split(':')[0]))
+    return SprotRecord(accessions, taxonomy_id, go_refs, seq_block)
+
+def parse(fh_sprot, taxon_id=''):
+    '''
+    This method yields a SprotRecord for each record of the SwissProt
+    file fh_sprot. If taxon_id is supplied, only the records of that
+    species are yielded.
+    '''
+    if hasattr(fh_sprot, 'records'):
+        # A snapshot of SprotSnapshot module provides its own records:
+        for rec in fh_sprot.records(taxon_id):
+            yield rec
+        return None
+    for entry in iter_entries(fh_sprot):
+        rec = parse_entry(entry, taxon_id)
+        if rec is not None:
+            yield rec
+    return None
+
+def open_sprot(sprot_fname):
+    '''
+    This method opens a SwissProt file for reading. If a snapshot of the
+    release is available (see SprotSnapshot module), it returns a Snapshot
+    object in place of the file handle.
+    '''
+    import SprotSnapshot as ssn
+    snap_fname = ssn.find_snapshot(sprot_fname)
+    if snap_fname:
+        return ssn.Snapshot(snap_fname)
+    return open_release(sprot_fname)
+
+def release_fname(sprot_fname):
+    if not os.path.exists(sprot_fname) and \
+       os.path.exists(sprot_fname + GZIP_EXT):
+        return sprot_fname + GZIP_EXT
+    return sprot_fname
+
+def open_release(sprot_fname, threads=bg.DEFAULT_THREADS):
+    '''
+    This method opens the file of the release sprot_fname in binary mode.
+    A compressed file is decompressed while it is read.
+    '''
+    fname = release_fname(sprot_fname)
+    if not fname.endswith(GZIP_EXT):
+        return open(fname, 'rb')
+    if bg.is_bgzf(fname):
+        return bg.BgzfReader(fname, threads)
+    return gzip.open(fname, 'rb')
+
+def exp_codes_key(EXP_default):
+    if isinstance(EXP_default, str):
+        # The text of a set in the config file: set(['IEP', 'IPI', ...])
+        codes = [code for code in _CODE_RE.findall(EXP_default)
+                 if code != 'set']
+    else:
+        codes = EXP_default
+    return ','.join(sorted(set(codes)))
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
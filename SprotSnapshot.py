@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+'''
+    This module has the definition of Snapshot class and the following
+    methods to create and locate the snapshot of a UniProtKB/SwissProt
+    release:
+
+    create_snapshot(fh_sprot, snap_fname=None):
+        This method goes over the records in a UniProtKB/SwissProt file
+        (file handle fh_sprot) once and writes the GO annotations of the
+        release to a columnar snapshot file. The columns are integer coded
+        (accession, taxon, GO term, evidence code, and ontology symbol)
+        and the distinct strings are kept in string tables. The sequences
+        are written to a separate file and are located by their offsets.
+        When snap_fname is not supplied, the snapshot is saved next to the
+        SwissProt file with the extension SNAPSHOT_EXT.
+
+    find_snapshot(sprot_fname):
+        This method returns the name of the snapshot file to be used for
+        the SwissProt file sprot_fname, or None if no snapshot is available.
+        A snapshot saved next to the SwissProt file is used only if it was
+        created from the same release file (or the release file itself is
+        no longer available).
+
+    The Snapshot class provides the records of a snapshot in the same form
+    as the parse method of SprotScanner module, so a Snapshot object can be
+    passed to the methods of this repository in place of the file handle of
+    a SwissProt file. It also has vectorized methods to select the entries
+    of a species and the entries with EXP annotations in an ontology.
+'''
+import mmap
+import os
+import sys
+import numpy as np
+
+import SprotScanner as ss
+
+# Extension of the snapshot file with the annotation columns:
+SNAPSHOT_EXT = '.snap.npz'
+# Extension of the snapshot file with the sequences:
+SEQUENCE_EXT = '.snap.seq'
+# Version of the snapshot file format:
+SNAPSHOT_VERSION = 1
+
+def __release_stamp(sprot_fname):
+    st = os.stat(sprot_fname)
+    return np.array([SNAPSHOT_VERSION, st.st_size, st.st_mtime_ns],
+                    dtype=np.int64)
+
+def __string_table(codes):
+    '''
+    This method converts a dictionary of strings to their integer codes
+    into an array of the strings ordered by the codes.
+    '''
+    table = [''] * len(codes)
+    for s, code in codes.items():
+        table[code] = s
+    return np.array(table, dtype=str)
+
+def sequence_fname(snap_fname):
+    return snap_fname[:-len(SNAPSHOT_EXT)] + SEQUENCE_EXT
+
+def create_snapshot(fh_sprot, snap_fname=None):
+    '''
+    This method creates the snapshot of the SwissProt file with handle
+    fh_sprot and returns the name of the snapshot file.
+    '''
+    if snap_fname is None:
+        snap_fname = fh_sprot.name + SNAPSHOT_EXT
+    seq_fname = sequence_fname(snap_fname)
+    # String tables: each distinct string is mapped to its integer code:
+    taxon_codes = {}
+    go_codes = {}
+    evidence_codes = {}
+    # Columns:
+    accessions = []
+    acc_ptr = [0]
+    taxon_col = []
+    taxon_ptr = [0]
+    go_col = []
+    evidence_col = []
+    aspect_col = []
+    go_ptr = [0]
+    seq_ptr = [0]
+    fh_seq = open(seq_fname + '.tmp', 'wb')
+    for rec in ss.parse(fh_sprot):
+        accessions.extend(rec.accessions)
+        acc_ptr.append(len(accessions))
+        for taxon in rec.taxonomy_id:
+            taxon_col.append(taxon_codes.setdefault(taxon, len(taxon_codes)))
+        taxon_ptr.append(len(taxon_col))
+        for goTerm, ontType, evidence in rec.go_refs:
+            go_col.append(go_codes.setdefault(goTerm, len(go_codes)))
+            evidence_col.append(evidence_codes.setdefault(evidence,
+                                                          len(evidence_codes)))
+            aspect_col.append(ord(ontType))
+        go_ptr.append(len(go_col))
+        seq = b''.join(rec.seq_block.split())
+        fh_seq.write(seq)
+        seq_ptr.append(seq_ptr[-1] + len(seq))
+    fh_seq.close()
+    snap = {}
+    snap['accessions'] = np.array(accessions, dtype=str)
+    snap['acc_ptr'] = np.array(acc_ptr, dtype=np.int64)
+    snap['taxon_table'] = __string_table(taxon_codes)
+    snap['taxon_code'] = np.array(taxon_col, dtype=np.int32)
+    snap['taxon_ptr'] = np.array(taxon_ptr, dtype=np.int64)
+    snap['go_table'] = __string_table(go_codes)
+    snap['go_code'] = np.array(go_col, dtype=np.int32)
+    snap['evidence_table'] = __string_table(evidence_codes)
+    snap['evidence_code'] = np.array(evidence_col, dtype=np.int16)
+    snap['aspect'] = np.array(aspect_col, dtype=np.uint8)
+    snap['go_ptr'] = np.array(go_ptr, dtype=np.int64)
+    snap['seq_ptr'] = np.array(seq_ptr, dtype=np.int64)
+    stamp = __release_stamp(fh_sprot.name)
+    # np.savez appends .npz to the name if it does not end with it:
+    tmp_fname = snap_fname[:-len('.npz')] + '.tmp.npz'
+    np.savez(tmp_fname, stamp=stamp, **snap)
+    os.replace(seq_fname + '.tmp', seq_fname)
+    os.replace(tmp_fname, snap_fname)
+    return snap_fname
+
+def find_snapshot(sprot_fname):
+    '''
+    This method returns the name of the snapshot file for the SwissProt
+    file sprot_fname, or None if there is no usable snapshot.
+    '''
+    if sprot_fname.endswith(SNAPSHOT_EXT):
+        return sprot_fname if os.path.isfile(sprot_fname) else None
+    sprot_fname = ss.release_fname(sprot_fname)
+    snap_fname = sprot_fname + SNAPSHOT_EXT
+    if not os.path.isfile(snap_fname) or \
+       not os.path.isfile(sequence_fname(snap_fname)):
+        return None
+    if not os.path.isfile(sprot_fname):
+        return snap_fname
+    try:
+        with np.load(snap_fname, allow_pickle=False) as saved:
+            if np.array_equal(saved['stamp'], __release_stamp(sprot_fname)):
+                return snap_fname
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+class Snapshot:
+    def __init__(self, snap_fname):
+        '''
+        This method loads the columns of the snapshot file snap_fname.
+        The sequence file is mapped into memory when a sequence is
+        requested for the first time.
+        '''
+        self.name = snap_fname
+        with np.load(snap_fname, allow_pickle=False) as saved:
+            if int(saved['stamp'][0]) != SNAPSHOT_VERSION:
+                raise ValueError('Unsupported snapshot version: ' + \
+                                 os.path.basename(snap_fname))
+            self.columns = dict((k, saved[k]) for k in saved.files)
+        self.seq_fname = sequence_fname(snap_fname)
+        self.__fh_seq = None
+        self.__seq = None
+        return None
+
+    def __len__(self):
+        return len(self.columns['acc_ptr']) - 1
+
+    def seek(self, offset, whence=0):
+        # The records are always provided from the first entry:
+        return 0
+
+    def close(self):
+        if self.__fh_seq is not None:
+            if isinstance(self.__seq, mmap.mmap):
+                self.__seq.close()
+            self.__fh_seq.close()
+            self.__seq = None
+            self.__fh_seq = None
+        return None
+
+    def __sequences(self):
+        if self.__seq is None:
+            self.__fh_seq = open(self.seq_fname, 'rb')
+            if os.fstat(self.__fh_seq.fileno()).st_size:
+                self.__seq = mmap.mmap(self.__fh_seq.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+            else:
+                self.__seq = b''
+        return self.__seq
+
+    def __entry_of(self, ptr):
+        '''
+        This method returns the entry number of each row of the column
+        whose entry boundaries are given by ptr.
+        '''
+        return np.repeat(np.arange(len(ptr) - 1), np.diff(ptr))
+
+    def entry_mask(self, taxon_id=''):
+        '''
+        This method returns a boolean array over the entries that selects
+        the entries of species taxon_id (all entries if taxon_id is empty).
+        '''
+        if not taxon_id:
+            return np.ones(len(self), dtype=bool)
+        mask = np.zeros(len(self), dtype=bool)
+        match = np.flatnonzero(self.columns['taxon_table'] == taxon_id)
+        if len(match):
+            rows = np.isin(self.columns['taxon_code'], match)
+            mask[self.__entry_of(self.columns['taxon_ptr'])[rows]] = True
+        return mask
+
+    def annotated_entries(self, ontType, EXP_default=None):
+        '''
+        This method returns a boolean array over the entries that selects
+        the entries with GO annotations in the ontology ontType. If
+        EXP_default is supplied, only the annotations whose evidence
+        codes are in EXP_default are considered.
+        '''
+        rows = self.columns['aspect'] == ord(ontType)
+        if EXP_default is not None:
+            is_exp = np.array([ev in EXP_default for ev in
+                               self.columns['evidence_table']], dtype=bool)
+            if len(is_exp):
+                rows &= is_exp[self.columns['evidence_code']]
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.__entry_of(self.columns['go_ptr'])[rows]] = True
+        return mask
+
+    def records(self, taxon_id=''):
+        '''
+        This method yields a SprotRecord of SprotScanner module for each
+        entry of the snapshot. If taxon_id is supplied, only the entries
+        of that species are yielded.
+        '''
+        c = self.columns
+        entries = np.flatnonzero(self.entry_mask(taxon_id))
+        sequences = self.__sequences()
+        seq_ptr = c['seq_ptr']
+        if len(entries) < len(self) // 8:
+            # A few entries are selected: decode the rows of those entries.
+            taxon_table = c['taxon_table']
+            go_table = c['go_table']
+            evidence_table = c['evidence_table']
+            for i in entries.tolist():
+                rows = slice(c['go_ptr'][i], c['go_ptr'][i + 1])
+                go_refs = list(zip(go_table[c['go_code'][rows]].tolist(),
+                                   [chr(a) for a in c['aspect'][rows]],
+                                   evidence_table[
+                                       c['evidence_code'][rows]].tolist()))
+                taxa = c['taxon_code'][c['taxon_ptr'][i]:c['taxon_ptr'][i + 1]]
+                yield ss.SprotRecord(
+                    c['accessions'][c['acc_ptr'][i]:c['acc_ptr'][i + 1]].tolist(),
+                    taxon_table[taxa].tolist(), go_refs,
+                    sequences[seq_ptr[i]:seq_ptr[i + 1]])
+            return None
+        # Most entries are selected: decode the columns at once.
+        acc_ptr = c['acc_ptr'].tolist()
+        taxon_ptr = c['taxon_ptr'].tolist()
+        go_ptr = c['go_ptr'].tolist()
+        seq_ptr = seq_ptr.tolist()
+        accessions = c['accessions'].tolist()
+        taxa = c['taxon_table'][c['taxon_code']].tolist()
+        go_refs = list(zip(c['go_table'][c['go_code']].tolist(),
+                           [chr(a) for a in c['aspect'].tolist()],
+                           c['evidence_table'][c['evidence_code']].tolist()))
+        for i in entries.tolist():
+            yield ss.SprotRecord(accessions[acc_ptr[i]:acc_ptr[i + 1]],
+                                 taxa[taxon_ptr[i]:taxon_ptr[i + 1]],
+                                 go_refs[go_ptr[i]:go_ptr[i + 1]],
+                                 sequences[seq_ptr[i]:seq_ptr[i + 1]])
+        return None
+
+if __name__ == '__main__':
+    print(sys.argv[0] + ':')
+    print(__doc__)
+    sys.exit(0)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+'''
+    This module tests that the scores of a combined training set of all
+    three ontologies, routed to the score file of each ontology (see
+    ScoreRouter in BlastScoring module), are the same as the scores of the
+    training set of each ontology for every scoring scheme.
+'''
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+import BlastScoring as bs
+import BlastTab as bt
+
+ONTOLOGIES = ['mfo', 'bpo', 'cco']
+
+# A combined map: training id, protein name, GO terms, and ontology. Some
+# of the training proteins are annotated in one or two ontologies only:
+COMBINED_MAP = [
+    'TR1\tP1\tGO:0000001,GO:0000002\tmfo',
+    'TR1\tP1\tGO:0000101\tbpo',
+    'TR1\tP1\tGO:0000201\tcco',
+    'TR2\tP2\tGO:0000002\tmfo',
+    'TR3\tP3\tGO:0000101,GO:0000102\tbpo',
+    'TR4\tP4\tGO:0000201,GO:0000202\tcco',
+    'TR4\tP4\tGO:0000003\tmfo',
+    'TR5\tP5\tGO:0000102\tbpo',
+    'TR6\tP6\tGO:0000001\tmfo',
+    'TR6\tP6\tGO:0000202\tcco',
+]
+
+# BLAST results: qseqid sseqid evalue length pident nident bitscore
+BLAST_RESULTS = [
+    'Q1\tTR1\t1e-50\t200\t80.0\t160\t210.5',
+    'Q1\tTR3\t1e-20\t150\t55.0\t82\t95.0',
+    'Q1\tTR4\t1e-05\t120\t40.0\t48\t52.3',
+    'Q2\tTR2\t1e-90\t300\t95.0\t285\t410.0',
+    'Q2\tTR5\t1e-10\t100\t45.0\t45\t61.7',
+    'Q2\tTR6\t1e-30\t180\t60.0\t108\t140.2',
+    'Q3\tTR4\t1e-15\t130\t50.0\t65\t77.1',
+]
+
+TARGETS = ['Q1\tA1\tGO:0000001', 'Q2\tA2\tGO:0000101',
+           'Q3\tA3\tGO:0000201', 'Q4\tA4\tGO:0000202']
+
+class Collector:
+    '''
+    A writer that keeps the text written to it.
+    '''
+    def __init__(self):
+        self.text = ''
+
+    def write(self, text):
+        self.text += text
+        return len(text)
+
+    def close(self):
+        return None
+
+def lines(rows):
+    return [row + '\n' for row in rows]
+
+def ontology_map(ontology):
+    return [row.rsplit('\t', 1)[0] for row in COMBINED_MAP
+            if row.rsplit('\t', 1)[1] == ontology]
+
+class TestRoutedScores(unittest.TestCase):
+    def setUp(self):
+        self.blast_hits = bt.read_hits(lines(BLAST_RESULTS))
+        self.GOterm_ontology = dict()
+        for row in COMBINED_MAP:
+            fields = row.split('\t')
+            for gt in fields[2].split(','):
+                self.GOterm_ontology[gt] = fields[3]
+
+    def __ontology_scores(self, ontology):
+        GOterm_index = bs.load_GOterm_index(lines(ontology_map(ontology)))
+        writers = dict((scheme, Collector())
+                       for scheme in bs.SCORING_SCHEMES)
+        bs.write_scores(lines(TARGETS), writers, self.blast_hits,
+                        GOterm_index, naive=bs.naive_scores(GOterm_index))
+        return dict((scheme, writers[scheme].text) for scheme in writers)
+
+    def __routed_scores(self, stream):
+        GOterm_index = bs.load_GOterm_index(lines(COMBINED_MAP))
+        ontology_index = bs.load_ontology_index(lines(COMBINED_MAP))
+        naive = bs.naive_scores(GOterm_index, ontology_index)
+        collectors = dict((scheme, dict((ontology, Collector())
+                                        for ontology in ONTOLOGIES))
+                          for scheme in bs.SCORING_SCHEMES)
+        writers = dict((scheme, bs.ScoreRouter(collectors[scheme],
+                                               self.GOterm_ontology))
+                       for scheme in bs.SCORING_SCHEMES)
+        score_lines = None
+        blast_hits = self.blast_hits
+        if stream:
+            score_lines = bs.stream_scores(lines(BLAST_RESULTS),
+                                           set(row.split('\t')[0]
+                                               for row in TARGETS),
+                                           GOterm_index,
+                                           list(bs.SCORING_SCHEMES), naive,
+                                           ontology_index=ontology_index)
+            blast_hits = None
+        bs.write_scores(lines(TARGETS), writers, blast_hits, GOterm_index,
+                        score_lines, naive, ontology_index)
+        return collectors
+
+    def __check_routed(self, stream):
+        collectors = self.__routed_scores(stream)
+        for ontology in ONTOLOGIES:
+            expected = self.__ontology_scores(ontology)
+            for scheme in bs.SCORING_SCHEMES:
+                self.assertTrue(expected[scheme])
+                self.assertEqual(collectors[scheme][ontology].text,
+                                 expected[scheme],
+                                 scheme + ' scores of ' + ontology)
+
+    def test_routed_scores(self):
+        self.__check_routed(False)
+
+    def test_routed_stream_scores(self):
+        self.__check_routed(True)
+
+    def test_naive_scores_of_one_ontology(self):
+        GOterm_index = bs.load_GOterm_index(lines(ontology_map('mfo')))
+        # TR1, TR2, TR4, and TR6 are annotated in MFO:
+        self.assertEqual(bs.naive_scores(GOterm_index),
+                         [('GO:0000001', 0.5), ('GO:0000002', 0.5),
+                          ('GO:0000003', 0.25)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+'''
+    This module tests that the annotation history and the accession index
+    built for a set of EXP codes (see exp_codes_key in SprotScanner module)
+    are opened again by processes with other hash seeds and by the text of
+    the set in the config file.
+'''
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+import AnnotationHistory as ah
+import SprotScanner as ss
+
+EXP_CODES = ['IEP', 'IPI', 'IMP', 'EXP', 'IGI', 'IDA']
+
+# Opens the history (argv[2]) in a new process:
+OPEN_HISTORY = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+import AnnotationHistory as ah
+ah.open_history(sys.argv[2], set(%r)).close()
+''' % EXP_CODES
+
+# Loads the accession index of the SwissProt file (argv[2]) in a new
+# process:
+LOAD_INDEX = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+import AccessionIndex as ai
+with open(sys.argv[2], 'rb') as fh_sprot:
+    ai.load_NEXP_index(fh_sprot, set(%r))
+''' % EXP_CODES
+
+SPROT_RECORDS = '''ID   PROT1_HUMAN             Reviewed;         10 AA.
+AC   P00001;
+OX   NCBI_TaxID=9606;
+DR   GO; GO:0005515; F:protein binding; IPI:UniProtKB.
+DR   GO; GO:0005737; C:cytoplasm; IEA:UniProtKB-KW.
+SQ   SEQUENCE   10 AA;  1111 MW;  0000000000000000 CRC64;
+     MKVLAAGIVG
+//
+ID   PROT2_HUMAN             Reviewed;         10 AA.
+AC   P00002;
+OX   NCBI_TaxID=9606;
+DR   GO; GO:0008150; P:biological_process; TAS:UniProtKB.
+SQ   SEQUENCE   10 AA;  1111 MW;  0000000000000000 CRC64;
+     MKVLAAGIVG
+//
+'''
+
+class TestExpCodesKey(unittest.TestCase):
+    def test_set_and_config_text(self):
+        key = ss.exp_codes_key(set(EXP_CODES))
+        self.assertEqual(key, 'EXP,IDA,IEP,IGI,IMP,IPI')
+        self.assertEqual(ss.exp_codes_key(str(set(reversed(EXP_CODES)))),
+                         key)
+        self.assertEqual(ss.exp_codes_key(
+                             "set(['IEP', 'IPI', 'IMP', 'EXP', 'IGI', 'IDA'])"),
+                         key)
+        self.assertEqual(ss.exp_codes_key(set([])), '')
+        self.assertEqual(ss.exp_codes_key('set([])'), '')
+
+    def test_reopen_history(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_fname = os.path.join(tmp_dir, 'history.db')
+            for seed in range(5):
+                env = dict(os.environ, PYTHONHASHSEED=str(seed))
+                subprocess.check_call([sys.executable, '-c', OPEN_HISTORY,
+                                       ROOT, db_fname], env=env)
+            history = ah.open_history(db_fname,
+                                      "set(['IEP', 'IPI', 'IMP', 'EXP', " + \
+                                      "'IGI', 'IDA'])")
+            history.close()
+            self.assertRaises(ValueError, ah.open_history, db_fname,
+                              set(['EXP', 'IDA']))
+
+    def test_reload_accession_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sprot_fname = os.path.join(tmp_dir, 'uniprot_sprot.dat.2010_01')
+            with open(sprot_fname, 'w') as fh_sprot:
+                fh_sprot.write(SPROT_RECORDS)
+            loaded = 0
+            for seed in range(5):
+                env = dict(os.environ, PYTHONHASHSEED=str(seed))
+                output = subprocess.check_output([sys.executable, '-c',
+                                                  LOAD_INDEX, ROOT,
+                                                  sprot_fname], env=env)
+                loaded += b'Loading the accession index' in output
+            # The index is built once and loaded by the other processes:
+            self.assertEqual(loaded, 4)
+
+if __name__ == '__main__':
+    unittest.main()
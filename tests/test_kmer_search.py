@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+'''
+    This module tests that the hits of the deduplicated training sequences
+    (see build_index in KmerSearch module), which are reported for the
+    training proteins of the members table, and their scores are the same
+    as the hits and the scores of the full training sequence file, also
+    when the limits on the candidates and the hits of a query are reached.
+'''
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+import BlastScoring as bs
+import BlastTab as bt
+import KmerSearch as ks
+
+def random_sequence(rng, length):
+    return ''.join(rng.choice(ks.AMINO_ACIDS) for i in range(length))
+
+def mutate(rng, sequence, rate):
+    return ''.join(rng.choice(ks.AMINO_ACIDS) if rng.random() < rate else aa
+                   for aa in sequence)
+
+class TestDeduplicatedSearch(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(11)
+        families = [random_sequence(rng, rng.randint(80, 200))
+                    for i in range(6)]
+        # The distinct training sequences: a few variants of each family:
+        distinct = [mutate(rng, family, 0.3) for family in families
+                    for i in range(3)]
+        # Each distinct sequence is shared by one to four training proteins:
+        self.training = []
+        self.members = dict()
+        self.digests = []
+        for i, sequence in enumerate(distinct):
+            digest = 'D%03d' % i
+            self.digests.append((digest, sequence))
+            self.members[digest] = []
+            for j in range(rng.randint(1, 4)):
+                protein_id = 'TR%03d%d' % (i, j)
+                self.training.append((protein_id, sequence))
+                self.members[digest].append(protein_id)
+        rng.shuffle(self.training)
+        self.queries = [('Q%d' % i, mutate(rng, family, 0.2))
+                        for i, family in enumerate(families)]
+        self.GOterm_index = dict((protein_id, ['GO:%07d' % rng.randint(1, 5)])
+                                 for protein_id, sequence in self.training)
+
+    def __search(self, index, max_target_seqs=ks.MAX_TARGET_SEQS):
+        return ''.join(ks.search_sequences(self.queries, index,
+                                           max_target_seqs=max_target_seqs))
+
+    def __hits(self, lines, members=None):
+        blast_hits = bt.read_hits(lines.splitlines(True))
+        if members is not None:
+            blast_hits = bt.expand_hits(blast_hits, None, members)
+        return dict((q, blast_hits.hit_rows(q))
+                    for q, sequence in self.queries if q in blast_hits)
+
+    def test_database_size(self):
+        full = ks.build_index(self.training)
+        dedup = ks.build_index(self.digests, members=self.members)
+        self.assertEqual(dedup.db_length, full.db_length)
+        self.assertEqual(ks.build_index(self.digests,
+                                        db_length=12345).db_length, 12345)
+
+    def test_same_hits(self):
+        full = self.__search(ks.build_index(self.training))
+        dedup = self.__search(ks.build_index(self.digests,
+                                             members=self.members))
+        self.assertTrue(full)
+        # The hits are reported for the training proteins:
+        self.assertEqual(dedup, full)
+        # The hits are kept as they are by Assign_blastScores -D2:
+        full_hits = self.__hits(full)
+        dedup_hits = self.__hits(dedup, self.members)
+        self.assertEqual(dedup_hits, full_hits)
+        for q, sequence in self.queries:
+            self.assertEqual(bs.target_score_lines(q, dedup_hits.get(q, []),
+                                                   self.GOterm_index,
+                                                   bs.SCORING_SCHEMES[:3]),
+                             bs.target_score_lines(q, full_hits.get(q, []),
+                                                   self.GOterm_index,
+                                                   bs.SCORING_SCHEMES[:3]))
+
+    def test_limits(self):
+        # Both limits cut the proteins of a sequence apart:
+        max_candidates = ks.MAX_CANDIDATES
+        ks.MAX_CANDIDATES = 5
+        try:
+            full_index = ks.build_index(self.training)
+            dedup_index = ks.build_index(self.digests, members=self.members)
+            for max_target_seqs in (ks.MAX_TARGET_SEQS, 4, 2):
+                full = self.__search(full_index, max_target_seqs)
+                dedup = self.__search(dedup_index, max_target_seqs)
+                self.assertEqual(dedup, full)
+                n_hits = [len(hits) for hits in self.__hits(full).values()]
+                self.assertEqual(max(n_hits), min(5, max_target_seqs))
+        finally:
+            ks.MAX_CANDIDATES = max_candidates
+
+if __name__ == '__main__':
+    unittest.main()
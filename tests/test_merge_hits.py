@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+'''
+    This module tests that the hits of the shards of the query sequences
+    are merged in the order of the shard table (see merge_shard_hits in
+    BlastTab module), and that the hits against the shards of the
+    training sequences are refused.
+'''
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+import BlastTab as bt
+
+# The hits of the unsharded query sequences Q1 to Q4 (Q3 has no hits):
+HITS = ['Q1\tTR1\t1e-50\t200\t80.00\t160\t210',
+        'Q1\tTR2\t1e-20\t150\t55.00\t82\t95.0',
+        'Q2\tTR3\t1e-90\t300\t95.00\t285\t410',
+        'Q4\tTR1\t1e-05\t120\t40.00\t48\t52.3']
+
+class TestMergeShardHits(unittest.TestCase):
+    def __merge(self, shards, shard_hits):
+        shard_order = bt.read_shards(io.StringIO(shards))
+        fhs_hits = [io.StringIO(''.join(line + '\n' for line in hits))
+                    for hits in shard_hits]
+        merged = io.StringIO()
+        n_lines = bt.merge_shard_hits(shard_order, fhs_hits, merged)
+        return n_lines, merged.getvalue()
+
+    def test_query_shards(self):
+        n_lines, merged = self.__merge('Q1\t2\nQ2\t1\nQ3\t2\nQ4\t1\n',
+                                       [[HITS[2], HITS[3]],
+                                        [HITS[0], HITS[1]]])
+        self.assertEqual(n_lines, 4)
+        self.assertEqual(merged, ''.join(line + '\n' for line in HITS))
+
+    def test_training_shards(self):
+        # The shard table of the training sequences lists the subjects:
+        with self.assertRaises(ValueError) as cm:
+            self.__merge('TR1\t1\nTR2\t2\nTR3\t2\n',
+                         [[HITS[0], HITS[3]], [HITS[1], HITS[2]]])
+        self.assertIn('is not in the shard table', str(cm.exception))
+
+    def test_out_of_order(self):
+        with self.assertRaises(ValueError) as cm:
+            self.__merge('Q1\t1\nQ2\t1\nQ4\t1\n',
+                         [[HITS[2], HITS[0], HITS[3]]])
+        self.assertIn('are not in the order of the shard', str(cm.exception))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,10 +9,9 @@
                               evalSet_bpo_map_handle,
                               evalSet_cco_handle,
                               evalSet_cco_map_handle,
-                              EXP_default=set([]))
-        This method invokes __filter_evalSet_allSpecies() 
-        to generate test sequences on each of three ontologies:
-        MFO, BPO, and CCO. 
+                              EXP_default=set([]), workers=1)
+        This method invokes __filter_evalSet() to generate test 
+        sequences on all three ontologies: MFO, BPO, and CCO. 
         
     create_evalSet_singleSpecies(fh_sprot_t1, fh_sprot_t2, taxon_id,
                                  evalSet_mfo_handle, 
@@ -21,415 +20,308 @@
                                  evalSet_bpo_map_handle,
                                  evalSet_cco_handle,
                                  evalSet_cco_map_handle,
-                                 EXP_default=set([]))
+                                 EXP_default=set([]), workers=1)
         This methods is similar to create_evalSet_allSpecies but works 
-        for single species by invoking __filter_evalSet_singleSpecies 
-        method.
+        for single species.
 
-    __filter_evalSet_allSpecies(fh_sprot_t1, fh_sprot_t2, fh_test_seq, 
-                              fh_map, ontType, EXP_default=set([]))
-        This method takes five input arguments:
+    create_evalSet_fromHistory(history, release_t1, release_t2,
+                               fh_sprot_t2, taxon_id,
+                               evalSet_mfo_handle, 
+                               evalSet_mfo_map_handle,
+                               evalSet_bpo_handle,
+                               evalSet_bpo_map_handle,
+                               evalSet_cco_handle,
+                               evalSet_cco_map_handle)
+        This method writes the same evaluation sets as the methods above
+        (for all species if taxon_id is an empty string), but it selects
+        the proteins from an AnnotationHistory object (see AnnotationHistory
+        module) to which both releases were added. Only the sequences of
+        the selected proteins are read from the SwissProt file at t2.
+
+    __filter_evalSet(fh_sprot_t1, fh_sprot_t2, taxon_id, evalSet_handles,
+                     EXP_default=set([]), workers=1)
+        This method takes six input arguments:
             (1) a file handle for the UniprotKB/SwissProt file at t1 
             (2) a file handle for the UniprotKB/SwissProt file at t2 
-            (3) an file handle for writing test sequences,
-            (4) an file handle for writing the mapping between
-                target id and protein name, and
-            (5) the ontology type for which the test data is generated, and 
-            (6) the set of EXP codes.
-        This method invokes __get_NEXP_accession_list to obtain the list of
-        proteins that did not have EXP evidence codes at t1 but had
-        no-EXP evidence codes at t1. Then the method uses this list to
-        filter the proteins whose annotations gained EXP evidence codes
-        at t2. It then writes the sequences to the output file. It also
-        writes the (program generated sequence id, protein name, and 
-        GO terms) to the map file. 
-
-    __filter_evalSet_singleSpecies(fh_sprot_t1, fh_sprot_t2, taxon_id, fh_test_seq,
-                                 fh_map, ontType, EXP_default=set([]))
-        This method is similar to __filter_evalSet_allSpecies but works on specific 
-        species.
- 
-    __get_NEXP_accession_list(fh_sprot, taxon_id, ontType, EXP_default=set([]))
-        This method calls __build_NEXP_accession_allSpecies when taxon_id is
-        an empty string and calls build_NEXP_accession_singleSpecies when
-        taxon_id is a valid taxonomic id to obtain the list of accessions
-        of the proteins that did not have EXP evidence codes but had
-        non-EXP evidence codes in the SwissProt file fh_sprot for
-        a specific ontology type ontType.
-
-    __build_NEXP_accession_allSpecies(fh_sprot, ontType, EXP_default=set([]))
-        This method builds a list of accessions for the proteins in the
-        file (with handle fh_sprot) such that those proteins do not have
-        EXP evidence codes but do have non-EXP evidence codes. This method
-        builds this list for the proteins in a specific ontology.
-
-    __build_NEXP_accession_singleSpecies(fh_sprot, taxon_id, ontType, EXP_default=set([]))
-       This method is similar to __build_NEXP_accession_allSpecies but works 
-       for only specific species.
+            (3) a taxon id (an empty string selects all species),
+            (4) a dictionary that maps each ontology type (F, P, C) 
+                to a pair of output writers (see OutputWriter module): 
+                one for writing test sequences and the other for 
+                writing the mapping between target id and protein name,
+            (5) the set of EXP codes, and
+            (6) the number of worker processes.
+        This method invokes get_NEXP_index of AccessionIndex module to 
+        obtain the index of the accessions of the proteins that did not 
+        have EXP evidence codes at t1 but had no-EXP evidence codes at t1. 
+        Then the method uses this index to filter the proteins whose 
+        annotations gained EXP evidence codes at t2. It then writes the 
+        sequences to the output files. It also writes the (program 
+        generated sequence id, protein name, and GO terms) to the map 
+        files. Each of the files at t1 and t2 is read only once for all 
+        three ontologies. When the number of worker processes is more 
+        than one, the files are read in byte ranges by worker processes 
+        of ParallelSprot module and the results are merged in the order 
+        of the files.
 '''
 import sys
-from Bio import SeqIO
-from Bio.Seq import Seq
-from Bio.SeqRecord import SeqRecord
-from Bio import SwissProt as sp
 
-def __build_NEXP_accession_allSpecies(fh_sprot, ontType, EXP_default=set([])):
+import AccessionIndex as ai
+import AnnotationHistory as ah
+import OutputWriter as ow
+import ParallelSprot as ps
+import SprotScanner as ss
+
+# Ontology types in the order the evaluation sets are reported:
+ONTOLOGIES = ['F', 'P', 'C']
+ONT_NAMES = {'F': 'MFO', 'P': 'BPO', 'C': 'CCO'}
+
+def __filter_evalSet(fh_sprot_t1, fh_sprot_t2, taxon_id, evalSet_handles,
+                     EXP_default=set([]), workers=1):
     '''
-    This method builds a list of accessions of the proteins whose annotations 
-    have non-EXP evidence but no EXP evidence codes in a specific 
-    UniProtKB/SwissProt file (file pointer fh_sprot) for some ontology 
-    type (ontType). The method returns the list. 
+    This method filters the protein sequences from a SwissProt file
+    at time point t2 such that the annotations of those proteins
+    did not have experimental evidence codes at time t1 but obtained
+    experimental evidence codes at time t2. The SwissProt files at time
+    points t1 and t2 are represented by the file pointers fh_sprot_t1
+    and fh_sprot_t2, respectively. Each file is read once and the
+    test sequences for all three ontologies are written in the same
+    pass: evalSet_handles maps each ontology type to the pair of output
+    writers (sequence file, map file) of that ontology.
     '''
-    # nexp_accessions: Initialize a list to store the accessions of the 
-    # proteins that meet the criteria: (1) the protein whose annotation 
-    # is supported some Non-EXP evidence code in the specific ontology 
-    # ontType, but (2) the annotation is NOT supported by any EXP 
-    # evidence code.
-    nexp_accessions = []
-    print('      Building the accession list with the proteins ' + \
-          'that have only non-EXP evidence codes at time t1 ...')
-    for rec in sp.parse(fh_sprot):
-        # ont_specific_code_exist: this varilable is initialized to False
-        # at the beginning of each iteration. If an evidence code (either 
-        # EXP or Non-EXP) for the current record is found, this varilable 
-        # will be set to True
-        ont_specific_code_exist = False
-        # exp_code: this variable is initialized to False at the beginning 
-        # of each iteration. If an EXP evidence for the current record is 
-        # found, this variable will be set to True.
-        exp_code = False
-        # Going over the list of DB reference entries:
-        for crossRef in rec.cross_references:
-            # Consider the cross_reference entries
-            # that relate to GO DB:
-            if crossRef[0] == 'GO':
-                goList = [crossRef[1],
-                         (crossRef[3].split(':'))[0],
-                          crossRef[2][0]]
-                if not ont_specific_code_exist and goList[2] == ontType:
-                    ont_specific_code_exist = True
-                if goList[2] == ontType and \
-                    (crossRef[3].split(':'))[0] in EXP_default:
-                    exp_code = True
-                    break
-        # If the protein's annotation is supported by some Non-EXP evidence
-        # code but is not supported by any EXP evidence code, append the 
-        # protein's accessions list to the nexp_accessions list:
-        if ont_specific_code_exist and not exp_code:
-            nexp_accessions.append(rec.accessions)
-    return nexp_accessions
+    # Initializes the target_id of each ontology:
+    if not taxon_id:
+        first_target_id = int("1"+"0000001")
+    else:
+        first_target_id = int(taxon_id+"0000001")
+    target_id = {}
+    for ontType in ONTOLOGIES:
+        target_id[ontType] = first_target_id
+    # nexp_index_t1: Obtain the index of the accessions of the proteins
+    # whose annotations were supproted by non-EXP evidence codes but not
+    # by any EXP evidence codes at time t1 in each ontology. The index
+    # is loaded from the file saved next to the SwissProt file at t1 if
+    # it was built before. For all species, the compact (sorted array)
+    # variant of the index is used:
+    nexp_index_t1, entry_count = ai.get_NEXP_index(fh_sprot_t1, taxon_id,
+                                                   EXP_default,
+                                                   compact=not taxon_id,
+                                                   workers=workers)
+    for ontType in ONTOLOGIES:
+        print('      Number of entries in the ' + ONT_NAMES[ontType] + \
+              ' accession list: ' + str(entry_count[ontType]))
+    print('      Writing the sequences of the proteins whose annotations ' + \
+          'gained EXP evidence at time t2 to the ouput files ...')
 
-def __build_NEXP_accession_singleSpecies(fh_sprot, taxon_id, ontType, EXP_default=set([])):
+    # Selects records that are related to a specific
+    # taxonomy id taxon_id (all records if taxon_id is empty):
+    for rec, goTerms in __records_t2(fh_sprot_t2, taxon_id, EXP_default,
+                                     workers):
+        # nexp_flags: the ontology flags of the proteins at t1 that
+        # match any accession of the current record:
+        nexp_flags = nexp_index_t1.get_flags(rec.accessions)
+        if not nexp_flags:
+            continue
+        # goTerms: the GO terms with EXP evidence code at t2
+        # for each ontology (None if they are not collected yet):
+        for ontType in ONTOLOGIES:
+            # if the protein's annotation was supported by non-EXP evidence
+            # code but not by any EXP evidence code at t1, check whether it
+            # gained EXP evidece code at t2 for the same ontology ontType:
+            if not nexp_flags & ai.ONT_FLAGS[ontType]:
+                continue
+            if goTerms is None:
+                goTerms = __get_EXP_GOterms(rec, EXP_default)
+            # If the current protein's annotation gains EXP evidence
+            # code at t2, write the sequence to the output file:
+            if goTerms[ontType]:
+                __write_target(evalSet_handles[ontType], target_id[ontType],
+                               rec.sequence, rec.accessions[0],
+                               sorted(goTerms[ontType]))
+                target_id[ontType] += 1
+    return None
+
+def __write_target(handles, target_id, sequence, accession, goTerms):
     '''
-    This method builds a list of accessions of the proteins whose annotations 
-    have non-EXP evidence but no EXP evidence codes in a specific 
-    UniProtKB/SwissProt file (file pointer fh_sprot) for some ontology 
-    type (ontType). The method returns the list. 
+    This method writes the sequence of a test protein to the sequence
+    file and the (program generated sequence id, protein name, GO term)
+    lines of the protein to the map file.
     '''
-    # nexp_accessions: Initialize a list to store the accessions of the 
-    # proteins that meet the criteria: (1) the protein whose annotation 
-    # is supported some Non-EXP evidence code in the specific ontology 
-    # ontType, but (2) the annotation is NOT supported by any EXP 
-    # evidence code.
-    nexp_accessions = []
-    print('      Building the accession list with the proteins ' + \
-          'that have only non-EXP evidence codes at time t1 ...')
-    for rec in sp.parse(fh_sprot):
-        # Selects records that are related to a specific
-        # taxonomy id taxon_id:
-        if taxon_id in rec.taxonomy_id:
-            # ont_specific_code_exist: this varilable is initialized to False
-            # at the beginning of each iteration. If an evidence code (either 
-            # EXP or Non-EXP) for the current record is found, this varilable 
-            # will be set to True
-            ont_specific_code_exist = False
-            # exp_code: this variable is initialized to False at the beginning 
-            # of each iteration. If an EXP evidence for the current record is 
-            # found, this variable will be set to True.
-            exp_code = False
-            # Going over the list of DB reference entries:
-            for crossRef in rec.cross_references:
-            # Consider the cross_reference entries
-            # that relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1],
-                              (crossRef[3].split(':'))[0],
-                              crossRef[2][0]]
-                    if not ont_specific_code_exist and goList[2] == ontType:
-                        ont_specific_code_exist = True
-                    if goList[2] == ontType and \
-                        (crossRef[3].split(':'))[0] in EXP_default:
-                        exp_code = True
-                        break
-            # If the protein's annotation is supported by some Non-EXP evidence
-            # code but is not supported by any EXP evidence code, append the 
-            # protein's accessions list to the nexp_accessions list:
-            if ont_specific_code_exist and not exp_code:
-                nexp_accessions.append(rec.accessions)
-    return nexp_accessions
+    fh_test_seq, fh_map = handles
+    # Write out the sequence to fasta file:
+    fh_test_seq.write_fasta("T"+str(target_id), accession, sequence)
 
-def __get_NEXP_accession_list(fh_sprot, taxon_id, ontType, EXP_default=set([])):
-    # Initialize a list to store the accessions of the proteins 
-    # that meet certain criteria: 
-    if not taxon_id: # if taxon_id is empty, invoke the method for all species
-        nexp_accessions = __build_NEXP_accession_allSpecies(fh_sprot,
-                                                            ontType, 
-                                                            EXP_default)
-    else: # if taxon_id is supplied, invoke the method for single species 
-        nexp_accessions = __build_NEXP_accession_singleSpecies(fh_sprot,
-                                                               taxon_id,
-                                                               ontType, 
-                                                               EXP_default)
-    return nexp_accessions
+    # Write out the mapping to the map file:
+    # (protein sequence id, protein name, GO term(s))
+    for gt in goTerms:
+        fh_map.write_map("T"+str(target_id), accession, gt)
+    return None
 
-def __is_accession_found(accession_t2, nexp_accessions_t1):
+def __records_t2(fh_sprot_t2, taxon_id, EXP_default=set([]), workers=1):
     '''
-    This method checks whether any accession represented by the first 
-    list accession_t2 is found in any of the lists in the second list 
-    nexp_accessions_t1. 
-    If accession (first argument) is found in the accession list 
-    (second argument), then the function returns True
-    else it returns False
+    This method yields the records of the SwissProt file at t2 together
+    with the GO terms of each record that are supported by EXP evidence
+    codes. When the file is read in a single process, the GO terms are
+    not collected here (None is yielded in their place). Otherwise, the
+    byte ranges of the file are read in worker processes, and only the
+    records with some EXP evidence code are yielded in the order of
+    the file.
     '''
-    for l in nexp_accessions_t1:
-        if (set(accession_t2) & set(l)): 
-            return True
-    return False
+    sprot_fname = ps.sprot_fname(fh_sprot_t2)
+    if workers <= 1 or not sprot_fname:
+        for rec in ss.parse(fh_sprot_t2, taxon_id):
+            yield rec, None
+        return None
+    for selected in ps.map_records(sprot_fname, __select_EXP_records,
+                                   (EXP_default,), taxon_id, workers):
+        for rec, goTerms in selected:
+            yield rec, goTerms
+    return None
 
-def __filter_evalSet_allSpecies(fh_sprot_t1, fh_sprot_t2, fh_test_seq, 
-                              fh_map, ontType, EXP_default=set([])):
+def __select_EXP_records(records, EXP_default=set([])):
     '''
-    This method filters the protein sequences from a SwissProt file
-    at time point t2 such that the annotations of those proteins
-    did not have experimental evidence codes at time t1 but obtained
-    experimental evidence codes at time t2. The SwissProt files at time
-    points t1 and t2 are represented by the file pointers fh_sprot_t1
-    and fh_sprot_t2, respectively.
-    This method is repeatedly invoked by create_evalSet_allSpecies to create
-    test sequences for different ontologies.
+    This method returns the list of (record, GO terms) of the records
+    that have some GO term supported by EXP evidence codes. The records
+    in the list keep only the accessions and the sequence.
     '''
-    # Initializes the target_id:
-    target_id = int("1"+"0000001")
-    outseq_list = []
-    # nexp_accessions_t1: Obtain the list of accessions of the proteins 
-    # whose annotations were supproted by non-EXP evidence codes but not 
-    # by any EXP evidence codes at time t1. In fact, nexp_accessions_t1 
-    # is a list of lists.
-    nexp_accessions_t1 = __get_NEXP_accession_list(fh_sprot_t1, '',
-                                                   ontType, EXP_default)
+    selected = []
+    for rec in records:
+        goTerms = __get_EXP_GOterms(rec, EXP_default)
+        if goTerms['F'] or goTerms['P'] or goTerms['C']:
+            selected.append((ss.SprotRecord(rec.accessions, rec.taxonomy_id,
+                                            [], rec.sequence.encode('ascii')),
+                             goTerms))
+    return selected
 
-    # Counter for the number of proteins that gained EXP annotaion:
-    countMatch = 0
-    print('      Number of entries in the accession list: ' + \
-                 str(len(nexp_accessions_t1)))
-    print('      Writing the sequences of the proteins whose annotations ' + \
-          'gained EXP evidence at time t2 to the ouput file ...')
-    for rec in sp.parse(fh_sprot_t2):
-        # Selects records that are related to a specific
-        # taxonomy id taxon_id:
-        # print(is_accession_found(nexp_accessions_t1[0], nexp_accessions_t1))
-        # if taxon_id in rec.taxonomy_id:
+def __get_EXP_GOterms(rec, EXP_default=set([])):
+    '''
+    This method returns a dictionary whose keys are the ontology
+    types and whose values are the sets of GO terms of the record
+    rec that are supported by EXP evidence codes.
+    '''
+    goTerms = {}
+    for ontType in ONTOLOGIES:
+        goTerms[ontType] = set()
+    # Going over the list of GO information:
+    # (GO term, ontology symbol, evidence code)
+    for goTerm, ontType, evidence in rec.go_refs:
+        if ontType in goTerms and evidence in EXP_default:
+            goTerms[ontType].add(goTerm)
+    return goTerms
 
-        # if the protein's annotation was supported by non-EXP evidence code 
-        # but not by any EXP evidence code at t1, check whether it gained EXP 
-        # evidece code at t2 for the same ontology ontType:
-        if (__is_accession_found(rec.accessions, nexp_accessions_t1)):
-            exp_code = False
-            goTerms = set()
-            # Going over the list of GO information:
-            for crossRef in rec.cross_references:
-                # Consider the cross_reference entries
-                # that relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1],
-                             (crossRef[3].split(':'))[0],
-                             crossRef[2][0]]
-                    if goList[2] == ontType and \
-                       (crossRef[3].split(':'))[0] in EXP_default:
-                        goTerms.add(goList[0])
-                        exp_code = True
-                        #break
-            # If the current protein's annotation gains EXP evidence  
-            # code at t2, write the sequence to the output file:
-            if exp_code:
-                #goTerms = ','.join(list(goTerms))
-                outseq = SeqRecord(Seq(rec.sequence),
-                                   id="T"+str(target_id),
-                                   description = "%s" %
-                                   (rec.accessions[0]))
-                outseq_list = [outseq]
-                # Write out the sequence to fasta file:
-                SeqIO.write(outseq_list,fh_test_seq, "fasta")
+def __evalSet_writers(evalSet_mfo_handle, evalSet_mfo_map_handle,
+                      evalSet_bpo_handle, evalSet_bpo_map_handle,
+                      evalSet_cco_handle, evalSet_cco_map_handle):
+    '''
+    This method returns a dictionary that maps each ontology type to
+    the pair of OutputWriter objects (sequence file, map file) of that
+    ontology (see OutputWriter module).
+    '''
+    return {'F': (ow.as_writer(evalSet_mfo_handle),
+                  ow.as_writer(evalSet_mfo_map_handle)),
+            'P': (ow.as_writer(evalSet_bpo_handle),
+                  ow.as_writer(evalSet_bpo_map_handle)),
+            'C': (ow.as_writer(evalSet_cco_handle),
+                  ow.as_writer(evalSet_cco_map_handle))}
 
-                # Write out the mapping to the map file:
-                # (protein sequence id, protein name, GO term(s))
-                for gt in sorted(goTerms):
-                    #mapStr = "T" + str(target_id) + '\t' + \
-                    #               str(rec.accessions[0]) + '\n'
-                    #mapStr = "T" + str(target_id) + '\t' + \
-                    #           str(gt) + '\n'
-                    mapStr = "T" + str(target_id) + '\t' + \
-                                   str(rec.accessions[0]) + '\t' + \
-                                   str(gt) + '\n'
-                    fh_map.write("%s" % mapStr)
-                target_id += 1
-                countMatch += 1
+def __flush_evalSet_handles(evalSet_handles):
+    for ontType in ONTOLOGIES:
+        for fh in evalSet_handles[ontType]:
+            fh.flush()
     return None
 
 def create_evalSet_allSpecies(fh_sprot_t1, fh_sprot_t2,
-                              evalSet_mfo_handle, 
+                              evalSet_mfo_handle,
                               evalSet_mfo_map_handle,
                               evalSet_bpo_handle,
                               evalSet_bpo_map_handle,
                               evalSet_cco_handle,
                               evalSet_cco_map_handle,
-                              EXP_default=set([])):
-    print('MFO ontology:')
-    __filter_evalSet_allSpecies(fh_sprot_t1, fh_sprot_t2,
-                                  evalSet_mfo_handle,
-                                  evalSet_mfo_map_handle,
-                                  'F', EXP_default)
-    evalSet_mfo_handle.flush()
-    evalSet_mfo_map_handle.flush()
-    print('BPO ontology:')
-    # Reposition the file pointer to the beginning:
-    fh_sprot_t1.seek(0)
-    fh_sprot_t2.seek(0)
-    __filter_evalSet_allSpecies(fh_sprot_t1, fh_sprot_t2,
-                       evalSet_bpo_handle,
-                       evalSet_bpo_map_handle,
-                       'P', EXP_default)
-    evalSet_bpo_handle.flush()
-    evalSet_bpo_map_handle.flush()
-    print('CCO ontology:')
-    # Reposition the file pointer to the beginning:
-    fh_sprot_t1.seek(0)
-    fh_sprot_t2.seek(0)
-    __filter_evalSet_allSpecies(fh_sprot_t1, fh_sprot_t2,
-                       evalSet_cco_handle,
-                       evalSet_cco_map_handle,
-                       'C', EXP_default)
-    evalSet_cco_handle.flush()
-    evalSet_cco_map_handle.flush()
-    return None
-
-def __filter_evalSet_singleSpecies(fh_sprot_t1, fh_sprot_t2, taxon_id, fh_test_seq,
-                                   fh_map, ontType, EXP_default=set([])):
+                              EXP_default=set([]), workers=1):
     '''
-    This method filters the protein sequences from a SwissProt file
-    at time point t2 such that the annotations of those proteins
-    did not have EXP evidence codes at time t1 but obtained
-    experimental evidence codes at time t2. The SwissProt files at time
-    points t1 and t2 are represented by the file pointers fh_sprot_t1
-    and fh_sprot_t2, respectively.
-    This method is repeatedly invoked by create_evalSet_singleSpecies to create
-    test sequences for different ontologies.
+    This method filters protein sequences that gained experimental
+    annotations between t1 and t2 in all three ontologies (MFO, BPO,
+    and CCO) for all species.
     '''
-    # Initializes the target_id:
-    target_id = int(taxon_id+"0000001")
-    outseq_list = []
-    # nexp_accessions_t1: Obtain the list of accessions of the proteins 
-    # whose annotations were supproted by non-EXP evidence codes but not 
-    # by any EXP evidence codes at time t1. In fact, nexp_accessions_t1 
-    # is a list of lists.
-    nexp_accessions_t1 = __get_NEXP_accession_list(fh_sprot_t1, taxon_id,
-                                                   ontType, EXP_default)
-    print('      Number of entries in the accession list: ' + \
-                 str(len(nexp_accessions_t1)))
-    print('      Writing the sequences of the proteins whose annotations ' + \
-          'gained EXP evidence at time t2 to the ouput file ...')
-
-    for rec in sp.parse(fh_sprot_t2):
-        # Selects records that are related to a specific
-        # taxonomy id taxon_id:
-        # print(is_accession_found(nexp_accessions_t1[0], nexp_accessions_t1))
-        # if taxon_id in rec.taxonomy_id:
-
-        # if the protein's annotation was supported by non-EXP evidence code 
-        # but not by any EXP evidence code at t1, check whether it gained EXP 
-        # evidece code at t2 for the same ontology ontType:
-        if (taxon_id in rec.taxonomy_id and \
-            __is_accession_found(rec.accessions, nexp_accessions_t1)):
-            exp_code = False
-            goTerms = set()
-            # Going over the list of GO information:
-            for crossRef in rec.cross_references:
-                # Consider the cross_reference entries
-                # that relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1],
-                             (crossRef[3].split(':'))[0],
-                             crossRef[2][0]]
-                    if goList[2] == ontType and \
-                       (crossRef[3].split(':'))[0] in EXP_default:
-                        goTerms.add(goList[0])
-                        exp_code = True
-                        #break
-            # If the current protein's annotation gains EXP evidence  
-            # code at t2, write the sequence to the output file:
-            if exp_code:
-                #goTerms = ','.join(list(goTerms))
-                outseq = SeqRecord(Seq(rec.sequence),
-                                   id="T"+str(target_id),
-                                   description = "%s" %
-                                   (rec.accessions[0]))
-                outseq_list = [outseq]
-                # Write out the sequence to fasta file:
-                SeqIO.write(outseq_list,fh_test_seq, "fasta")
-                # Write the mapping to the map file
-                # (protein sequence id, protein name, GO term(s))
-                for gt in sorted(goTerms):
-                    #mapStr = "T" + str(target_id) + '\t' + \
-                    #               str(rec.accessions[0]) + '\n'
-                    #mapStr = "T" + str(target_id) + '\t' + \
-                    #           str(gt) + '\n'
-                    mapStr = "T" + str(target_id) + '\t' + \
-                                   str(rec.accessions[0]) + '\t' + \
-                                   str(gt) + '\n'
-                    fh_map.write("%s" % mapStr)
-                target_id += 1
+    print('MFO, BPO, and CCO ontologies:')
+    evalSet_handles = __evalSet_writers(evalSet_mfo_handle,
+                                        evalSet_mfo_map_handle,
+                                        evalSet_bpo_handle,
+                                        evalSet_bpo_map_handle,
+                                        evalSet_cco_handle,
+                                        evalSet_cco_map_handle)
+    __filter_evalSet(fh_sprot_t1, fh_sprot_t2, '', evalSet_handles,
+                     EXP_default, workers)
+    __flush_evalSet_handles(evalSet_handles)
     return None
 
 def create_evalSet_singleSpecies(fh_sprot_t1, fh_sprot_t2, taxon_id,
-                                 evalSet_mfo_handle, 
+                                 evalSet_mfo_handle,
                                  evalSet_mfo_map_handle,
                                  evalSet_bpo_handle,
                                  evalSet_bpo_map_handle,
                                  evalSet_cco_handle,
                                  evalSet_cco_map_handle,
-                                 EXP_default=set([])):
+                                 EXP_default=set([]), workers=1):
     '''
-    This method calls other methods to filter protein sequences that 
-    are experimentally annotated. It calls three different methods - 
-    one separate method for each ontological category.
+    This method calls other methods to filter protein sequences that
+    are experimentally annotated. It filters the sequences of all
+    three ontological categories in a single pass over each of the
+    SwissProt files.
     '''
-    print('MFO ontology:')
-    __filter_evalSet_singleSpecies(fh_sprot_t1, fh_sprot_t2, taxon_id,
-                                  evalSet_mfo_handle,
-                                  evalSet_mfo_map_handle,
-                                  'F', EXP_default)
-    evalSet_mfo_handle.flush()
-    evalSet_mfo_map_handle.flush()
-    # Reposition the file pointer to the beginning:
-    fh_sprot_t1.seek(0)
-    fh_sprot_t2.seek(0)
-    print('BPO ontology:')
-    __filter_evalSet_singleSpecies(fh_sprot_t1, fh_sprot_t2, taxon_id,
-                                  evalSet_bpo_handle,
-                                  evalSet_bpo_map_handle,
-                                  'P', EXP_default)
-    evalSet_bpo_handle.flush()
-    evalSet_bpo_map_handle.flush()
-    # Reposition the file pointer to the beginning:
-    fh_sprot_t1.seek(0)
-    fh_sprot_t2.seek(0)
-    print('CCO ontology:')
-    __filter_evalSet_singleSpecies(fh_sprot_t1, fh_sprot_t2, taxon_id,
-                                  evalSet_cco_handle,
-                                  evalSet_cco_map_handle,
-                                  'C', EXP_default)
-    evalSet_cco_handle.flush()
-    evalSet_cco_map_handle.flush()
+    print('MFO, BPO, and CCO ontologies:')
+    evalSet_handles = __evalSet_writers(evalSet_mfo_handle,
+                                        evalSet_mfo_map_handle,
+                                        evalSet_bpo_handle,
+                                        evalSet_bpo_map_handle,
+                                        evalSet_cco_handle,
+                                        evalSet_cco_map_handle)
+    __filter_evalSet(fh_sprot_t1, fh_sprot_t2, taxon_id, evalSet_handles,
+                     EXP_default, workers)
+    __flush_evalSet_handles(evalSet_handles)
+    return None
+
+def create_evalSet_fromHistory(history, release_t1, release_t2,
+                               fh_sprot_t2, taxon_id,
+                               evalSet_mfo_handle,
+                               evalSet_mfo_map_handle,
+                               evalSet_bpo_handle,
+                               evalSet_bpo_map_handle,
+                               evalSet_cco_handle,
+                               evalSet_cco_map_handle):
+    '''
+    This method writes the evaluation sets of the releases release_t1
+    and release_t2 of the annotation history. The sequences are read
+    from the SwissProt file at t2 (file handle fh_sprot_t2).
+    '''
+    print('MFO, BPO, and CCO ontologies:')
+    evalSet_handles = __evalSet_writers(evalSet_mfo_handle,
+                                        evalSet_mfo_map_handle,
+                                        evalSet_bpo_handle,
+                                        evalSet_bpo_map_handle,
+                                        evalSet_cco_handle,
+                                        evalSet_cco_map_handle)
+    eval_sets, entry_count = history.eval_set(release_t1, release_t2,
+                                              taxon_id)
+    for ontType in ONTOLOGIES:
+        print('      Number of entries in the ' + ONT_NAMES[ontType] + \
+              ' accession list: ' + str(entry_count[ontType]))
+    sequences = ah.fetch_sequences(fh_sprot_t2,
+                                   [rec_no for ontType in ONTOLOGIES
+                                    for rec_no, acc, goTerms in
+                                    eval_sets[ontType]])
+    for ontType in ONTOLOGIES:
+        # Initializes the target_id of the ontology:
+        if not taxon_id:
+            target_id = int("1"+"0000001")
+        else:
+            target_id = int(taxon_id+"0000001")
+        for rec_no, accession, goTerms in eval_sets[ontType]:
+            __write_target(evalSet_handles[ontType], target_id,
+                           sequences[rec_no], accession, goTerms)
+            target_id += 1
+    __flush_evalSet_handles(evalSet_handles)
+    return None
+
 if __name__ == '__main__':
     print (sys.argv[0] + ':')
     print(__doc__)
@@ -25,6 +25,28 @@
                                 ontType,
                                 EXP_default=set([])):
         This method creates reevaluation sets for single species. 
+
+    create_reevalSets(fh_mapFiles_t1, fh_sprot_t2, taxon_id,
+                      reevalSet_handles,
+                      reevalSet_map_handles,
+                      EXP_default=set([])):
+        This method creates the reevaluation sets of several ontologies
+        in a single pass over the SwissProt file at t2 (for all species
+        if taxon_id is an empty string). fh_mapFiles_t1,
+        reevalSet_handles, and reevalSet_map_handles are dictionaries
+        keyed by the ontology (F, P, or C). The two methods above call
+        this method with a single ontology.
+
+    create_reevalSet_fromHistory(fh_mapFile_t1, history, release_t2,
+                                 fh_sprot_t2, taxon_id,
+                                 reevalSet_handle,
+                                 reevalSet_map_handle,
+                                 ontType):
+        This method writes the same reevaluation set as the methods above
+        (for all species if taxon_id is an empty string), but it looks up
+        the proteins in an AnnotationHistory object (see AnnotationHistory
+        module) to which the release at t2 was added. Only the sequences
+        of the selected proteins are read from the SwissProt file at t2.
  
     The module also has a few other internal methods: 
         __collect_prevES(fh_mapFile): 
@@ -38,17 +60,31 @@
        This method prints the keys and the values of the dictionary
        that __collect_prevES creates. 
 
-       __is_accession_found(accession_t2, prevES_dict):
+       __collect_accession_keys(prevES_dict):
+       This method maps the protein name (in upper case) of each key of
+       prevES_dict to the first key (in sorted order) with that name, so
+       that a record is matched by looking up its accessions.
+
+       __is_accession_found(accession_t2, acc_keys):
        This method checks whether the protein in the accession field 
-       of the SwissProt record mathes any of the keys in the prevES_dict. 
-       If it does, it returns the key; otherwise, it returns None. 
+       of the SwissProt record mathes any of the keys in acc_keys
+       (see __collect_accession_keys). If it does, it returns the first
+       matched key in sorted order; otherwise, it returns None. 
+
+       __matched_records_t2(fh_sprot_t2, acc_keys_dict, taxon_id=''):
+       This method looks up the proteins of the map files of all
+       ontologies in the offset index of the SwissProt file at t2 (see
+       SprotIndex module) and yields the matched records together with
+       their keys, in the order of the file. Only the matched records
+       are read from the file at t2.
 '''
 import sys
 from collections import defaultdict
-from Bio import SeqIO
-from Bio.Seq import Seq
-from Bio.SeqRecord import SeqRecord
-from Bio import SwissProt as sp
+
+import AnnotationHistory as ah
+import OutputWriter as ow
+import SprotIndex as si
+import SprotScanner as ss
 
 def __collect_prevES(fh_mapFile): 
     GOterm_dict = defaultdict(set)
@@ -63,147 +99,198 @@ def __print_prevES_dict(GOterm_dict):
         print('>' + k + '\t', ','.join(str(t) for t in GOterm_dict[k]))
     return None
 
-def __is_accession_found(accession_t2, prevES_dict):
-    for k in sorted(prevES_dict.keys()):
-        protName = k.split(':')[1]
-        accession_t2 = [x.upper() for x in accession_t2]
-        if protName.upper() in accession_t2:
-            return k 
-    return None 
+def __collect_accession_keys(prevES_dict):
+    '''
+    This method returns a dictionary that maps the protein name (in upper
+    case) of each key of prevES_dict to the first key (in sorted order)
+    with that protein name.
+    '''
+    acc_keys = dict()
+    for k in prevES_dict:
+        protName = k.split(':')[1].upper()
+        if protName not in acc_keys or k < acc_keys[protName]:
+            acc_keys[protName] = k
+    return acc_keys
+
+def __is_accession_found(accession_t2, acc_keys):
+    found = None
+    for acc in accession_t2:
+        k = acc_keys.get(acc.upper())
+        if k is not None and (found is None or k < found):
+            found = k
+    return found
+
+def __matched_records_t2(fh_sprot_t2, acc_keys_dict, taxon_id=''):
+    '''
+    This method yields the records of the SwissProt file at t2 (in the
+    order of the file) that match a protein of any of the map files,
+    together with a dictionary that maps each ontology to the key of the
+    map file of that ontology that the record matches (see
+    __is_accession_found). The proteins of the map files are looked up
+    in the offset index of the file at t2, so only the matched records
+    are read. If the file cannot be indexed, the file is read once.
+    '''
+    sprot_index = si.open_index(fh_sprot_t2)
+    if sprot_index is None:
+        for rec in ss.parse(fh_sprot_t2, taxon_id):
+            matched = dict()
+            for ontType in acc_keys_dict:
+                k = __is_accession_found(rec.accessions,
+                                         acc_keys_dict[ontType])
+                if k is not None:
+                    matched[ontType] = k
+            if matched:
+                yield rec, matched
+        return None
+    # matched: the first key (in sorted order) that matches each record:
+    matched = defaultdict(dict)
+    for ontType in acc_keys_dict:
+        for protName, k in acc_keys_dict[ontType].items():
+            for rec_no in sprot_index.find(protName):
+                if ontType not in matched[rec_no] or \
+                   k < matched[rec_no][ontType]:
+                    matched[rec_no][ontType] = k
+    for rec_no in sorted(matched):
+        rec = sprot_index.get_record(rec_no, taxon_id)
+        if rec is not None:
+            yield rec, matched[rec_no]
+    sprot_index.close()
+    return None
+
+def __write_reeval_record(rec, retVal, curGOterms, ontType, EXP_default,
+                          reevalSet_handle, reevalSet_map_handle):
+    '''
+    This method writes out the sequence of the record rec and its new
+    GO terms of ontology ontType if the protein gained GO terms with EXP
+    evidence codes at t2. It returns True if the protein is written out.
+    '''
+    exp_code = False
+    goTerms = set()
+    # Going over the list of GO information:
+    for goTerm, ontSymbol, evidence in rec.go_refs:
+        if ontSymbol == ontType and evidence in EXP_default:
+            goTerms.add(goTerm)
+            exp_code = True
+    # Gained GO terms between time points t1 and t2:
+    newGOterms = goTerms-curGOterms
+    if not (exp_code and newGOterms):
+        return False
+    # If the current protein's annotation gains EXP evidence
+    # code at t2, write the sequence to the output file:
+    target_id=retVal.split(':')[0]
+    protName=retVal.split(':')[1]
+    # Write out the sequence to fasta file:
+    reevalSet_handle.write_fasta(target_id, protName, rec.sequence)
+    # Write out the mapping to the map file:
+    # (protein sequence id, protein name, new GO term(s))
+    for gt in sorted(newGOterms):
+        reevalSet_map_handle.write_map(target_id, protName, gt)
+    return True
+
+def create_reevalSets(fh_mapFiles_t1, fh_sprot_t2, taxon_id,
+                      reevalSet_handles,
+                      reevalSet_map_handles,
+                      EXP_default=set([])):
+    prevES_dicts = dict()
+    acc_keys_dict = dict()
+    # Write the output files through output writers:
+    reevalSet_handles = dict((ontType, ow.as_writer(reevalSet_handles[ontType]))
+                             for ontType in fh_mapFiles_t1)
+    reevalSet_map_handles = dict((ontType,
+                                  ow.as_writer(reevalSet_map_handles[ontType]))
+                                 for ontType in fh_mapFiles_t1)
+    for ontType in fh_mapFiles_t1:
+        prevES_dicts[ontType] = __collect_prevES(fh_mapFiles_t1[ontType])
+        fh_mapFiles_t1[ontType].close()
+        acc_keys_dict[ontType] = __collect_accession_keys(
+                                     prevES_dicts[ontType])
+    # Counter for the number of proteins that had also annotations at t1:
+    countMatch = dict((ontType, 0) for ontType in fh_mapFiles_t1)
+    # Counter for the number of proteins that gained annotations at t2:
+    countFunctionGain = dict((ontType, 0) for ontType in fh_mapFiles_t1)
+    for rec, matched in __matched_records_t2(fh_sprot_t2, acc_keys_dict,
+                                             taxon_id):
+        if taxon_id and taxon_id not in rec.taxonomy_id:
+            continue
+        # Checks whether the protein had annotation at t1:
+        for ontType, retVal in matched.items():
+            countMatch[ontType] += 1
+            # GO terms from map file at time point t1:
+            curGOterms = prevES_dicts[ontType][retVal]
+            if __write_reeval_record(rec, retVal, curGOterms, ontType,
+                                     EXP_default,
+                                     reevalSet_handles[ontType],
+                                     reevalSet_map_handles[ontType]):
+                countFunctionGain[ontType] += 1
+    # Close the open files:
+    fh_sprot_t2.close()
+    for ontType in fh_mapFiles_t1:
+        reevalSet_handles[ontType].close()
+        reevalSet_map_handles[ontType].close()
+        if len(fh_mapFiles_t1) > 1:
+            print('Ontology: ' + ontType)
+        print('countMatch at t2: ' + str(countMatch[ontType]))
+        print('countFunctionGain at t2: ' + str(countFunctionGain[ontType]))
+    return None
 
 def create_reevalSet_allSpecies(fh_mapFile_t1, fh_sprot_t2,
                                 reevalSet_handle, 
                                 reevalSet_map_handle,
                                 ontType,
                                 EXP_default=set([])):
-    prevES_dict = __collect_prevES(fh_mapFile_t1)
-    fh_mapFile_t1.close()
-    # Counter for the number of proteins that had also annotations at t1: 
-    countMatch = 0 
-    # Counter for the number of proteins that gained annotations at t2: 
-    countFunctionGain = 0
-    for rec in sp.parse(fh_sprot_t2):
-        # Checks whether the protein had annotation at t1: 
-        retVal = __is_accession_found(rec.accessions, prevES_dict)
-        if (retVal):
-            countMatch+=1
-            exp_code = False
-            goTerms = set()
-            # Going over the list of GO information:
-            for crossRef in rec.cross_references:
-                # Consider the cross_reference entries
-                # that relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1],
-                             (crossRef[3].split(':'))[0],
-                             crossRef[2][0]]
-                    if goList[2] == ontType and \
-                       (crossRef[3].split(':'))[0] in EXP_default:
-                        goTerms.add(goList[0])
-                        exp_code = True
-                        #break
-            # If the current protein's annotation gains EXP evidence
-            # code at t2, write the sequence to the output file:
-            # GO terms from map file at time point t1: 
-            curGOterms=prevES_dict[retVal]
-            # Gained GO terms between time points t1 and t2: 
-            newGOterms = goTerms-curGOterms
-            if exp_code and newGOterms:
-                target_id=retVal.split(':')[0]
-                protName=retVal.split(':')[1]
-                outseq = SeqRecord(Seq(rec.sequence),
-                                   id=str(target_id),
-                                   description = "%s" %
-                                   (protName))
-                outseq_list = [outseq]
-                # Write out the sequence to fasta file:
-                SeqIO.write(outseq_list, reevalSet_handle, "fasta")
-
-                # Write out the mapping to the map file:
-                # (protein sequence id, protein name, new GO term(s))
-                for gt in sorted(newGOterms):
-                    #mapStr = "T" + str(target_id) + '\t' + \
-                    #           str(gt) + '\n'
-                    mapStr = str(target_id) + '\t' + \
-                             str(protName) + '\t' + \
-                             str(gt) + '\n'
-                    reevalSet_map_handle.write("%s" % mapStr)
-                countFunctionGain += 1
-                #if countFunctionGain > 3: 
-                #    return None
-    # Close the open files: 
-    fh_sprot_t2.close()
-    reevalSet_handle.close() 
-    reevalSet_map_handle.close()
-    print('countMatch at t2: ' + str(countMatch))
-    print('countFunctionGain at t2: ' + str(countFunctionGain))
-    return None
+    return create_reevalSets({ontType: fh_mapFile_t1}, fh_sprot_t2, '',
+                             {ontType: reevalSet_handle},
+                             {ontType: reevalSet_map_handle},
+                             EXP_default)
 
 def create_reevalSet_singleSpecies(fh_mapFile_t1, fh_sprot_t2, taxon_id,
                                    reevalSet_handle,
                                    reevalSet_map_handle,
                                    ontType,
                                    EXP_default=set([])):
+    return create_reevalSets({ontType: fh_mapFile_t1}, fh_sprot_t2,
+                             taxon_id,
+                             {ontType: reevalSet_handle},
+                             {ontType: reevalSet_map_handle},
+                             EXP_default)
+
+def create_reevalSet_fromHistory(fh_mapFile_t1, history, release_t2,
+                                 fh_sprot_t2, taxon_id,
+                                 reevalSet_handle,
+                                 reevalSet_map_handle,
+                                 ontType):
+    '''
+    This method writes the reevaluation set of the map file at t1 (file
+    handle fh_mapFile_t1) and the release release_t2 of the annotation
+    history. The sequences are read from the SwissProt file at t2 (file
+    handle fh_sprot_t2).
+    '''
     prevES_dict = __collect_prevES(fh_mapFile_t1)
     fh_mapFile_t1.close()
-    # Counter for the number of proteins that had also annotations at t1:
-    countMatch = 0
-    # Counter for the number of proteins that gained annotations at t2:
-    countFunctionGain = 0
-    for rec in sp.parse(fh_sprot_t2):
-        # Checks whether the protein had annotation at t1:
-        retVal = __is_accession_found(rec.accessions, prevES_dict)
-        if (taxon_id in rec.taxonomy_id and retVal):
-            countMatch+=1
-            exp_code = False
-            goTerms = set()
-            # Going over the list of GO information:
-            for crossRef in rec.cross_references:
-                # Consider the cross_reference entries
-                # that relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1],
-                             (crossRef[3].split(':'))[0],
-                             crossRef[2][0]]
-                    if goList[2] == ontType and \
-                       (crossRef[3].split(':'))[0] in EXP_default:
-                        goTerms.add(goList[0])
-                        exp_code = True
-                        #break
-            # If the current protein's annotation gains EXP evidence
-            # code at t2, write the sequence to the output file:
-            # GO terms from map file at time point t1: 
-            curGOterms=prevES_dict[retVal]
-            # Gained GO terms between time points t1 and t2: 
-            newGOterms = goTerms-curGOterms
-            if exp_code and newGOterms:
-                target_id=retVal.split(':')[0]
-                protName=retVal.split(':')[1]
-                outseq = SeqRecord(Seq(rec.sequence),
-                                   id=str(target_id),
-                                   description = "%s" %
-                                   (protName))
-                outseq_list = [outseq]
-                # Write out the sequence to fasta file:
-                SeqIO.write(outseq_list, reevalSet_handle, "fasta")
-
-                # Write out the mapping to the map file:
-                # (protein sequence id, protein name, new GO term(s))
-                for gt in sorted(newGOterms):
-                    #mapStr = "T" + str(target_id) + '\t' + \
-                    #           str(gt) + '\n'
-                    mapStr = str(target_id) + '\t' + \
-                             str(protName) + '\t' + \
-                             str(gt) + '\n'
-                    reevalSet_map_handle.write("%s" % mapStr)
-                countFunctionGain += 1
-
+    # Write the output files through output writers:
+    reevalSet_handle = ow.as_writer(reevalSet_handle)
+    reevalSet_map_handle = ow.as_writer(reevalSet_map_handle)
+    reeval_set, countMatch = history.reeval_set(prevES_dict, release_t2,
+                                                ontType, taxon_id)
+    sequences = ah.fetch_sequences(fh_sprot_t2,
+                                   [rec_no for k, rec_no, newGOterms in
+                                    reeval_set])
+    for retVal, rec_no, newGOterms in reeval_set:
+        target_id=retVal.split(':')[0]
+        protName=retVal.split(':')[1]
+        # Write out the sequence to fasta file:
+        reevalSet_handle.write_fasta(target_id, protName,
+                                     sequences[rec_no])
+        # Write out the mapping to the map file:
+        # (protein sequence id, protein name, new GO term(s))
+        for gt in newGOterms:
+            reevalSet_map_handle.write_map(target_id, protName, gt)
     # Close the open files: 
     fh_sprot_t2.close()
     reevalSet_handle.close() 
     reevalSet_map_handle.close()
     print('countMatch at t2: ' + str(countMatch))
-    print('countFunctionGain at t2: ' + str(countFunctionGain))
+    print('countFunctionGain at t2: ' + str(len(reeval_set)))
     return None
 
 if __name__ == '__main__':
@@ -14,10 +14,11 @@
                        trainingFile_bpo_map_handle,
                        trainingFile_cco_handle,
                        trainingFile_cco_map_handle,
-                       EXP_default=set([])):
+                       EXP_default=set([]), workers=1):
         This method invokes __filter_trainingSet_allSpecies() 
         to generate training sequences on each of three ontologies:
-        MFO, BPO, and CCO. 
+        MFO, BPO, and CCO. When workers is more than one, it invokes
+        __create_trainingSet_parallel() instead.
    
     create_trainingSet_singleSpecies(fh_sprot, taxon_id,
                        trainingFile_mfo_handle,
@@ -26,12 +27,23 @@
                        trainingFile_bpo_map_handle,
                        trainingFile_cco_handle,
                        trainingFile_cco_map_handle,
-                       EXP_default=set([])):
+                       EXP_default=set([]), workers=1):
         This method is similar to create_trainingSet_allSpecies() but 
         invokes __filter_trainingSet_singleSpecies() method and generates 
         the training sequences for specific species defined by the 
         parameter taxon_id. 
 
+    create_trainingSet_combined(fh_sprot, taxon_id, fh_targets, fh_map,
+                       EXP_default=set([]), workers=1):
+        This method writes a single training set for all three ontologies
+        (for all species when taxon_id is an empty string): each protein
+        whose annotation is supported by an EXP evidence code in any
+        ontology is written once to the sequence file, and the combined
+        map file has a line for each ontology of the protein with the
+        training sequence id, the protein name, the GO terms, and the
+        ontology (ONTOLOGY_NAMES). One BLAST run against the combined
+        training set serves the scoring of all three ontologies.
+
     __filter_trainingSet_allSpecies(fh_sprot, fh_targets, fh_map,
                                   ontType, EXP_default=set([])):
         This method takes five input arguments:
@@ -52,19 +64,29 @@
        This method is similar to __filter_trainingSet_allSpecies but works 
        on only a specific species defined by the parameter taxon_id. 
 
+    __create_trainingSet_parallel(fh_sprot, taxon_id, trainingSet_handles,
+                                  EXP_default=set([]), workers=1):
+        This method splits the SwissProt file into byte ranges by using
+        ParallelSprot module and filters the ranges in worker processes
+        for all three ontologies at once. The results of the ranges are
+        written in the order of the file, so the output files are the same
+        as the ones written by the filters above.
+
 '''
 import sys
-from Bio import SeqIO
-from Bio.Seq import Seq
-from Bio.SeqRecord import SeqRecord
-from Bio import SwissProt as sp
+
+import OutputWriter as ow
+import ParallelSprot as ps
+import SprotScanner as ss
+
+# Names of the ontologies in the combined map file:
+ONTOLOGY_NAMES = {'F': 'mfo', 'P': 'bpo', 'C': 'cco'}
 
 def __filter_trainingSet_allSpecies(fh_sprot, fh_targets, fh_map,
                                   ontType, EXP_default=set([])):
     # Initializes the target_id:
     target_id = int("1"+"0000001")
 
-    outseq_list = []
 
     # Counts total number of sequences 
     # in the sprot file related to the the taxonomy id taxon_id:
@@ -75,52 +97,139 @@ def __filter_trainingSet_allSpecies(fh_sprot, fh_targets, fh_map,
     # evidence:
     seqCount_exp = 0
 
-    for rec in sp.parse(fh_sprot):
-        # Selects records that are related to a specific
-        # taxonomy id taxon_id:
-        #if taxon_id in rec.taxonomy_id:
+    for rec in ss.parse(fh_sprot):
             exp_code = False 
             seqCount += 1
             goTerms = set()
             # Going over the list of GO information:
-            for crossRef in rec.cross_references: 
-                # Consider the cross_reference entries 
-                # that relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1], 
-                             (crossRef[3].split(':'))[0], 
-                             crossRef[2][0]]
-                    #print (goList[2])
-                    #print(ontType)
-                    #sys.exit(0)
-                    if goList[2] == ontType and \
-                       (crossRef[3].split(':'))[0] in EXP_default:
-                        goTerms.add(goList[0])
-                        exp_code = True
-                        #break
+            # (GO term, ontology symbol, evidence code)
+            for goTerm, ontSymbol, evidence in rec.go_refs:
+                if ontSymbol == ontType and evidence in EXP_default:
+                    goTerms.add(goTerm)
+                    exp_code = True
             # If the protein's annotation has any EXP evidence,
             # write the sequence and the mapping to the output files:
             if exp_code:
                 #goTerms = ','.join(list(goTerms))
                 goTerms = ','.join(sorted(goTerms))
-                outseq = SeqRecord(Seq(rec.sequence),
-                                   id="TR"+str(target_id),
-                                   description = "%s" %
-                                   (rec.accessions[0]))
-                outseq_list = [outseq]
                 # Write out the sequence:
-                SeqIO.write(outseq_list,fh_targets, "fasta")
-                #mapStr = "T" + str(target_id) + '\t' + \
-                #               str(rec.accessions[0]) + '\n'
-                mapStr = "TR" + str(target_id) + '\t' + \
-                               str(rec.accessions[0]) + '\t' + \
-                               goTerms + '\n'
+                fh_targets.write_fasta("TR"+str(target_id),
+                                       rec.accessions[0], rec.sequence)
                 # Write out the mapping (target id, protein name, GO term):
-                fh_map.write("%s" % mapStr)
+                fh_map.write_map("TR"+str(target_id), rec.accessions[0],
+                                 goTerms)
                 target_id += 1
                 seqCount_exp += 1
     return seqCount_exp
 
+def __select_trainingSet(records, EXP_default=set([])):
+    '''
+    This method returns a dictionary whose keys are the ontology types
+    and whose values are the lists of (protein name, sequence lines, GO
+    terms) of the records whose annotations are supported by EXP evidence
+    codes in that ontology. The records are kept in the order of the
+    file. The sequences are formatted here (see OutputWriter module), so
+    that the worker processes do the formatting.
+    '''
+    selected = {'F': [], 'P': [], 'C': []}
+    for rec in records:
+        goTerms = {'F': set(), 'P': set(), 'C': set()}
+        for goTerm, ontSymbol, evidence in rec.go_refs:
+            if ontSymbol in goTerms and evidence in EXP_default:
+                goTerms[ontSymbol].add(goTerm)
+        lines = None
+        for ontType in selected:
+            if goTerms[ontType]:
+                if lines is None:
+                    lines = ow.format_sequence(rec.sequence)
+                selected[ontType].append((rec.accessions[0], lines,
+                                          ','.join(sorted(goTerms[ontType]))))
+    return selected
+
+def __create_trainingSet_parallel(fh_sprot, taxon_id, trainingSet_handles,
+                                  EXP_default=set([]), workers=1):
+    '''
+    This method creates the training sets of all three ontologies by
+    filtering the byte ranges of the SwissProt file in worker processes.
+    The sequences of the ranges are written in the order of the file,
+    so the output is the same as the output of the filters above.
+    '''
+    print('Creating training sets for MFO, BPO, and CCO ontologies ' + \
+          'with ' + str(workers) + ' worker processes ...')
+    if not taxon_id:
+        target_id = int("1"+"0000001")
+    else:
+        target_id = int(taxon_id+"0000001")
+    target_ids = {'F': target_id, 'P': target_id, 'C': target_id}
+    for selected in ps.map_records(ps.sprot_fname(fh_sprot),
+                                   __select_trainingSet, (EXP_default,),
+                                   taxon_id, workers):
+        for ontType in ['F', 'P', 'C']:
+            fh_targets, fh_map = trainingSet_handles[ontType]
+            for protName, lines, goTerms in selected[ontType]:
+                fh_targets.write_fasta("TR"+str(target_ids[ontType]),
+                                       protName, lines=lines)
+                fh_map.write_map("TR"+str(target_ids[ontType]), protName,
+                                 goTerms)
+                target_ids[ontType] += 1
+    for ontType in ['F', 'P', 'C']:
+        for fh in trainingSet_handles[ontType]:
+            fh.flush()
+    return None
+
+def __combined_entries(records, EXP_default=set([])):
+    '''
+    This method yields the (protein name, sequence lines, GO terms of
+    each ontology) of the records whose annotations are supported by EXP
+    evidence codes in any ontology, in the order of the records.
+    '''
+    for rec in records:
+        goTerms = {'F': set(), 'P': set(), 'C': set()}
+        for goTerm, ontSymbol, evidence in rec.go_refs:
+            if ontSymbol in goTerms and evidence in EXP_default:
+                goTerms[ontSymbol].add(goTerm)
+        if goTerms['F'] or goTerms['P'] or goTerms['C']:
+            yield rec.accessions[0], ow.format_sequence(rec.sequence), goTerms
+    return None
+
+def __select_combined(records, EXP_default=set([])):
+    '''
+    This method returns the list of the entries of __combined_entries for
+    the records of a byte range (in a worker process).
+    '''
+    return list(__combined_entries(records, EXP_default))
+
+def create_trainingSet_combined(fh_sprot, taxon_id, fh_targets, fh_map,
+                       EXP_default=set([]), workers=1):
+    # Write the output files through output writers:
+    fh_targets = ow.as_writer(fh_targets)
+    fh_map = ow.as_writer(fh_map)
+    print('Creating combined training set for MFO, BPO, and CCO ' + \
+          'ontologies ...')
+    if not taxon_id:
+        target_id = int("1"+"0000001")
+    else:
+        target_id = int(taxon_id+"0000001")
+    if workers > 1 and ps.sprot_fname(fh_sprot):
+        batches = ps.map_records(ps.sprot_fname(fh_sprot), __select_combined,
+                                 (EXP_default,), taxon_id, workers)
+    else:
+        batches = [__combined_entries(ss.parse(fh_sprot, taxon_id),
+                                      EXP_default)]
+    for entries in batches:
+        for protName, lines, goTerms in entries:
+            fh_targets.write_fasta("TR"+str(target_id), protName, lines=lines)
+            # One map line for each ontology of the protein:
+            for ontType in ['F', 'P', 'C']:
+                if goTerms[ontType]:
+                    fh_map.write_map("TR"+str(target_id), protName,
+                                     ','.join(sorted(goTerms[ontType])),
+                                     ONTOLOGY_NAMES[ontType])
+            target_id += 1
+    fh_targets.flush()
+    fh_map.flush()
+    return None
+
 def create_trainingSet_allSpecies(fh_sprot,
                        trainingFile_mfo_handle, 
                        trainingFile_mfo_map_handle,
@@ -128,7 +237,24 @@ def create_trainingSet_allSpecies(fh_sprot,
                        trainingFile_bpo_map_handle,
                        trainingFile_cco_handle,
                        trainingFile_cco_map_handle,
-                       EXP_default=set([])):
+                       EXP_default=set([]), workers=1):
+    # Write the output files through output writers:
+    trainingFile_mfo_handle = ow.as_writer(trainingFile_mfo_handle)
+    trainingFile_mfo_map_handle = ow.as_writer(trainingFile_mfo_map_handle)
+    trainingFile_bpo_handle = ow.as_writer(trainingFile_bpo_handle)
+    trainingFile_bpo_map_handle = ow.as_writer(trainingFile_bpo_map_handle)
+    trainingFile_cco_handle = ow.as_writer(trainingFile_cco_handle)
+    trainingFile_cco_map_handle = ow.as_writer(trainingFile_cco_map_handle)
+    if workers > 1 and ps.sprot_fname(fh_sprot):
+        __create_trainingSet_parallel(fh_sprot, '',
+                       {'F': (trainingFile_mfo_handle,
+                              trainingFile_mfo_map_handle),
+                        'P': (trainingFile_bpo_handle,
+                              trainingFile_bpo_map_handle),
+                        'C': (trainingFile_cco_handle,
+                              trainingFile_cco_map_handle)},
+                       EXP_default, workers)
+        return None
     print('Creating training set for MFO ontology ...')
     __filter_trainingSet_allSpecies(fh_sprot,
                        trainingFile_mfo_handle,
@@ -169,7 +295,6 @@ def __filter_trainingSet_singleSpecies(fh_sprot, taxon_id, fh_targets, fh_map,
     '''
     # Initializes the target_id:
     target_id = int(taxon_id+"0000001")
-    outseq_list = []
 
     # Counts total number of sequences 
     # in the sprot file related to the the taxonomy id taxon_id:
@@ -180,44 +305,30 @@ def __filter_trainingSet_singleSpecies(fh_sprot, taxon_id, fh_targets, fh_map,
     # evidence:
     seqCount_exp = 0
 
-    for rec in sp.parse(fh_sprot):
-        # Select records that are related to a specific
-        # taxonomy id taxon_id:
-        if taxon_id in rec.taxonomy_id:
+    # Select records that are related to a specific
+    # taxonomy id taxon_id:
+    for rec in ss.parse(fh_sprot, taxon_id):
             exp_code = False 
             seqCount += 1
             goTerms = set()
             # Going over the list of GO information:
-            for crossRef in rec.cross_references: 
-                # Consider the cross_reference entries 
-                # that relate to GO DB:
-                if crossRef[0] == 'GO':
-                    goList = [crossRef[1], # GO term
-                             (crossRef[3].split(':'))[0], # Evidence code
-                             crossRef[2][0]] # Ontology symbol
-                    if goList[2] == ontType and \
-                       (crossRef[3].split(':'))[0] in EXP_default:
-                        goTerms.add(goList[0])
-                        exp_code = True
-                        #break
+            # (GO term, ontology symbol, evidence code)
+            for goTerm, ontSymbol, evidence in rec.go_refs:
+                if ontSymbol == ontType and evidence in EXP_default:
+                    goTerms.add(goTerm)
+                    exp_code = True
             # If the protein's annotation has any EXP evidences,
             # write the sequence and the mapping to the output files:
             if exp_code:
                 #goTerms = ','.join(list(goTerms))
                 goTerms = ','.join(sorted(goTerms))
                 #print(goTerms)
-                outseq = SeqRecord(Seq(rec.sequence),
-                                   id="TR"+str(target_id),
-                                   description = "%s" %
-                                   (rec.accessions[0]))
-                outseq_list = [outseq]
                 # Write out the sequence:
-                SeqIO.write(outseq_list,fh_targets, "fasta")
-                mapStr = "TR" + str(target_id) + '\t' + \
-                               str(rec.accessions[0]) + '\t' + \
-                               goTerms + '\n'
+                fh_targets.write_fasta("TR"+str(target_id),
+                                       rec.accessions[0], rec.sequence)
                 # Write out the mapping (target id -> protein name):
-                fh_map.write("%s" % mapStr)
+                fh_map.write_map("TR"+str(target_id), rec.accessions[0],
+                                 goTerms)
                 target_id += 1
                 seqCount_exp += 1
     return seqCount_exp
@@ -229,7 +340,24 @@ def create_trainingSet_singleSpecies(fh_sprot, taxon_id,
                        trainingFile_bpo_map_handle,
                        trainingFile_cco_handle,
                        trainingFile_cco_map_handle,
-                       EXP_default=set([])):
+                       EXP_default=set([]), workers=1):
+    # Write the output files through output writers:
+    trainingFile_mfo_handle = ow.as_writer(trainingFile_mfo_handle)
+    trainingFile_mfo_map_handle = ow.as_writer(trainingFile_mfo_map_handle)
+    trainingFile_bpo_handle = ow.as_writer(trainingFile_bpo_handle)
+    trainingFile_bpo_map_handle = ow.as_writer(trainingFile_bpo_map_handle)
+    trainingFile_cco_handle = ow.as_writer(trainingFile_cco_handle)
+    trainingFile_cco_map_handle = ow.as_writer(trainingFile_cco_map_handle)
+    if workers > 1 and ps.sprot_fname(fh_sprot):
+        __create_trainingSet_parallel(fh_sprot, taxon_id,
+                       {'F': (trainingFile_mfo_handle,
+                              trainingFile_mfo_map_handle),
+                        'P': (trainingFile_bpo_handle,
+                              trainingFile_bpo_map_handle),
+                        'C': (trainingFile_cco_handle,
+                              trainingFile_cco_map_handle)},
+                       EXP_default, workers)
+        return None
     print('Creating training set for MFO ontology ...')
     __filter_trainingSet_singleSpecies(fh_sprot, taxon_id,
                        trainingFile_mfo_handle,